@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+from decouple import config
+
+# Users kept in memory by the auth dependency, and for how long
+USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=10000, cast=int)
+USER_CACHE_TTL_SECONDS = config("USER_CACHE_TTL_SECONDS", default=60, cast=float)
+
+# Decoded tokens kept in memory; each one only until its own exp
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", default=10000, cast=int)
+
+
+class TTLCache:
+    """
+    Bounded LRU whose entries also expire. Thread-safe: the auth dependency
+    reads it on the event loop while background jobs may invalidate users.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value), monotonic clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+# user id -> user document, as read by get_current_user_swagger
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+# raw token -> user id; the TTL is capped per entry by the token's exp
+token_cache = TTLCache(TOKEN_CACHE_SIZE, float("inf"))
+
+
+def invalidate_user(user_id):
+    """
+    Call after changing or deleting a user document so this process reads
+    it again. Other processes pick the change up within USER_CACHE_TTL_SECONDS.
+    """
+    user_cache.invalidate(str(user_id))
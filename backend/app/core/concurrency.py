@@ -0,0 +1,26 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+# Threads for blocking I/O (pymongo, boto3, OpenAI) awaited from async endpoints
+BLOCKING_IO_WORKERS = config("BLOCKING_IO_WORKERS", default=32, cast=int)
+
+# bcrypt is deliberately slow; a few threads keep a login burst from eating the I/O pool
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=4, cast=int)
+
+io_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Await a blocking call on the I/O executor instead of running it on the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_password_hash(fn, *args):
+    """Await a bcrypt hash / verify on its own small executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, fn, *args)
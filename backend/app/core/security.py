@@ -12,7 +12,10 @@ from decouple import config
 from fastapi import Security, HTTPException
 from fastapi.security import APIKeyHeader
 from bson import ObjectId
-from app.db.client import users_collection
+from bson.errors import InvalidId
+import time
+from app.core.auth_cache import token_cache, user_cache
+from app.db.client import async_users_collection
 
 SECRET_KEY = config("SECRET_KEY")
 ALGORITHM = "HS256"
@@ -32,24 +35,44 @@ def create_access_token(user_id: str):
 # Swagger / APIKeyHeader
 api_key_scheme = APIKeyHeader(name="Authorization", auto_error=True)
 
-def get_current_user_swagger(token: str = Security(api_key_scheme)):
+async def get_current_user_swagger(token: str = Security(api_key_scheme)):
     if token.startswith("Bearer "):
         token = token[7:]  # remove "Bearer "
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(401, "Invalid token")
+    user_id = _token_user_id(token)
 
-        # Find user by ObjectId
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+    # Steady state is two dict lookups: the token and the user are both cached
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            user = await async_users_collection.find_one({"_id": ObjectId(user_id)})
+        except InvalidId:
+            raise HTTPException(401, "Invalid token")
         if not user:
             raise HTTPException(401, "User not found")
 
         # Convert _id to string for easy use in routers
         user["_id"] = str(user["_id"])
-        return user
+        user_cache.put(user_id, user)
+
+    # Routers get their own copy, the cached one stays as read
+    return dict(user)
 
+
+def _token_user_id(token):
+    """The token's user id, decoded once and then remembered until the token expires."""
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except jwt.JWTError:
         raise HTTPException(401, "Token is invalid or expired")
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(401, "Invalid token")
+
+    if payload.get("exp"):
+        token_cache.put(token, user_id, ttl=payload["exp"] - time.time())
+    return user_id
@@ -1,4 +1,5 @@
-from pymongo import MongoClient
+from gridfs import GridFS
+from pymongo import AsyncMongoClient, MongoClient
 from decouple import config
 
 # Load MongoDB URI
@@ -19,5 +20,78 @@ db = client[config("DB_NAME")]
 users_collection = db["users_email_tool"]
 contacts_collection = db["contacts_email_tool"]
 groups_collection = db["groups_email_tool"]
+# One row per (group, contact); groups no longer embed their members
+group_members_collection = db["group_members_email_tool"]
 emails_collection = db["emails_sent_tool"]
+deliveries_collection = db["deliveries_email_tool"]
+dead_letters_collection = db["dead_letters_email_tool"]
+suppressions_collection = db["suppressions_email_tool"]
+# One document per user ({_id: user id, contacts_version}), kept off the user document
+contact_versions_collection = db["contact_versions_email_tool"]
+# Inline images of newsletters that may still be resumed or replayed; the
+# email log only keeps references, so it stays far below the 16 MB limit
+campaign_images = GridFS(db, collection="campaign_images_email_tool")
 
+
+# Async client for the async routes: a request waiting on Mongo only parks its
+# coroutine instead of holding a threadpool slot for the round trip
+async_client = AsyncMongoClient(
+    MONGO_URI,
+    serverSelectionTimeoutMS=5000,
+    connectTimeoutMS=5000,
+    socketTimeoutMS=5000
+)
+async_db = async_client[config("DB_NAME")]
+
+async_users_collection = async_db["users_email_tool"]
+async_contacts_collection = async_db["contacts_email_tool"]
+async_groups_collection = async_db["groups_email_tool"]
+async_group_members_collection = async_db["group_members_email_tool"]
+async_emails_collection = async_db["emails_sent_tool"]
+async_deliveries_collection = async_db["deliveries_email_tool"]
+async_contact_versions_collection = async_db["contact_versions_email_tool"]
+
+
+# (collection, keys, options) of every index the app relies on
+INDEXES = [
+    # One row per recipient per campaign; unique so it doubles as the idempotency key
+    (deliveries_collection, [("campaign_id", 1), ("_id", 1)], {}),
+    (deliveries_collection, [("campaign_id", 1), ("email", 1)], {"unique": True}),
+    # Recipients that kept failing, replayed per campaign
+    (dead_letters_collection, [("campaign_id", 1), ("replay_id", 1)], {}),
+    # One suppression per user and address; (user_id, _id) serves incremental index refreshes
+    (suppressions_collection, [("user_id", 1), ("email", 1)], {"unique": True}),
+    (suppressions_collection, [("user_id", 1), ("_id", 1)], {}),
+    # One contact per user and (normalized) address; bulk imports upsert against it
+    (contacts_collection, [("user_id", 1), ("email", 1)], {"unique": True}),
+    # Keyset pagination of a user's contacts
+    (contacts_collection, [("user_id", 1), ("_id", 1)], {}),
+    # Contact search: substring via trigrams, name prefix, email domain
+    (contacts_collection, [("user_id", 1), ("search_grams", 1), ("_id", 1)], {}),
+    (contacts_collection, [("user_id", 1), ("name_lower", 1)], {}),
+    (contacts_collection, [("user_id", 1), ("email_domain", 1), ("_id", 1)], {}),
+    # Members of a group (unique, so re-adding is a no-op) and groups of a contact
+    (group_members_collection, [("group_id", 1), ("contact_id", 1)], {"unique": True}),
+    (group_members_collection, [("contact_id", 1)], {}),
+    # Unfinished campaigns are looked up on startup to resume them
+    (emails_collection, [("status", 1), ("type", 1)], {}),
+    # A campaign's images are dropped together once it can no longer be replayed
+    (db["campaign_images_email_tool.files"], [("metadata.campaign_id", 1)], {}),
+]
+
+
+def ensure_indexes():
+    """
+    Create the indexes the app relies on. Called once at startup; failures are
+    logged instead of raised so the server still comes up if Mongo is slow.
+    Each index is tried on its own, so one failing (e.g. a unique index over
+    data that still has duplicates) doesn't leave the others missing.
+    """
+    created = 0
+    for collection, keys, options in INDEXES:
+        try:
+            collection.create_index(keys, **options)
+            created += 1
+        except Exception as e:
+            print(f"[WARNING] Could not create index {keys} on {collection.name}: {e}")
+    return created
@@ -1,16 +1,45 @@
+import threading
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.db.client import ensure_indexes
+from app.services.suppression_service import suppression_index
+from app.services.contact_import import normalize_legacy_contacts
+from app.services.contact_search import backfill_search_fields
+from app.services.delivery_records import release_dead_letters
+from app.services.group_members import migrate_embedded_members, run_member_compaction
 from app.routers import auth_router
 from app.routers import user_router
 from app.routers import contact_router   
 from app.routers import group_router
 from app.routers import email_router
+from app.routers import suppression_router
+from app.routers import segment_router
+from app.routers import unsubscribe_router
 
 from app.routers import ai_email_router
 
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Legacy duplicates would keep the unique (user_id, email) index from being built
+    normalize_legacy_contacts()
+    ensure_indexes()
+    # Sends and group reads only look at the membership collection, so legacy
+    # groups are moved over before the first request (or resumed campaign)
+    migrate_embedded_members()
+    email_router.resume_campaigns()
+    # Replays do not survive a restart; their unfinished claims go back to the dead letters
+    release_dead_letters()
+    threading.Thread(target=backfill_search_fields, name="contact-search-backfill", daemon=True).start()
+    threading.Thread(target=run_member_compaction, name="group-members-compaction", daemon=True).start()
+    yield
+    # Buffered one-click unsubscribes must not be lost on shutdown
+    suppression_index.flush()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -26,6 +55,9 @@ app.include_router(user_router.router)
 app.include_router(contact_router.router)   
 app.include_router(group_router.router)
 app.include_router(email_router.router)
+app.include_router(suppression_router.router)
+app.include_router(segment_router.router)
+app.include_router(unsubscribe_router.router)
 app.include_router(ai_email_router.router)
 
 
@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from app.core.concurrency import run_blocking
 from app.core.security import get_current_user_swagger
 import openai
 from decouple import config
@@ -56,7 +57,9 @@ async def generate_email(
     )
 
     try:
-        response = openai.chat.completions.create(
+        # The OpenAI client is synchronous, keep it off the event loop
+        response = await run_blocking(
+            openai.chat.completions.create,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
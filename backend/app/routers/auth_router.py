@@ -6,8 +6,8 @@ from app.services.auth_service import register_user, login_user
 router = APIRouter(prefix="/auth", tags=["Auth"])  # <-- Must be named router
 
 @router.post("/register")
-def register(body: UserRegister):
-    return register_user(
+async def register(body: UserRegister):
+    return await register_user(
         email=body.email,
         password=body.password,
         name=body.name,
@@ -16,5 +16,5 @@ def register(body: UserRegister):
     )
 
 @router.post("/login", response_model=UserResponse)
-def login(body: UserLogin):
-    return login_user(body.email, body.password)
+async def login(body: UserLogin):
+    return await login_user(body.email, body.password)
@@ -1,15 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from bson import ObjectId
-from app.db.client import contacts_collection, groups_collection
+from app.db.client import async_contacts_collection, async_groups_collection
 from app.core.security import get_current_user_swagger
-from app.schemas.contact_schema import ContactCreate, ContactUpdate
+from app.schemas.contact_schema import BulkContactUpdate, ContactCreate, ContactSelection, ContactUpdate
+from app.services.contact_import import upsert_contacts
+from app.services.contact_ownership import validate_contact_ids
+from app.services.contact_search import renamed_search_fields, search_fields, search_query
+from app.services.group_members import add_members_async, remove_contacts_async, remove_members_async
+from app.services.segments import bump_contacts_version_async
+from app.services.suppression_service import normalize_email
+from pymongo.errors import DuplicateKeyError
+from fastapi.responses import StreamingResponse
+from app.core.concurrency import run_blocking
+from app.services.contact_parser import ImportFileError, iter_contacts, iter_rows
+from app.services.import_jobs import ImportJob, import_manager, run_import_job
 import datetime
-import csv
-import io
-from typing import Optional
+import json
+from decouple import config
+import shutil
+import tempfile
+from typing import Literal, Optional
 
 router = APIRouter(prefix="/contacts", tags=["Contacts"])
 
+# Contacts per chunk written to a streamed parse-import or export response
+PARSE_STREAM_BATCH = 500
+
+# Contacts deleted / updated per write by the bulk endpoints
+CONTACT_BULK_BATCH_SIZE = config("CONTACT_BULK_BATCH_SIZE", default=5000, cast=int)
+
+# Fields GET /contacts/ can project to
+CONTACT_FIELDS = ("name", "email", "created_at", "user_id")
+
 
 def serialize_contact(contact):
     """Convert ObjectId fields to str for JSON serialization"""
@@ -22,33 +44,138 @@ def serialize_contact(contact):
     }
 
 
+def _projected_contact(contact, fields):
+    """serialize_contact limited to the requested fields (the id is always included)."""
+    row = {"id": str(contact["_id"])}
+    for field in fields:
+        value = contact.get(field)
+        if field == "user_id" and value is not None:
+            value = str(value)
+        elif field == "created_at" and value is not None:
+            value = value.isoformat()
+        row[field] = value
+    return row
+
+
+def _contact_fields(fields):
+    if not fields:
+        return CONTACT_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in CONTACT_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown contact fields: {', '.join(unknown)}")
+    return tuple(requested)
+
+
 @router.post("/")
-def create_contact(data: ContactCreate, user=Depends(get_current_user_swagger)):
+async def create_contact(data: ContactCreate, user=Depends(get_current_user_swagger)):
     contact = {
         "user_id": ObjectId(user["_id"]),
         "name": data.name,
-        "email": data.email,
+        "email": normalize_email(data.email),
         "created_at": datetime.datetime.utcnow()
     }
-    result = contacts_collection.insert_one(contact)
+    contact.update(search_fields(contact["name"], contact["email"]))
+    try:
+        result = await async_contacts_collection.insert_one(contact)
+    except DuplicateKeyError:
+        raise HTTPException(400, "Contact with this email already exists")
+    await bump_contacts_version_async(user["_id"])
     contact["id"] = str(result.inserted_id)  # serialize ID
     return serialize_contact(contact)
 
 
 @router.get("/")
-def get_contacts(user=Depends(get_current_user_swagger)):
-    contacts = list(contacts_collection.find({"user_id": ObjectId(user["_id"])}))
-    return [serialize_contact(c) for c in contacts]
+async def get_contacts(
+    after: Optional[str] = None,
+    limit: int = 1000,
+    fields: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    user=Depends(get_current_user_swagger)
+):
+    """
+    Contacts of the current user in _id order, paginated by `after` (last id
+    seen). `fields` is a comma separated subset of name, email, created_at,
+    user_id. format=ndjson streams every contact after `after` instead of a page.
+    """
+    projected = _contact_fields(fields)
+    query = {"user_id": ObjectId(user["_id"])}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    projection = {field: 1 for field in projected}
+    cursor = async_contacts_collection.find(query, projection).sort("_id", 1)
+
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_export(cursor, projected), media_type="application/x-ndjson")
+
+    limit = max(1, min(limit, 5000))
+    rows = [_projected_contact(c, projected) for c in await cursor.limit(limit).to_list(None)]
+    return {
+        "contacts": rows,
+        "next_after": rows[-1]["id"] if len(rows) == limit else None
+    }
+
+
+async def _ndjson_export(cursor, fields):
+    batch = []
+    async for contact in cursor.batch_size(PARSE_STREAM_BATCH):
+        batch.append(json.dumps(_projected_contact(contact, fields)) + "\n")
+        if len(batch) == PARSE_STREAM_BATCH:
+            yield "".join(batch)
+            batch = []
+    yield "".join(batch)
+
+
+@router.get("/search")
+async def search_contacts(
+    q: Optional[str] = None,
+    domain: Optional[str] = None,
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    after: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    user=Depends(get_current_user_swagger)
+):
+    """
+    Search the current user's contacts. `q` matches anywhere in the name or
+    email (its start when shorter than 3 characters), `domain` the email
+    domain, created_from / created_to the creation date. Paginated and
+    projected like GET /contacts/.
+    """
+    projected = _contact_fields(fields)
+    query = search_query(user["_id"], q=q, domain=domain, created_from=created_from, created_to=created_to)
+    if after:
+        query.setdefault("_id", {})["$gt"] = ObjectId(after)
+
+    limit = max(1, min(limit, 1000))
+    projection = {field: 1 for field in projected}
+    cursor = async_contacts_collection.find(query, projection).sort("_id", 1).limit(limit)
+    rows = [_projected_contact(c, projected) for c in await cursor.to_list(None)]
+    return {
+        "contacts": rows,
+        "next_after": rows[-1]["id"] if len(rows) == limit else None
+    }
 
 
 @router.put("/{contact_id}")
-def update_contact(contact_id: str, data: ContactUpdate, user=Depends(get_current_user_swagger)):
-    contact = contacts_collection.find_one({"_id": ObjectId(contact_id)})
+async def update_contact(contact_id: str, data: ContactUpdate, user=Depends(get_current_user_swagger)):
+    contact = await async_contacts_collection.find_one({"_id": ObjectId(contact_id)})
     if not contact or str(contact["user_id"]) != str(user["_id"]):
         raise HTTPException(404, "Contact not found")
 
     update_data = {k: v for k, v in data.dict().items() if v is not None}
-    contacts_collection.update_one({"_id": ObjectId(contact_id)}, {"$set": update_data})
+    if "email" in update_data:
+        update_data["email"] = normalize_email(update_data["email"])
+    if update_data:
+        update_data.update(search_fields(
+            update_data.get("name", contact.get("name")), update_data.get("email", contact["email"])
+        ))
+    try:
+        await async_contacts_collection.update_one({"_id": ObjectId(contact_id)}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(400, "Contact with this email already exists")
+    await bump_contacts_version_async(user["_id"])
 
     # Return updated contact
     contact.update(update_data)
@@ -56,72 +183,210 @@ def update_contact(contact_id: str, data: ContactUpdate, user=Depends(get_curren
 
 
 @router.delete("/{contact_id}")
-def delete_contact(contact_id: str, user=Depends(get_current_user_swagger)):
-    contact = contacts_collection.find_one({"_id": ObjectId(contact_id)})
+async def delete_contact(contact_id: str, user=Depends(get_current_user_swagger)):
+    contact = await async_contacts_collection.find_one({"_id": ObjectId(contact_id)})
     if not contact or str(contact["user_id"]) != str(user["_id"]):
         raise HTTPException(404, "Contact not found")
 
-    contacts_collection.delete_one({"_id": ObjectId(contact_id)})
+    await async_contacts_collection.delete_one({"_id": ObjectId(contact_id)})
+    await remove_contacts_async([contact_id])
+    await bump_contacts_version_async(user["_id"])
     return {"message": "Contact deleted"}
 
 
+# -------------------------
+# Bulk delete / update
+# -------------------------
+async def _selected_batches(data: ContactSelection, user_id):
+    """
+    Ids of the contacts a bulk request targets, CONTACT_BULK_BATCH_SIZE at a
+    time: the owned contact_ids, or the contacts matching filter read in _id
+    order. The selection is checked before the first batch is produced.
+    """
+    if bool(data.contact_ids) == bool(data.filter):
+        raise HTTPException(400, "Provide either contact_ids or filter")
+
+    if data.contact_ids:
+        contacts = await validate_contact_ids(user_id, data.contact_ids)
+        if contacts.invalid:
+            raise HTTPException(400, contacts.error_message("Invalid contact ID or contact not owned by user"))
+        for start in range(0, len(contacts.owned), CONTACT_BULK_BATCH_SIZE):
+            yield contacts.owned[start:start + CONTACT_BULK_BATCH_SIZE]
+        return
+
+    criteria = data.filter.dict(exclude_none=True)
+    if not criteria:
+        raise HTTPException(400, "filter must set at least one field")
+    query = search_query(user_id, **criteria)
+    # Keyset pages, so contacts already deleted or renamed don't shift the next page
+    while True:
+        rows = await async_contacts_collection.find(query, {"_id": 1}).sort("_id", 1).limit(
+            CONTACT_BULK_BATCH_SIZE
+        ).to_list(None)
+        if rows:
+            yield [row["_id"] for row in rows]
+        if len(rows) < CONTACT_BULK_BATCH_SIZE:
+            return
+        query["_id"] = {**query.get("_id", {}), "$gt": rows[-1]["_id"]}
+
+
+@router.post("/bulk-delete")
+async def bulk_delete_contacts(data: ContactSelection, user=Depends(get_current_user_swagger)):
+    """
+    Delete many contacts by id or by search filter. Each batch is one
+    delete_many on the contacts plus one on their group memberships.
+    """
+    uid = ObjectId(user["_id"])
+    deleted = 0
+    memberships = 0
+    async for batch in _selected_batches(data, user["_id"]):
+        result = await async_contacts_collection.delete_many({"user_id": uid, "_id": {"$in": batch}})
+        deleted += result.deleted_count
+        memberships += await remove_contacts_async(batch)
+    if deleted:
+        await bump_contacts_version_async(user["_id"])
+    return {"message": "Contacts deleted", "deleted_count": deleted, "memberships_removed": memberships}
+
+
+@router.post("/bulk-update")
+async def bulk_update_contacts(data: BulkContactUpdate, user=Depends(get_current_user_swagger)):
+    """
+    Rename many contacts and / or add them to or remove them from a group,
+    selected by id or by search filter, with one update_many per batch.
+    """
+    if data.name is None and not data.add_to_group and not data.remove_from_group:
+        raise HTTPException(400, "Nothing to update")
+
+    uid = ObjectId(user["_id"])
+    for group_id in filter(None, (data.add_to_group, data.remove_from_group)):
+        if not await async_groups_collection.find_one({"_id": ObjectId(group_id), "user_id": uid}, {"_id": 1}):
+            raise HTTPException(404, "Group not found")
+
+    matched = modified = added = removed = 0
+    async for batch in _selected_batches(data, user["_id"]):
+        matched += len(batch)
+        if data.name is not None:
+            result = await async_contacts_collection.update_many(
+                {"user_id": uid, "_id": {"$in": batch}}, [renamed_search_fields(data.name)]
+            )
+            modified += result.modified_count
+        if data.add_to_group:
+            added += await add_members_async(data.add_to_group, user["_id"], batch)
+        if data.remove_from_group:
+            removed += await remove_members_async(data.remove_from_group, batch)
+    if modified:
+        await bump_contacts_version_async(user["_id"])
+    return {
+        "message": "Contacts updated",
+        "matched_count": matched,
+        "modified_count": modified,
+        "added_to_group": added,
+        "removed_from_group": removed,
+    }
+
+
+def _json_document(contacts):
+    """The parse-import JSON body, produced a batch of contacts at a time."""
+    yield '{"message": "File parsed successfully", "contacts": ['
+    count = 0
+    batch = []
+    for contact in contacts:
+        batch.append(("," if count else "") + json.dumps(contact))
+        count += 1
+        if len(batch) == PARSE_STREAM_BATCH:
+            yield "".join(batch)
+            batch = []
+    yield "".join(batch) + f'], "count": {count}}}'
+
+
+def _ndjson(contacts):
+    batch = []
+    for contact in contacts:
+        batch.append(json.dumps(contact) + "\n")
+        if len(batch) == PARSE_STREAM_BATCH:
+            yield "".join(batch)
+            batch = []
+    yield "".join(batch)
+
+
 @router.post("/parse-import")
 async def parse_import_contacts(
     file: UploadFile = File(...),
+    format: Literal["json", "ndjson"] = "json",
     user=Depends(get_current_user_swagger)
 ):
-    if not file.filename.endswith(('.csv', '.txt')):
-        raise HTTPException(400, "Invalid file format. Please upload CSV or TXT.")
-
-    content = await file.read()
-    decoded_content = content.decode('utf-8')
-    
-    parsed_contacts = []
-    
-    if file.filename.endswith('.csv'):
-        # Expecting header: name,email OR just email
-        csv_reader = csv.reader(io.StringIO(decoded_content))
-        header = next(csv_reader, None)
-        
-        if not header:
-            raise HTTPException(400, "Empty CSV file")
-            
-        # Simple heuristic for columns
-        email_idx = -1
-        name_idx = -1
-        
-        for i, col in enumerate(header):
-            if 'email' in col.lower():
-                email_idx = i
-            elif 'name' in col.lower():
-                name_idx = i
-                
-        if email_idx == -1:
-            # Fallback: assume first column is email if no header match
-            email_idx = 0
-            
-        for row in csv_reader:
-            if not row: continue
-            
-            email = row[email_idx].strip() if len(row) > email_idx else ""
-            name = row[name_idx].strip() if name_idx != -1 and len(row) > name_idx else ""
-            
-            if email and '@' in email:
-                parsed_contacts.append({"email": email, "name": name or email.split('@')[0]})
-
-    else: # TXT
-        # One email per line
-        lines = decoded_content.splitlines()
-        for line in lines:
-            email = line.strip()
-            if email and '@' in email:
-                parsed_contacts.append({"email": email, "name": email.split('@')[0]})
+    """
+    Parse a CSV / TXT upload (optionally .gz or .zip) into contacts. The
+    response is streamed while the file is read, so memory stays flat for
+    any file size. format=ndjson returns one contact per line instead.
+    """
+    try:
+        contacts = await run_blocking(iter_contacts, file.file, file.filename or "")
+    except ImportFileError as e:
+        raise HTTPException(400, str(e))
 
-    return {
-        "message": "File parsed successfully",
-        "contacts": parsed_contacts,
-        "count": len(parsed_contacts)
-    }
+    if format == "ndjson":
+        return StreamingResponse(_ndjson(contacts), media_type="application/x-ndjson")
+    return StreamingResponse(_json_document(contacts), media_type="application/json")
+
+
+# -------------------------
+# Server-side import jobs
+# -------------------------
+@router.post("/import")
+async def start_import(
+    file: UploadFile = File(...),
+    group_id: Optional[str] = Form(None),
+    user=Depends(get_current_user_swagger)
+):
+    """
+    Import a contact file (same formats as /parse-import) entirely on the
+    server: rows are validated, de-duplicated and upserted by a background
+    job, optionally into a group. Poll /contacts/import/{job_id} for progress.
+    """
+    if group_id:
+        group = await async_groups_collection.find_one({"_id": ObjectId(group_id), "user_id": ObjectId(user["_id"])})
+        if not group:
+            raise HTTPException(404, "Group not found")
+
+    # The upload is closed with the request, the job reads its own copy
+    spool = tempfile.TemporaryFile()
+    await run_blocking(shutil.copyfileobj, file.file, spool)
+    size = spool.tell()
+    spool.seek(0)
+    try:
+        rows = await run_blocking(iter_rows, spool, file.filename or "")
+    except ImportFileError as e:
+        spool.close()
+        raise HTTPException(400, str(e))
+
+    job = ImportJob(user_id=user["_id"], filename=file.filename, size=size, group_id=group_id)
+    import_manager.submit(job, run_import_job, rows=rows, fileobj=spool)
+
+    return {"message": "Contact import queued", **job.snapshot()}
+
+
+@router.get("/import/{job_id}")
+def get_import_job(job_id: str, user=Depends(get_current_user_swagger)):
+    """
+    Progress of an import: rows read, contacts added / already present,
+    duplicates and invalid rows (with the first errors and their line numbers).
+    """
+    job = import_manager.get(job_id, user["_id"])
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return job.snapshot()
+
+
+@router.post("/import/{job_id}/cancel")
+def cancel_import_job(job_id: str, user=Depends(get_current_user_swagger)):
+    """
+    Stop an import. Batches already written stay imported.
+    """
+    job = import_manager.cancel(job_id, user["_id"])
+    if not job:
+        raise HTTPException(404, "Import job not found")
+    return {"message": "Cancellation requested", **job.snapshot()}
 
 
 from pydantic import BaseModel
@@ -132,42 +397,20 @@ class BulkImportData(BaseModel):
     group_id: Optional[str] = None
 
 @router.post("/bulk")
-def bulk_create_contacts(data: BulkImportData, user=Depends(get_current_user_swagger)):
+async def bulk_create_contacts(data: BulkImportData, user=Depends(get_current_user_swagger)):
     if not data.contacts:
         return {"message": "No contacts provided", "added_count": 0}
 
-    added_count = 0
-    contact_ids = []
-    
-    for contact in data.contacts:
-        # Check if exists
-        existing = contacts_collection.find_one({
-            "user_id": ObjectId(user["_id"]),
-            "email": contact["email"]
-        })
-        
-        if existing:
-            contact_ids.append(existing["_id"])
-            continue
-            
-        # Insert new
-        new_contact = {
-            "user_id": ObjectId(user["_id"]),
-            "name": contact.get("name", contact["email"].split('@')[0]),
-            "email": contact["email"],
-            "created_at": datetime.datetime.now(datetime.timezone.utc)
-        }
-        result = contacts_collection.insert_one(new_contact)
-        contact_ids.append(result.inserted_id)
-        added_count += 1
+    added_count, contact_ids = await upsert_contacts(user["_id"], data.contacts, collect_ids=bool(data.group_id))
 
     # Add to group if requested
     if data.group_id and contact_ids:
         try:
-            groups_collection.update_one(
-                {"_id": ObjectId(data.group_id), "user_id": ObjectId(user["_id"])},
-                {"$addToSet": {"contact_ids": {"$each": contact_ids}}}
+            group = await async_groups_collection.find_one(
+                {"_id": ObjectId(data.group_id), "user_id": ObjectId(user["_id"])}, {"_id": 1}
             )
+            if group:
+                await add_members_async(group["_id"], user["_id"], contact_ids)
         except Exception as e:
             print(f"Failed to add to group: {e}")
 
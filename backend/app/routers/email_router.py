@@ -1,16 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from bson import ObjectId
+from pymongo import ReturnDocument
 import boto3
+from botocore.config import Config
 import datetime
+import itertools
+import json
 from decouple import config
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.image import MIMEImage
 
+from app.core.concurrency import run_blocking
 from app.core.security import get_current_user_swagger
-from app.db.client import contacts_collection, groups_collection, emails_collection
+from app.db.client import emails_collection, async_emails_collection, async_deliveries_collection
 from app.schemas.email_schema import EmailSend
+from app.services.campaign_jobs import CampaignJob, job_manager
+from app.services.recipient_service import resolve_recipients, split_form_list
+from app.services.segments import SegmentError, parse_segment
+from app.services.suppression_service import suppression_index
+from app.services.unsubscribe_tokens import UnsubscribeSigner
+from app.services.delivery_records import (
+    DeliveryRecorder,
+    claim_dead_letters,
+    delivery_counts,
+    fail_in_flight,
+    pending_emails,
+    release_dead_letters,
+    resolve_dead_letters,
+    serialize_delivery,
+)
+from app.services.campaign_images import delete_images, load_images, store_images
+from app.services.ses_dispatcher import dispatcher, chunked, SES_MAX_CONCURRENCY, SES_MAX_RECIPIENTS
+from app.services.ses_templates import (
+    TEMPLATE_BATCH_SIZE,
+    template_name_for,
+    create_campaign_template,
+    delete_campaign_template,
+    send_templated_batch,
+)
+from app.services.mime_builder import NewsletterSkeleton, TransactionalMessage, inject_unsubscribe_footer
 
 router = APIRouter(prefix="/email", tags=["Email"])
 
@@ -18,11 +46,17 @@ ses = boto3.client(
     "ses",
     aws_access_key_id=config("AWS_ACCESS_KEY_ID"),
     aws_secret_access_key=config("AWS_SECRET_ACCESS_KEY"),
-    region_name=config("AWS_REGION")
+    region_name=config("AWS_REGION"),
+    # One pooled HTTP connection per concurrent dispatcher worker; retries are
+    # left to the dispatcher so throttling also slows down the shared send rate
+    config=Config(max_pool_connections=SES_MAX_CONCURRENCY, retries={"mode": "standard", "max_attempts": 1})
 )
 
 MAX_EMAIL_SIZE = 9 * 1024 * 1024
 
+# Recipients claimed per newsletter checkpoint
+CHECKPOINT_BATCH_SIZE = config("CAMPAIGN_CHECKPOINT_BATCH_SIZE", default=500, cast=int)
+
 
 # -------------------------
 # Newsletter HTML builder
@@ -31,73 +65,138 @@ MAX_EMAIL_SIZE = 9 * 1024 * 1024
 
 
 
+def _parsed_segment(segment):
+    """Segment of a send request (a dict, or JSON text from a form), or None."""
+    if not segment:
+        return None
+    try:
+        if isinstance(segment, str):
+            segment = json.loads(segment)
+        return parse_segment(segment)
+    except json.JSONDecodeError:
+        raise HTTPException(400, "segment must be a JSON object.")
+    except SegmentError as e:
+        raise HTTPException(400, f"Invalid segment: {e}")
+
+
 # -------------------------
 # 1️⃣ Normal Email endpoint
 # -------------------------
 @router.post("/send")
 def send_normal_email(data: EmailSend, user=Depends(get_current_user_swagger)):
 
-    recipients = set()
-
-    # Manual emails
-    if data.to_emails:
-        if "ALL" in [e.upper() for e in data.to_emails]:
-            all_contacts = contacts_collection.find({"user_id": ObjectId(user["_id"])}, {"email": 1})
-            recipients.update([c["email"].lower() for c in all_contacts if "email" in c])
-        else:
-            recipients.update([e.lower() for e in data.to_emails])
-
-    # Groups
-    if data.group_ids:
-        for gid in data.group_ids:
-            try:
-                group = groups_collection.find_one({"_id": ObjectId(gid)})
-            except:
-                continue
-            if not group or str(group["user_id"]) != user["_id"]:
-                continue
-            contact_ids = group.get("contact_ids", [])
-            contact_object_ids = [ObjectId(cid) for cid in contact_ids]
-            contacts = contacts_collection.find({
-                "_id": {"$in": contact_object_ids},
-                "user_id": ObjectId(user["_id"])
-            })
-            recipients.update([c["email"].lower() for c in contacts if "email" in c])
-
-    # Send to all
-    if getattr(data, "send_to_all", False):
-        all_contacts = contacts_collection.find({"user_id": ObjectId(user["_id"])}, {"email": 1})
-        recipients.update([c["email"].lower() for c in all_contacts if "email" in c])
-
-    if not recipients:
+    manual_emails = data.to_emails or []
+    send_to_all = bool(getattr(data, "send_to_all", False))
+
+    # "ALL" in the manual list means every contact
+    if any(e.upper() == "ALL" for e in manual_emails):
+        manual_emails = []
+        send_to_all = True
+
+    audience = resolve_recipients(
+        user["_id"],
+        emails=manual_emails,
+        group_ids=data.group_ids,
+        send_to_all=send_to_all,
+        segment=_parsed_segment(data.segment)
+    )
+    recipients_count = audience.count()
+    if not recipients_count:
         raise HTTPException(400, "No recipients found.")
 
-    recipients = list(recipients)
+    # Send via SES, at most 50 recipients per call, batches in parallel
+    campaign_id = ObjectId()
+    job = CampaignJob(user_id=user["_id"], kind="normal", total=recipients_count, job_id=str(campaign_id))
+    audience.on_suppressed = lambda email: job.record_skipped()
 
-    # Send via SES
-    try:
-        ses.send_email(
-            Source=config("SES_FROM_EMAIL"),
-            Destination={"ToAddresses": recipients},
-            Message={
-                "Subject": {"Data": data.subject},
-                "Body": {"Html": {"Data": data.body}}
-            }
+    with DeliveryRecorder(campaign_id, user["_id"]) as recorder:
+        batches = dispatcher.dispatch_batches(
+            audience, _recorded(_html_batch_sender(data.subject, data.body), recorder), job
         )
-    except Exception as e:
-        raise HTTPException(500, f"Email sending failed: {str(e)}")
+    status = _batch_status(job)
 
-    # Log
-    emails_collection.insert_one({
+    # Log (aggregate counters only, per-recipient rows live in the deliveries collection)
+    log = emails_collection.insert_one({
+        "_id": campaign_id,
         "user_id": ObjectId(user["_id"]),
         "subject": data.subject,
         "body": data.body,
-        "sent_to": recipients,
+        "recipients_count": recipients_count,
         "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "status": "success"
+        "status": status,
+        "sent_count": job.sent,
+        "failed_count": job.failed,
+        "suppressed_count": job.skipped
     })
+    if status == "failed":
+        return _failed_send("Email sending failed", campaign_id, job, batches)
 
-    return {"message": "Normal email sent successfully", "recipients": recipients}
+    return {
+        "message": "Normal email sent successfully" if status == "success" else "Normal email partially sent",
+        "status": status,
+        "log_id": str(log.inserted_id),
+        "recipients_count": recipients_count,
+        "sent_count": job.sent,
+        "failed_count": job.failed,
+        "suppressed_count": job.skipped,
+        "batch_count": batches["count"],
+        "failed_batches": batches["failed"],
+        "resolution_timings": audience.timings
+    }
+
+
+def _html_batch_sender(subject, body):
+    """send_email to one batch of recipients, retried through the dispatcher."""
+    def send_batch(batch):
+        return dispatcher.call(
+            ses.send_email,
+            cost=len(batch),
+            Source=config("SES_FROM_EMAIL"),
+            Destination={"ToAddresses": batch},
+            Message={
+                "Subject": {"Data": subject},
+                "Body": {"Html": {"Data": body}}
+            }
+        )
+    return send_batch
+
+
+def _recorded(send_batch, recorder):
+    """Wrap a batch sender so every recipient gets a delivery record."""
+    def send(batch):
+        try:
+            response = send_batch(batch)
+        except Exception as e:
+            for email in batch:
+                recorder.failed(email, e)
+            raise
+        message_id = (response or {}).get("MessageId")
+        for email in batch:
+            recorder.sent(email, message_id)
+    return send
+
+
+def _batch_status(job):
+    """"success", "partial" or "failed" (every send failed) for a finished send job."""
+    if job.failed and not job.sent:
+        return "failed"
+    return "partial" if job.failed else "success"
+
+
+def _failed_send(error_prefix, log_id, job, batches):
+    """
+    500 for a send where every batch failed. The email log is already
+    written, so its dead-lettered recipients can be replayed via log_id.
+    """
+    errors = "; ".join(sorted({b["error"] for b in batches["failed"]}))
+    return JSONResponse(status_code=500, content={
+        "detail": f"{error_prefix}: {errors}",
+        "status": "failed",
+        "log_id": str(log_id),
+        "failed_count": job.failed,
+        "suppressed_count": job.skipped,
+        "failed_batches": batches["failed"],
+    })
 
 
 # -------------------------
@@ -110,40 +209,26 @@ async def send_newsletter_email(
     to_emails: Optional[str] = Form(None),
     group_ids: Optional[str] = Form(None),
     send_to_all: bool = Form(False),
+    segment: Optional[str] = Form(None),
     inline_images: Optional[List[UploadFile]] = File(default=None),
+    delivery_mode: str = Form("raw"),
     user=Depends(get_current_user_swagger)
 ):
-
-    recipients = set()
-
-    # Manual emails
-    if to_emails:
-        recipients.update([e.strip().lower() for e in to_emails.split(",") if e.strip()])
-
-    # Groups
-    if group_ids:
-        for gid in [g.strip() for g in group_ids.split(",") if g.strip()]:
-            try:
-                group = groups_collection.find_one({"_id": ObjectId(gid)})
-                if group:
-                    ids = [ObjectId(cid) for cid in group.get("contact_ids", [])]
-                    contacts = contacts_collection.find({"_id": {"$in": ids}})
-                    for c in contacts:
-                        recipients.add(c["email"].lower())
-            except:
-                continue
-
-    # Send to all
-    if send_to_all:
-        contacts = contacts_collection.find({"user_id": ObjectId(user["_id"])})
-        for c in contacts:
-            recipients.add(c["email"].lower())
-
-    if not recipients:
+    if delivery_mode not in ("raw", "template"):
+        raise HTTPException(400, "delivery_mode must be 'raw' or 'template'.")
+
+    audience = resolve_recipients(
+        user["_id"],
+        emails=split_form_list(to_emails),
+        group_ids=split_form_list(group_ids),
+        send_to_all=send_to_all,
+        segment=_parsed_segment(segment)
+    )
+    # Blocking Mongo / SES work runs on the I/O executor, never on the event loop
+    recipients_count = await run_blocking(audience.count)
+    if not recipients_count:
         raise HTTPException(400, "No recipients found.")
 
-    recipients = list(recipients)
-
     # Inline images
     inline_cids = []
     inline_files = []
@@ -174,6 +259,10 @@ async def send_newsletter_email(
         inline_cids.append(cid)
         inline_files.append(file.filename)
 
+    # SES templates carry HTML only, inline images need raw MIME
+    if delivery_mode == "template" and processed_images:
+        raise HTTPException(400, "Templated delivery does not support inline images.")
+
     # Build HTML
     # The body now contains the full HTML from the frontend
     final_html = body
@@ -201,124 +290,289 @@ async def send_newsletter_email(
         else:
             final_html += image_rows
 
-    # Build MIME base
-    base_root = MIMEMultipart("related")
-    base_root["Subject"] = subject
-    base_root["From"] = config("SES_FROM_EMAIL")
-    
-    # We will clone this for each recipient or rebuild parts
-    # Actually, to be safe and avoid shared state issues with MIME objects, 
-    # let's build the common parts first (images) and then loop.
-
-    # Send to each recipient individually
-    sent_count = 0
-    failed_count = 0
-    
-    for recipient_email in recipients:
-        try:
-            # 1. Prepare Body with Unsubscribe Link
-            unsubscribe_url = f"http://13.61.21.175:9000/unsubscribe?email={recipient_email}"
-            
-            unsubscribe_footer = f"""
-            <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; font-size: 12px; color: #888;">
-                <p>You received this email because you are subscribed to our newsletter.</p>
-                <p><a href="{unsubscribe_url}" style="color: #888; text-decoration: underline;">Unsubscribe</a></p>
-            </div>
-            """
-            
-            # Inject footer safely
-            current_html = final_html
-            if "<!-- UNSUBSCRIBE_PLACEHOLDER -->" in current_html:
-                # Use the placeholder
-                # We use a simpler footer since it's inside the template's footer area
-                simple_footer = f"""
-                <div style="margin-top: 10px; font-size: 11px; color: #888;">
-                    <p>You received this email because you are subscribed to our newsletter.</p>
-                    <p><a href="{unsubscribe_url}" style="color: #888; text-decoration: underline;">Unsubscribe</a></p>
-                </div>
-                """
-                current_html = current_html.replace("<!-- UNSUBSCRIBE_PLACEHOLDER -->", simple_footer)
-            elif "</body>" in current_html:
-                # Insert before closing body tag (Fallback)
-                current_html = current_html.replace("</body>", f"{unsubscribe_footer}</body>")
-            else:
-                # Append if no body tag (fragment)
-                current_html += unsubscribe_footer
-
-            # 2. Build MIME for this recipient
-            msg = MIMEMultipart("related")
-            msg["Subject"] = subject
-            msg["From"] = config("SES_FROM_EMAIL")
-            msg["To"] = recipient_email
-            
-            # Add Promotional/Bulk Headers
-            msg.add_header("Precedence", "bulk")
-            msg.add_header("X-Auto-Response-Suppress", "OOF, DR, RN, NRN, AutoReply")
-            msg.add_header("List-Unsubscribe", f"<{unsubscribe_url}>")
-            msg.add_header("List-Unsubscribe-Post", "List-Unsubscribe=One-Click")
-
-            alt = MIMEMultipart("alternative")
-            msg.attach(alt)
-            alt.attach(MIMEText(current_html, "html", "utf-8"))
-
-            # Attach inline images
-            for img_data in processed_images:
-                img = MIMEImage(img_data["content"])
-                img.add_header("Content-ID", f"<{img_data['cid']}>")
-                img.add_header("Content-Disposition", "inline", filename=img_data["filename"])
-                msg.attach(img)
-
-            # Send via SES
-            ses.send_raw_email(
-                Source=config("SES_FROM_EMAIL"),
-                Destinations=[recipient_email],
-                RawMessage={"Data": msg.as_string()}
-            )
-            sent_count += 1
-            
-        except Exception as e:
-            print(f"Failed to send to {recipient_email}: {e}")
-            failed_count += 1
-            continue
-            
-        except Exception as e:
-            print(f"Failed to send to {recipient_email}: {e}")
-            failed_count += 1
-            continue
-
-    # Log (summary)
-    emails_collection.insert_one({
+    # The campaign is stored up front together with everything needed to
+    # finish it, so a restarted server can pick it up (see resume_campaigns)
+    campaign_id = ObjectId()
+    image_refs = await run_blocking(store_images, campaign_id, processed_images)
+    await run_blocking(emails_collection.insert_one, {
+        "_id": campaign_id,
         "user_id": ObjectId(user["_id"]),
         "subject": subject,
         "body": body,
-        "sent_to": recipients,
+        "recipients_count": recipients_count,
         "inline_images": inline_files,
         "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "status": "success",
-        "sent_count": sent_count,
-        "failed_count": failed_count
+        "status": "sending",
+        "sent_count": 0,
+        "failed_count": 0,
+        "job_id": str(campaign_id),
+        "delivery_mode": delivery_mode,
+        "resume": {
+            "html": final_html,
+            "audience": audience.spec(),
+            "images": image_refs,
+            "checkpoint": None
+        }
     })
 
+    job = CampaignJob(user_id=user["_id"], kind="newsletter", total=recipients_count, job_id=str(campaign_id))
+    job_manager.submit(
+        job,
+        _run_newsletter_job,
+        user_id=user["_id"],
+        subject=subject,
+        final_html=final_html,
+        recipients=audience,
+        processed_images=processed_images,
+        delivery_mode=delivery_mode,
+    )
+
     return {
-        "message": "Newsletter email sent successfully",
-        "recipients": recipients,
-        "recipients_count": len(recipients),
-        "sent_count": sent_count,
-        "inline_images": inline_files
+        "message": "Newsletter campaign queued",
+        "job_id": job.id,
+        "recipients_count": recipients_count,
+        "inline_images": inline_files,
+        "delivery_mode": delivery_mode,
+        "resolution_timings": audience.timings
     }
 
 
+def _run_newsletter_job(job, user_id, subject, final_html, recipients, processed_images, delivery_mode="raw", requeued=()):
+    """
+    Worker side of /send/newsletter: sends the campaign and reports progress
+    on the job. Runs on the campaign worker pool; `recipients` is streamed and
+    the individual SES calls fan out over the rate-limited dispatcher.
+    `requeued` are emails an interrupted run claimed but never sent; they go first.
+
+    A run that dies on an error (Mongo or SES outage) is logged as
+    "interrupted" and keeps its resume data, so resume_campaigns picks it up.
+    """
+    # The job id doubles as the campaign (log) id that delivery records point at
+    status = "interrupted"
+    recorder = DeliveryRecorder(job.id, user_id, claims=True)
+    recipients.on_suppressed = lambda email: job.record_skipped()
+
+    def unsubscribed_since(email):
+        job.record_skipped()
+        recorder.release(email)
+
+    try:
+        with recorder:
+            claimed = itertools.chain(
+                suppression_index.filter(user_id, requeued, on_skip=unsubscribed_since),
+                _checkpointed(job, recipients, recorder)
+            )
+            if delivery_mode == "template":
+                _send_newsletter_templated(job, subject, final_html, claimed, recorder)
+            else:
+                _send_newsletter_raw(job, subject, final_html, claimed, processed_images, recorder)
+        status = "cancelled" if job.cancelled else _batch_status(job)
+    finally:
+        update = {"$set": {
+            "status": status,
+            "sent_count": job.sent,
+            "failed_count": job.failed,
+            "suppressed_count": job.skipped,
+            # stream_ms is only known once the audience has been read
+            "resolution_timings": recipients.timings,
+            "finished_at": datetime.datetime.now(datetime.timezone.utc)
+        }}
+        # The content is only kept while the campaign may still be resumed or its dead letters replayed
+        done = status != "interrupted" and not recorder.dead_lettered
+        if done:
+            update["$unset"] = {"resume": ""}
+        emails_collection.update_one({"_id": ObjectId(job.id)}, update)
+        if done and processed_images:
+            delete_images(job.id)
+
+
+def _checkpointed(job, recipients, recorder):
+    """
+    Claim recipients in CHECKPOINT_BATCH_SIZE slices before they are sent.
+
+    Claiming writes a "pending" delivery row per email; the unique
+    (campaign_id, email) index drops emails a previous run already claimed.
+    Afterwards the campaign's checkpoint moves to the last email of the slice,
+    so a resumed run starts streaming right after it.
+    """
+    for batch in chunked(recipients, CHECKPOINT_BATCH_SIZE):
+        if job.cancelled:
+            return
+        claimed = recorder.claim(batch)
+        emails_collection.update_one({"_id": ObjectId(job.id)}, {"$set": {
+            "resume.checkpoint": batch[-1],
+            "sent_count": job.sent,
+            "failed_count": job.failed,
+            "suppressed_count": job.skipped
+        }})
+        yield from claimed
+
+
+def resume_campaigns():
+    """
+    Re-queue newsletters that were still sending when the server went down,
+    or whose run was interrupted by an error.
+
+    Deliveries left "pending" were claimed but never handed to SES, so they
+    are sent first. Deliveries left "sending" may or may not have reached SES,
+    so they are marked failed instead of being retried: a recipient never gets
+    the same campaign twice. Everything after the checkpoint is sent as usual.
+    """
+    try:
+        campaigns = list(emails_collection.find(
+            {"status": {"$in": ["sending", "interrupted"]}, "resume": {"$exists": True}}
+        ))
+    except Exception as e:
+        print(f"Could not look up unfinished campaigns: {e}")
+        return []
+
+    jobs = []
+    for campaign in campaigns:
+        resume = campaign["resume"]
+        fail_in_flight(campaign["_id"], "interrupted")
+        requeued = pending_emails(campaign["_id"])
+        counts = delivery_counts(campaign["_id"])
+
+        audience = resolve_recipients(campaign["user_id"], **resume["audience"])
+        if resume.get("checkpoint"):
+            audience = audience.resumed_after(resume["checkpoint"])
+
+        job = CampaignJob(
+            user_id=campaign["user_id"],
+            kind="newsletter",
+            total=campaign["recipients_count"],
+            job_id=str(campaign["_id"])
+        )
+        job.record_sent(counts["sent"])
+        job.record_failed(counts["failed"])
+        job.record_skipped(campaign.get("suppressed_count", 0))
+        job_manager.submit(
+            job,
+            _run_newsletter_job,
+            user_id=campaign["user_id"],
+            subject=campaign["subject"],
+            final_html=resume["html"],
+            recipients=audience,
+            processed_images=load_images(resume.get("images")),
+            delivery_mode=campaign.get("delivery_mode", "raw"),
+            requeued=requeued,
+        )
+        print(
+            f"Resuming campaign {job.id} after {resume.get('checkpoint')!r} "
+            f"({counts['sent']} already sent, {len(requeued)} re-queued)"
+        )
+        jobs.append(job)
+    return jobs
+
+
+def _send_newsletter_raw(job, subject, final_html, recipients, processed_images, recorder):
+    """One send_raw_email per recipient, with inline images and List-Unsubscribe headers."""
+    # Inline images are base64-encoded once for the whole campaign
+    skeleton = NewsletterSkeleton(subject, config("SES_FROM_EMAIL"), processed_images)
+    signer = UnsubscribeSigner(recorder.user_id, recorder.campaign_id)
+
+    def send_one(recipient_email):
+        unsubscribe_url = signer.url(recipient_email)
+        current_html = inject_unsubscribe_footer(final_html, unsubscribe_url)
+
+        try:
+            response = dispatcher.call(
+                ses.send_raw_email,
+                Source=config("SES_FROM_EMAIL"),
+                Destinations=[recipient_email],
+                RawMessage={"Data": skeleton.render(recipient_email, current_html, unsubscribe_url)}
+            )
+        except Exception as e:
+            recorder.failed(recipient_email, e)
+            raise
+        recorder.sent(recipient_email, response.get("MessageId"))
+
+    dispatcher.dispatch(_marked_sending(recipients, recorder), send_one, job)
+
+
+def _marked_sending(recipients, recorder, size=SES_MAX_RECIPIENTS):
+    """
+    Mark recipients "sending" one slice (one write) at a time, as the
+    dispatcher pulls them. A crash then fails at most the slices in flight.
+    """
+    for batch in chunked(recipients, size):
+        recorder.sending(batch)
+        yield from batch
+
+
+def _send_newsletter_templated(job, subject, final_html, recipients, recorder):
+    """
+    Register the campaign as an SES template and send it with
+    SendBulkTemplatedEmail, 50 destinations per call.
+    """
+    template_name = template_name_for(job.id)
+    signer = UnsubscribeSigner(recorder.user_id, recorder.campaign_id)
+    create_campaign_template(ses, template_name, subject, final_html)
+    try:
+        dispatcher.dispatch(
+            chunked(recipients, TEMPLATE_BATCH_SIZE),
+            lambda batch: send_templated_batch(
+                ses, config("SES_FROM_EMAIL"), template_name, batch, signer.url, recorder,
+                call=dispatcher.call
+            ),
+            job,
+            cost=len,
+        )
+    finally:
+        delete_campaign_template(ses, template_name)
+
+
+# -------------------------
+# Campaign progress endpoints
+# -------------------------
+@router.get("/campaigns")
+def list_campaign_jobs(user=Depends(get_current_user_swagger)):
+    """
+    List background campaign jobs of the current user, newest first.
+    """
+    return [job.snapshot() for job in job_manager.list(user["_id"])]
+
+
+@router.get("/campaigns/{job_id}")
+def get_campaign_job(job_id: str, user=Depends(get_current_user_swagger)):
+    """
+    Live progress for one campaign: sent, failed, remaining and send rate (msgs/s).
+    """
+    job = job_manager.get(job_id, user["_id"])
+    if not job:
+        raise HTTPException(404, "Campaign job not found")
+    return job.snapshot()
+
+
+@router.post("/campaigns/{job_id}/cancel")
+def cancel_campaign_job(job_id: str, user=Depends(get_current_user_swagger)):
+    """
+    Stop a queued or running campaign. Messages already handed to SES are not recalled.
+    """
+    job = job_manager.cancel(job_id, user["_id"])
+    if not job:
+        raise HTTPException(404, "Campaign job not found")
+    return {"message": "Cancellation requested", **job.snapshot()}
+
+
 
 # Get Email Logs endpoint
 
 @router.get("/logs")
-def get_email_logs(user=Depends(get_current_user_swagger)):
+async def get_email_logs(user=Depends(get_current_user_swagger)):
     """
     Fetch email logs for the current user.
     """
-    logs = list(emails_collection.find(
-        {"user_id": ObjectId(user["_id"])}
-    ).sort("created_at", -1))
+    cursor = await async_emails_collection.aggregate([
+        {"$match": {"user_id": ObjectId(user["_id"])}},
+        {"$sort": {"created_at": -1}},
+        # Older logs embedded the full sent_to list; only its size is returned
+        {"$addFields": {"recipients_count": {
+            "$ifNull": ["$recipients_count", {"$size": {"$ifNull": ["$sent_to", []]}}]
+        }}},
+        {"$project": {"sent_to": 0, "resume": 0}},
+    ])
+    logs = await cursor.to_list(None)
 
     # Convert ObjectId to string and handle other non-serializable fields
     for log in logs:
@@ -338,11 +592,119 @@ def get_email_logs(user=Depends(get_current_user_swagger)):
     return logs
 
 
+@router.get("/logs/{log_id}/deliveries")
+async def get_email_deliveries(
+    log_id: str,
+    status: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 100,
+    user=Depends(get_current_user_swagger)
+):
+    """
+    Per-recipient delivery records of one email log, paginated by `after` (last id seen).
+    """
+    query = {"campaign_id": ObjectId(log_id), "user_id": ObjectId(user["_id"])}
+    if status:
+        query["status"] = status
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+
+    limit = max(1, min(limit, 1000))
+    cursor = async_deliveries_collection.find(query).sort("_id", 1).limit(limit)
+    rows = [serialize_delivery(r) for r in await cursor.to_list(None)]
+    return {
+        "deliveries": rows,
+        "next_after": rows[-1]["id"] if len(rows) == limit else None
+    }
+
+
+@router.post("/logs/{log_id}/replay")
+def replay_dead_letters(log_id: str, user=Depends(get_current_user_swagger)):
+    """
+    Re-send every dead-lettered recipient of an email log (throttled, SES
+    outage, daily quota) as a background job. Progress is on /email/campaigns.
+    """
+    log = emails_collection.find_one({"_id": ObjectId(log_id), "user_id": ObjectId(user["_id"])})
+    if not log:
+        raise HTTPException(404, "Email log not found")
+    if log.get("status") == "sending":
+        raise HTTPException(409, "Campaign is still sending.")
+    if log.get("status") == "interrupted":
+        raise HTTPException(409, "Campaign was interrupted and is resumed on the next restart.")
+    if log.get("attachments"):
+        raise HTTPException(400, "Emails with attachments cannot be replayed.")
+    if "delivery_mode" in log and not log.get("resume"):
+        raise HTTPException(400, "Campaign content is no longer available.")
+
+    replay_id = ObjectId()
+    emails = claim_dead_letters(log["_id"], replay_id)
+    if not emails:
+        raise HTTPException(400, "No dead-lettered recipients to replay.")
+
+    job = CampaignJob(user_id=user["_id"], kind="replay", total=len(emails))
+    job_manager.submit(job, _run_replay_job, log=log, emails=emails, replay_id=replay_id)
+
+    return {
+        "message": "Replay queued",
+        "job_id": job.id,
+        "log_id": log_id,
+        "recipients_count": len(emails)
+    }
+
+
+def _run_replay_job(job, log, emails, replay_id):
+    """
+    Send a log's content again to `emails` and fold the outcome into the log.
+    The claimed dead letters are dropped as outcomes are recorded; any left
+    when the job stops (e.g. on an error) are released for the next replay.
+    """
+    suppressed = []
+
+    def unsubscribed_since(email):
+        job.record_skipped()
+        suppressed.append(email)
+
+    try:
+        # Addresses may have been suppressed since they were dead-lettered
+        emails = list(suppression_index.filter(log["user_id"], emails, on_skip=unsubscribed_since))
+        resolve_dead_letters(log["_id"], replay_id, suppressed)
+        with DeliveryRecorder(log["_id"], log["user_id"], claims=True, replay_id=replay_id) as recorder:
+            if "delivery_mode" in log:
+                resume = log["resume"]
+                if log["delivery_mode"] == "template":
+                    _send_newsletter_templated(job, log["subject"], resume["html"], emails, recorder)
+                else:
+                    _send_newsletter_raw(job, log["subject"], resume["html"], emails, load_images(resume.get("images")), recorder)
+            else:
+                dispatcher.dispatch_batches(emails, _recorded(_html_batch_sender(log["subject"], log["body"]), recorder), job)
+    finally:
+        release_dead_letters(log["_id"], replay_id)
+
+    # Deltas, so updates made to the log meanwhile are not overwritten
+    updated = emails_collection.find_one_and_update(
+        {"_id": log["_id"]},
+        {"$inc": {"sent_count": job.sent, "failed_count": -(job.sent + job.skipped)}},
+        return_document=ReturnDocument.AFTER,
+    ) or log
+    update = {"$set": {}}
+    if updated.get("status") in ("partial", "failed") and updated.get("failed_count", 0) <= 0:
+        update["$set"]["status"] = "success"
+    elif updated.get("status") == "failed" and job.sent:
+        update["$set"]["status"] = "partial"
+    done = "delivery_mode" in log and not recorder.dead_lettered
+    if done:
+        update["$unset"] = {"resume": ""}
+    if not update["$set"]:
+        del update["$set"]
+    if update:
+        emails_collection.update_one({"_id": log["_id"]}, update)
+    if done and log["resume"].get("images"):
+        delete_images(log["_id"])
+
+
 # -------------------------
 # 3️⃣ Transactional Email endpoint (with attachments)
 # -------------------------
-from email.mime.application import MIMEApplication
-
 @router.post("/send/transactional")
 async def send_transactional_email(
     subject: str = Form(...),
@@ -350,41 +712,23 @@ async def send_transactional_email(
     to_emails: Optional[str] = Form(None),
     group_ids: Optional[str] = Form(None),
     send_to_all: bool = Form(False),
+    segment: Optional[str] = Form(None),
     attachments: Optional[List[UploadFile]] = File(default=None),
     user=Depends(get_current_user_swagger)
 ):
-    recipients = set()
-
-    # Manual emails
-    if to_emails:
-        recipients.update([e.strip().lower() for e in to_emails.split(",") if e.strip()])
-
-    # Groups
-    if group_ids:
-        for gid in [g.strip() for g in group_ids.split(",") if g.strip()]:
-            try:
-                group = groups_collection.find_one({"_id": ObjectId(gid)})
-                if group:
-                    ids = [ObjectId(cid) for cid in group.get("contact_ids", [])]
-                    contacts = contacts_collection.find({"_id": {"$in": ids}})
-                    for c in contacts:
-                        recipients.add(c["email"].lower())
-            except:
-                continue
-
-    # Send to all
-    if send_to_all:
-        contacts = contacts_collection.find({"user_id": ObjectId(user["_id"])})
-        for c in contacts:
-            recipients.add(c["email"].lower())
-
-    if not recipients:
+    audience = resolve_recipients(
+        user["_id"],
+        emails=split_form_list(to_emails),
+        group_ids=split_form_list(group_ids),
+        send_to_all=send_to_all,
+        segment=_parsed_segment(segment)
+    )
+    recipients_count = await run_blocking(audience.count)
+    if not recipients_count:
         raise HTTPException(400, "No recipients found.")
 
-    recipients = list(recipients)
-
     # Process attachments
-    attachment_parts = []
+    attachment_files = []
     attachment_names = []
     
     if attachments:
@@ -401,55 +745,66 @@ async def send_transactional_email(
             if total_size > MAX_EMAIL_SIZE:
                 raise HTTPException(400, "Total email size too large for SES.")
 
-            part = MIMEApplication(content)
-            part.add_header(
-                "Content-Disposition",
-                "attachment",
-                filename=file.filename
-            )
-            attachment_parts.append(part)
+            attachment_files.append({"content": content, "filename": file.filename})
             attachment_names.append(file.filename)
 
-    # Build MIME
-    root = MIMEMultipart("mixed")
-    root["Subject"] = subject
-    root["From"] = config("SES_FROM_EMAIL")
-    root["To"] = ", ".join(recipients)
+    # The whole send blocks on SES and Mongo, so it runs on the I/O executor
+    return await run_blocking(
+        _send_transactional, user, subject, body, audience, recipients_count, attachment_files, attachment_names
+    )
 
-    # Body
-    body_part = MIMEMultipart("alternative")
-    body_part.attach(MIMEText(body, "html", "utf-8"))
-    root.attach(body_part)
 
-    # Attachments
-    for part in attachment_parts:
-        root.attach(part)
+def _send_transactional(user, subject, body, audience, recipients_count, attachment_files, attachment_names):
+    """Blocking part of /send/transactional: batch the message out over SES and log it."""
+    # Build MIME once (attachments are encoded a single time), then address it per batch
+    message = TransactionalMessage(subject, config("SES_FROM_EMAIL"), body, attachment_files)
+    campaign_id = ObjectId()
+    job = CampaignJob(user_id=user["_id"], kind="transactional", total=recipients_count, job_id=str(campaign_id))
+    audience.on_suppressed = lambda email: job.record_skipped()
 
-    # Send via SES
-    try:
-        ses.send_raw_email(
+    def send_batch(batch):
+        return dispatcher.call(
+            ses.send_raw_email,
+            cost=len(batch),
             Source=config("SES_FROM_EMAIL"),
-            Destinations=recipients,
-            RawMessage={"Data": root.as_string()}
+            Destinations=batch,
+            RawMessage={"Data": message.render(batch)}
         )
-    except Exception as e:
-        raise HTTPException(500, f"Transactional email sending failed: {str(e)}")
+
+    # Send via SES
+    with DeliveryRecorder(campaign_id, user["_id"]) as recorder:
+        batches = dispatcher.dispatch_batches(audience, _recorded(send_batch, recorder), job)
+    status = _batch_status(job)
 
     # Log
-    emails_collection.insert_one({
+    log = emails_collection.insert_one({
+        "_id": campaign_id,
         "user_id": ObjectId(user["_id"]),
         "subject": subject,
         "body": body,
-        "sent_to": recipients,
+        "recipients_count": recipients_count,
         "attachments": attachment_names,
         "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "status": "success",
-        "type": "transactional"
+        "status": status,
+        "type": "transactional",
+        "sent_count": job.sent,
+        "failed_count": job.failed,
+        "suppressed_count": job.skipped
     })
+    if status == "failed":
+        return _failed_send("Transactional email sending failed", campaign_id, job, batches)
 
     return {
-        "message": "Transactional email sent successfully",
-        "recipients": recipients,
-        "attachments": attachment_names
+        "message": "Transactional email sent successfully" if status == "success" else "Transactional email partially sent",
+        "status": status,
+        "log_id": str(log.inserted_id),
+        "recipients_count": recipients_count,
+        "attachments": attachment_names,
+        "sent_count": job.sent,
+        "failed_count": job.failed,
+        "suppressed_count": job.skipped,
+        "batch_count": batches["count"],
+        "failed_batches": batches["failed"],
+        "resolution_timings": audience.timings
     }
 
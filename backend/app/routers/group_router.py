@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from bson import ObjectId
 from app.core.security import get_current_user_swagger
-from app.db.client import groups_collection, contacts_collection
+from app.db.client import async_groups_collection, async_group_members_collection
 from app.schemas.group_schema import GroupCreate, GroupUpdate
+from app.services.contact_ownership import validate_contact_ids
+from app.services.group_members import (
+    add_members_async, member_counts_async, member_ids_async, replace_members_async
+)
 from pydantic import BaseModel
 from typing import List
 import datetime
@@ -14,66 +18,86 @@ class GroupResponse(BaseModel):
     id: str
     group_name: str
     contact_ids: List[str]
+    contact_count: int
+    created_at: str
+
+class GroupListItem(BaseModel):
+    id: str
+    group_name: str
+    contact_count: int
     created_at: str
 
 # ------------------ CREATE GROUP ------------------
 @router.post("/", response_model=GroupResponse)
-def create_group(data: GroupCreate, user=Depends(get_current_user_swagger)):
+async def create_group(data: GroupCreate, user=Depends(get_current_user_swagger)):
     # Verify all contacts exist + belong to the user
-    for cid in data.contact_ids:
-        contact = contacts_collection.find_one({"_id": ObjectId(cid)})
-        if not contact or str(contact["user_id"]) != str(user["_id"]):
-            raise HTTPException(400, "Invalid contact ID or contact not owned by user")
+    contacts = await validate_contact_ids(user["_id"], data.contact_ids)
+    if contacts.invalid:
+        raise HTTPException(400, contacts.error_message("Invalid contact ID or contact not owned by user"))
 
     group = {
         "user_id": ObjectId(user["_id"]),
         "group_name": data.group_name,
-        "contact_ids": [ObjectId(cid) for cid in data.contact_ids],
+        "member_count": 0,
         "created_at": datetime.datetime.utcnow()
     }
 
-    result = groups_collection.insert_one(group)
+    result = await async_groups_collection.insert_one(group)
+    await add_members_async(result.inserted_id, user["_id"], contacts.owned)
 
     return GroupResponse(
         id=str(result.inserted_id),
         group_name=group["group_name"],
-        contact_ids=[str(cid) for cid in group["contact_ids"]],
+        contact_ids=[str(cid) for cid in contacts.owned],
+        contact_count=len(contacts.owned),
         created_at=group["created_at"].isoformat()
     )
 
 # ------------------ GET ALL GROUPS ------------------
-@router.get("/", response_model=List[GroupResponse])
-def get_groups(user=Depends(get_current_user_swagger)):
-    groups = list(groups_collection.find({"user_id": ObjectId(user["_id"])}))
-    response = []
-    for g in groups:
-        response.append(GroupResponse(
+@router.get("/", response_model=List[GroupListItem])
+async def get_groups(user=Depends(get_current_user_swagger)):
+    # Sizes come from the member_count kept on each group; only groups the
+    # startup migration hasn't reached yet are counted from the memberships
+    groups = await async_groups_collection.find(
+        {"user_id": ObjectId(user["_id"])}, {"group_name": 1, "created_at": 1, "member_count": 1}
+    ).to_list(None)
+    uncounted = [g["_id"] for g in groups if "member_count" not in g]
+    counts = await member_counts_async(uncounted) if uncounted else {}
+    return [
+        GroupListItem(
             id=str(g["_id"]),
             group_name=g["group_name"],
-            contact_ids=[str(cid) for cid in g["contact_ids"]],
+            contact_count=g.get("member_count", counts.get(str(g["_id"]), 0)),
             created_at=g["created_at"].isoformat()
-        ))
-    return response
+        )
+        for g in groups
+    ]
 
 # ------------------ GET SINGLE GROUP ------------------
 @router.get("/{group_id}", response_model=GroupResponse)
-def get_group(group_id: str, user=Depends(get_current_user_swagger)):
-    group = groups_collection.find_one({"_id": ObjectId(group_id)})
+async def get_group(group_id: str, user=Depends(get_current_user_swagger)):
+    group = await async_groups_collection.find_one({"_id": ObjectId(group_id)})
 
     if not group or str(group["user_id"]) != str(user["_id"]):
         raise HTTPException(404, "Group not found")
 
+    return await _group_response(group)
+
+
+async def _group_response(group):
+    contact_ids = await member_ids_async(group["_id"])
     return GroupResponse(
         id=str(group["_id"]),
         group_name=group["group_name"],
-        contact_ids=[str(cid) for cid in group["contact_ids"]],
+        contact_ids=contact_ids,
+        contact_count=len(contact_ids),
         created_at=group["created_at"].isoformat()
     )
 
 # ------------------ UPDATE GROUP ------------------
 @router.put("/{group_id}", response_model=GroupResponse)
-def update_group(group_id: str, data: GroupUpdate, user=Depends(get_current_user_swagger)):
-    group = groups_collection.find_one({"_id": ObjectId(group_id)})
+async def update_group(group_id: str, data: GroupUpdate, user=Depends(get_current_user_swagger)):
+    group = await async_groups_collection.find_one({"_id": ObjectId(group_id)})
 
     if not group or str(group["user_id"]) != str(user["_id"]):
         raise HTTPException(404, "Group not found")
@@ -84,30 +108,25 @@ def update_group(group_id: str, data: GroupUpdate, user=Depends(get_current_user
         update_data["group_name"] = data.group_name
 
     if data.contact_ids:
-        for cid in data.contact_ids:
-            contact = contacts_collection.find_one({"_id": ObjectId(cid)})
-            if not contact or str(contact["user_id"]) != str(user["_id"]):
-                raise HTTPException(400, "Invalid contact ID")
-        update_data["contact_ids"] = [ObjectId(cid) for cid in data.contact_ids]
-
-    groups_collection.update_one({"_id": ObjectId(group_id)}, {"$set": update_data})
+        contacts = await validate_contact_ids(user["_id"], data.contact_ids)
+        if contacts.invalid:
+            raise HTTPException(400, contacts.error_message("Invalid contact ID"))
+        await replace_members_async(group_id, user["_id"], contacts.owned)
 
-    updated_group = groups_collection.find_one({"_id": ObjectId(group_id)})
+    if update_data:
+        await async_groups_collection.update_one({"_id": ObjectId(group_id)}, {"$set": update_data})
 
-    return GroupResponse(
-        id=str(updated_group["_id"]),
-        group_name=updated_group["group_name"],
-        contact_ids=[str(cid) for cid in updated_group["contact_ids"]],
-        created_at=updated_group["created_at"].isoformat()
-    )
+    updated_group = await async_groups_collection.find_one({"_id": ObjectId(group_id)})
+    return await _group_response(updated_group)
 
 # ------------------ DELETE GROUP ------------------
 @router.delete("/{group_id}")
-def delete_group(group_id: str, user=Depends(get_current_user_swagger)):
-    group = groups_collection.find_one({"_id": ObjectId(group_id)})
+async def delete_group(group_id: str, user=Depends(get_current_user_swagger)):
+    group = await async_groups_collection.find_one({"_id": ObjectId(group_id)})
 
     if not group or str(group["user_id"]) != str(user["_id"]):
         raise HTTPException(404, "Group not found")
 
-    groups_collection.delete_one({"_id": ObjectId(group_id)})
+    await async_groups_collection.delete_one({"_id": ObjectId(group_id)})
+    await async_group_members_collection.delete_many({"group_id": ObjectId(group_id)})
     return {"message": "Group deleted successfully"}
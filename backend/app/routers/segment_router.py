@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.core.security import get_current_user_swagger
+from app.schemas.segment_schema import SegmentPreview
+from app.services.segments import SegmentError, parse_segment, preview_segment
+
+router = APIRouter(prefix="/segments", tags=["Segments"])
+
+
+# ------------------ PREVIEW ------------------
+@router.post("/preview")
+async def preview(data: SegmentPreview, user=Depends(get_current_user_swagger)):
+    """
+    Number of contacts a segment expression selects, e.g.
+    {"except": [{"group": A}, {"group": B}]} for "A but not B".
+    Suppressions and manual emails are not taken into account.
+    """
+    try:
+        segment = parse_segment(data.segment)
+    except SegmentError as e:
+        raise HTTPException(400, f"Invalid segment: {e}")
+    return {"segment": segment, **await preview_segment(user["_id"], segment)}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException
+from bson import ObjectId
+from typing import Optional
+
+from app.core.security import get_current_user_swagger
+from app.db.client import suppressions_collection
+from app.schemas.suppression_schema import SuppressionCreate
+from app.services.suppression_service import suppression_index, serialize_suppression
+
+router = APIRouter(prefix="/suppressions", tags=["Suppressions"])
+
+
+@router.get("/")
+def get_suppressions(
+    reason: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 100,
+    user=Depends(get_current_user_swagger)
+):
+    """
+    Suppressed addresses of the current user, paginated by `after` (last id seen).
+    """
+    query = {"user_id": ObjectId(user["_id"])}
+    if reason:
+        query["reason"] = reason
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+
+    limit = max(1, min(limit, 1000))
+    rows = [serialize_suppression(r) for r in suppressions_collection.find(query).sort("_id", 1).limit(limit)]
+    return {
+        "suppressions": rows,
+        "next_after": rows[-1]["id"] if len(rows) == limit else None
+    }
+
+
+@router.post("/")
+def add_suppressions(data: SuppressionCreate, user=Depends(get_current_user_swagger)):
+    """
+    Stop sending to these addresses. Every send endpoint skips them from now on.
+    """
+    count = suppression_index.add(user["_id"], data.emails, reason=data.reason)
+    return {"message": "Addresses suppressed", "count": count}
+
+
+@router.delete("/{email}")
+def delete_suppression(email: str, user=Depends(get_current_user_swagger)):
+    if not suppression_index.remove(user["_id"], email):
+        raise HTTPException(404, "Address is not suppressed")
+    return {"message": "Suppression removed"}
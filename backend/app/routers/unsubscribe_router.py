@@ -0,0 +1,52 @@
+import html
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import HTMLResponse
+
+from app.services.suppression_service import suppression_index
+from app.services.unsubscribe_tokens import verify_token
+
+# Public: recipients follow these links from their inbox, without a login
+router = APIRouter(prefix="/unsubscribe", tags=["Unsubscribe"])
+
+CONFIRM_PAGE = """
+<html><body style="font-family: Arial, sans-serif; text-align: center; padding: 40px;">
+    <p>Stop receiving these emails at <b>{email}</b>?</p>
+    <form method="post"><button type="submit">Unsubscribe</button></form>
+</body></html>
+"""
+
+DONE_PAGE = """
+<html><body style="font-family: Arial, sans-serif; text-align: center; padding: 40px;">
+    <p>You have been unsubscribed.</p>
+</body></html>
+"""
+
+
+def _verified(token):
+    claims = verify_token(token)
+    if not claims:
+        raise HTTPException(400, "Invalid unsubscribe link")
+    return claims
+
+
+@router.get("/{token}", response_class=HTMLResponse)
+def unsubscribe_page(token: str):
+    """
+    Footer link. Only asks for confirmation, so link scanners that open every
+    URL in a message do not unsubscribe anybody.
+    """
+    _, _, email = _verified(token)
+    return CONFIRM_PAGE.format(email=html.escape(email))
+
+
+@router.post("/{token}", response_class=HTMLResponse)
+def unsubscribe(token: str):
+    """
+    One-click unsubscribe (RFC 8058 List-Unsubscribe-Post) and the confirm
+    button. The token is verified without a database read and the suppression
+    is written in the next batched flush.
+    """
+    user_id, campaign_id, email = _verified(token)
+    suppression_index.add_later(user_id, email, reason="unsubscribe", campaign_id=campaign_id)
+    return DONE_PAGE
@@ -1,4 +1,6 @@
 from pydantic import BaseModel, EmailStr
+from typing import List, Optional
+import datetime
 
 class ContactCreate(BaseModel):
     name: str
@@ -7,3 +9,18 @@ class ContactCreate(BaseModel):
 class ContactUpdate(BaseModel):
     name: str | None = None
     email: EmailStr | None = None
+
+class ContactFilter(BaseModel):
+    q: Optional[str] = None
+    domain: Optional[str] = None
+    created_from: Optional[datetime.datetime] = None
+    created_to: Optional[datetime.datetime] = None
+
+class ContactSelection(BaseModel):
+    contact_ids: Optional[List[str]] = None      # Either explicit ids...
+    filter: Optional[ContactFilter] = None       # ...or the contacts a search matches
+
+class BulkContactUpdate(ContactSelection):
+    name: Optional[str] = None
+    add_to_group: Optional[str] = None
+    remove_from_group: Optional[str] = None
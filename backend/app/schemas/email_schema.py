@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class EmailSend(BaseModel):
     subject: str
@@ -7,3 +7,4 @@ class EmailSend(BaseModel):
     to_emails: Optional[List[str]] = None        # Manual emails, "ALL" for all contacts
     group_ids: Optional[List[str]] = None        # List of group IDs
     send_to_all: Optional[bool] = False          # True to send to all contacts
+    segment: Optional[Dict[str, Any]] = None     # Segment expression, see /segments/preview
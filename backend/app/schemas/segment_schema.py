@@ -0,0 +1,5 @@
+from pydantic import BaseModel
+from typing import Any, Dict
+
+class SegmentPreview(BaseModel):
+    segment: Dict[str, Any]
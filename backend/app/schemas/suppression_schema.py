@@ -0,0 +1,6 @@
+from pydantic import BaseModel, EmailStr
+from typing import List, Literal
+
+class SuppressionCreate(BaseModel):
+    emails: List[EmailStr]
+    reason: Literal["unsubscribe", "bounce", "complaint", "manual"] = "manual"
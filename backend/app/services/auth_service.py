@@ -1,17 +1,20 @@
 from fastapi import HTTPException
 from bson import ObjectId
-from app.db.client import users_collection
+from app.db.client import async_users_collection
+from app.core.concurrency import run_password_hash
 from app.core.security import hash_password, verify_password, create_access_token
 
-def register_user(email: str, password: str, name: str, company_name: str = None, phone: str = None):
+# Both run on the event loop: Mongo through the async client, bcrypt on its own executor
+
+async def register_user(email: str, password: str, name: str, company_name: str = None, phone: str = None):
     # Check if email already exists
-    if users_collection.find_one({"email": email}):
+    if await async_users_collection.find_one({"email": email}):
         raise HTTPException(400, "Email already exists")
 
-    hashed = hash_password(password)
+    hashed = await run_password_hash(hash_password, password)
 
     # Insert user into MongoDB
-    users_collection.insert_one({
+    await async_users_collection.insert_one({
         "email": email,
         "password_hash": hashed,
         "name": name,
@@ -21,9 +24,9 @@ def register_user(email: str, password: str, name: str, company_name: str = None
 
     return {"message": "User registered successfully"}
 
-def login_user(email: str, password: str):
-    user = users_collection.find_one({"email": email})
-    if not user or not verify_password(password, user["password_hash"]):
+async def login_user(email: str, password: str):
+    user = await async_users_collection.find_one({"email": email})
+    if not user or not await run_password_hash(verify_password, password, user["password_hash"]):
         raise HTTPException(400, "Invalid email or password")
 
     token = create_access_token(str(user["_id"]))
@@ -0,0 +1,39 @@
+from bson import ObjectId
+
+from app.db.client import campaign_images
+
+
+def store_images(campaign_id, images):
+    """
+    Put a newsletter's inline images in GridFS and return the references
+    stored in the campaign's `resume` instead of the bytes.
+    """
+    refs = []
+    for image in images:
+        file_id = campaign_images.put(
+            image["content"], filename=image["filename"], metadata={"campaign_id": ObjectId(campaign_id)}
+        )
+        refs.append({"file_id": file_id, "cid": image["cid"], "filename": image["filename"]})
+    return refs
+
+
+def load_images(refs):
+    """Images of a stored campaign, in the form the MIME builder takes."""
+    images = []
+    for ref in refs or []:
+        # Campaigns queued before images moved to GridFS embed the bytes
+        if "content" in ref:
+            images.append(ref)
+            continue
+        content = campaign_images.get(ref["file_id"]).read()
+        images.append({"content": content, "cid": ref["cid"], "filename": ref["filename"]})
+    return images
+
+
+def delete_images(campaign_id):
+    """Drop a campaign's images once its content is no longer needed."""
+    try:
+        for grid_file in campaign_images.find({"metadata.campaign_id": ObjectId(campaign_id)}):
+            campaign_images.delete(grid_file._id)
+    except Exception as e:
+        print(f"Failed to delete the images of campaign {campaign_id}: {e}")
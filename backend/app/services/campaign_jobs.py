@@ -0,0 +1,166 @@
+import datetime
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+# Number of campaigns that can be sending at the same time
+CAMPAIGN_WORKERS = config("CAMPAIGN_WORKERS", default=2, cast=int)
+
+# How many finished jobs we keep around for progress polling
+MAX_FINISHED_JOBS = config("CAMPAIGN_MAX_FINISHED_JOBS", default=200, cast=int)
+
+
+def _utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class CampaignJob:
+    """
+    Progress + cancellation state for one background send.
+    Counters are updated by the worker thread and read by the polling endpoints.
+    """
+
+    def __init__(self, user_id, kind, total, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.user_id = str(user_id)
+        self.kind = kind
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0  # suppressed recipients
+        self.status = "queued"  # queued -> running -> completed | cancelled | failed
+        self.error = None
+        self.created_at = _utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    # ---------- worker side ----------
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = _utcnow()
+
+    def record_sent(self, count=1):
+        with self._lock:
+            self.sent += count
+
+    def record_failed(self, count=1):
+        with self._lock:
+            self.failed += count
+
+    def record_skipped(self, count=1):
+        with self._lock:
+            self.skipped += count
+
+    def finish(self, error=None):
+        with self._lock:
+            if error is not None:
+                self.status = "failed"
+                self.error = str(error)
+            elif self._cancel.is_set():
+                self.status = "cancelled"
+            else:
+                self.status = "completed"
+            self.finished_at = _utcnow()
+        self._done.set()
+
+    # ---------- client side ----------
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            processed = self.sent + self.failed
+            end = self.finished_at or _utcnow()
+            elapsed = (end - self.started_at).total_seconds() if self.started_at else 0
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "total": self.total,
+                "sent": self.sent,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "remaining": max(self.total - processed - self.skipped, 0),
+                "rate": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+class CampaignJobManager:
+    """
+    Runs campaign jobs on a bounded worker pool and keeps them addressable by id.
+    """
+
+    def __init__(self, max_workers=CAMPAIGN_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="campaign")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_finished = max_finished
+
+    def submit(self, job, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs) on the worker pool."""
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            job.finish()
+            return
+        job.start()
+        try:
+            fn(job, *args, **kwargs)
+        except Exception as e:
+            print(f"Campaign job {job.id} crashed: {e}")
+            job.finish(error=e)
+            return
+        job.finish()
+
+    def _prune(self):
+        finished = [jid for jid, j in self._jobs.items() if j.finished]
+        for jid in finished[:max(len(finished) - self._max_finished, 0)]:
+            del self._jobs[jid]
+
+    def get(self, job_id, user_id):
+        """Return the job if it exists and belongs to user_id."""
+        job = self._jobs.get(job_id)
+        if not job or job.user_id != str(user_id):
+            return None
+        return job
+
+    def list(self, user_id):
+        with self._lock:
+            return [j for j in reversed(self._jobs.values()) if j.user_id == str(user_id)]
+
+    def cancel(self, job_id, user_id):
+        job = self.get(job_id, user_id)
+        if job:
+            job.cancel()
+        return job
+
+
+job_manager = CampaignJobManager()
@@ -0,0 +1,196 @@
+import datetime
+
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.db.client import async_contacts_collection, contacts_collection, group_members_collection, groups_collection
+from app.services.contact_search import search_fields
+from app.services.group_members import recount_groups
+from app.services.segments import bump_contacts_version, bump_contacts_version_async
+from app.services.suppression_service import normalize_email
+
+# Upserts per bulk_write; one round trip for this many contacts
+CONTACT_IMPORT_BATCH_SIZE = config("CONTACT_IMPORT_BATCH_SIZE", default=1000, cast=int)
+
+DUPLICATE_KEY = 11000
+
+
+def unique_contacts(contacts):
+    """
+    Normalize and de-duplicate raw {name, email} dicts, keeping the first
+    name seen for an address. Entries without a usable address are dropped.
+    """
+    unique = {}
+    for contact in contacts:
+        email = normalize_email(contact.get("email") or "")
+        if "@" not in email or email in unique:
+            continue
+        unique[email] = (contact.get("name") or "").strip() or email.split("@")[0]
+    return unique
+
+
+def _upserts(uid, names):
+    """$setOnInsert upserts for {normalized email: name}; existing contacts are left untouched."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        UpdateOne(
+            {"user_id": uid, "email": email},
+            {"$setOnInsert": {
+                "user_id": uid, "email": email, "name": name, "created_at": now, **search_fields(name, email)
+            }},
+            upsert=True
+        )
+        for email, name in names.items()
+    ]
+
+
+def _raced(error):
+    """
+    upserted_ids of a bulk_write that only failed on duplicate keys: a
+    concurrent import inserted the same address first, which is all we need.
+    """
+    if any(err["code"] != DUPLICATE_KEY for err in error.details["writeErrors"]):
+        raise error
+    return {u["index"]: u["_id"] for u in error.details["upserted"]}
+
+
+def _existing_query(uid, chunk, upserted):
+    existing = [email for i, email in enumerate(chunk) if i not in upserted]
+    if existing:
+        return {"user_id": uid, "email": {"$in": existing}}
+    return None
+
+
+async def upsert_contacts(user_id, contacts, collect_ids=False, batch_size=CONTACT_IMPORT_BATCH_SIZE):
+    """
+    Insert the contacts a user doesn't have yet with chunked, unordered bulk
+    upserts on (user_id, email). Existing contacts are left untouched.
+
+    Returns (added_count, contact_ids); the ids of every imported address,
+    new or existing, are only gathered when collect_ids is set.
+    """
+    uid = ObjectId(user_id)
+    unique = unique_contacts(contacts)
+    emails = list(unique)
+    added_count = 0
+    contact_ids = []
+
+    for start in range(0, len(emails), batch_size):
+        chunk = emails[start:start + batch_size]
+        try:
+            result = await async_contacts_collection.bulk_write(_upserts(uid, {e: unique[e] for e in chunk}), ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            upserted = _raced(e)
+
+        added_count += len(upserted)
+        if collect_ids:
+            contact_ids.extend(upserted.values())
+            query = _existing_query(uid, chunk, upserted)
+            if query:
+                rows = await async_contacts_collection.find(query, {"_id": 1}).to_list(None)
+                contact_ids.extend(row["_id"] for row in rows)
+
+    if added_count:
+        await bump_contacts_version_async(user_id)
+    return added_count, contact_ids
+
+
+def upsert_contact_batch(user_id, names, collect_ids=False):
+    """
+    Blocking variant of upsert_contacts for one batch of already normalized
+    and de-duplicated {email: name}, used by background import jobs.
+    """
+    uid = ObjectId(user_id)
+    chunk = list(names)
+    try:
+        upserted = contacts_collection.bulk_write(_upserts(uid, names), ordered=False).upserted_ids
+    except BulkWriteError as e:
+        upserted = _raced(e)
+
+    if upserted:
+        bump_contacts_version(user_id)
+
+    contact_ids = []
+    if collect_ids:
+        contact_ids.extend(upserted.values())
+        query = _existing_query(uid, chunk, upserted)
+        if query:
+            contact_ids.extend(row["_id"] for row in contacts_collection.find(query, {"_id": 1}))
+    return len(upserted), contact_ids
+
+
+def normalize_legacy_contacts():
+    """
+    Lowercase and trim the emails of contacts written before addresses were
+    normalized, merging contacts that then share an address: the oldest one
+    is kept and takes over the group memberships of the others, including
+    the embedded contact_ids of groups that have not been migrated yet.
+
+    Runs at startup before the unique (user_id, email) index is built, and
+    only while that index is missing; once it exists no duplicate can appear.
+    """
+    merged = renamed = 0
+    groups = set()
+    users = set()
+    try:
+        if "user_id_1_email_1" in contacts_collection.index_information():
+            return 0
+        normalized = {"$toLower": {"$trim": {"input": "$email"}}}
+        cursor = contacts_collection.aggregate([
+            {"$match": {"email": {"$type": "string"}}},
+            {"$sort": {"_id": 1}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "email": normalized},
+                "ids": {"$push": "$_id"},
+                "stored": {"$first": "$email"},
+                "name": {"$first": "$name"},
+            }},
+            {"$match": {"$expr": {"$or": [
+                {"$gt": [{"$size": "$ids"}, 1]}, {"$ne": ["$stored", "$_id.email"]},
+            ]}}},
+        ], allowDiskUse=True)
+        for row in cursor:
+            keep, duplicates = row["ids"][0], row["ids"][1:]
+            email = row["_id"]["email"]
+            if duplicates:
+                groups.update(_move_memberships(duplicates, keep))
+                _move_embedded_members(duplicates, keep)
+                contacts_collection.delete_many({"_id": {"$in": duplicates}})
+                merged += len(duplicates)
+            contacts_collection.update_one(
+                {"_id": keep}, {"$set": {"email": email, **search_fields(row.get("name"), email)}}
+            )
+            renamed += 1
+            users.add(row["_id"]["user_id"])
+        recount_groups(groups)
+        for user_id in users:
+            bump_contacts_version(user_id)
+    except Exception as e:
+        print(f"[WARNING] Contact email normalization stopped after {renamed} addresses: {e}")
+        return merged
+    if renamed:
+        print(f"Normalized {renamed} contact addresses, merged {merged} duplicate contacts")
+    return merged
+
+
+def _move_memberships(duplicates, keep):
+    """Point the memberships of merged contacts at the kept one; returns the groups touched."""
+    touched = set()
+    for row in group_members_collection.find({"contact_id": {"$in": duplicates}}, {"group_id": 1}):
+        touched.add(row["group_id"])
+        if group_members_collection.find_one({"group_id": row["group_id"], "contact_id": keep}, {"_id": 1}):
+            group_members_collection.delete_one({"_id": row["_id"]})
+        else:
+            group_members_collection.update_one({"_id": row["_id"]}, {"$set": {"contact_id": keep}})
+    return touched
+
+
+def _move_embedded_members(duplicates, keep):
+    """Same for groups that still embed their members in contact_ids (see migrate_embedded_members)."""
+    groups_collection.update_many({"contact_ids": {"$in": duplicates}}, [{"$set": {"contact_ids": {"$setUnion": [
+        {"$filter": {"input": "$contact_ids", "cond": {"$not": [{"$in": ["$$this", duplicates]}]}}},
+        [keep],
+    ]}}}])
@@ -0,0 +1,50 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.db.client import async_contacts_collection
+
+# Ids per $in query; keeps each query document far below the 16 MB limit
+OWNERSHIP_BATCH_SIZE = 10000
+
+
+class ContactIds:
+    """Result of validating a list of contact ids against one user."""
+
+    def __init__(self, owned, invalid):
+        self.owned = owned  # ObjectIds in request order, de-duplicated
+        self.invalid = invalid  # the offending ids as given
+
+    def error_message(self, prefix, shown=50):
+        listed = ", ".join(self.invalid[:shown])
+        more = len(self.invalid) - shown
+        return f"{prefix}: {listed}" + (f" (+{more} more)" if more > 0 else "")
+
+
+async def validate_contact_ids(user_id, contact_ids, batch_size=OWNERSHIP_BATCH_SIZE):
+    """
+    Check that every id in contact_ids is a contact of user_id, with one
+    covered $in query on the (user_id, _id) index per batch instead of a
+    lookup per id. Malformed ids count as invalid.
+    """
+    uid = ObjectId(user_id)
+    parsed = {}
+    invalid = []
+    for cid in contact_ids:
+        try:
+            oid = ObjectId(cid)
+        except (InvalidId, TypeError):
+            invalid.append(str(cid))
+            continue
+        parsed.setdefault(oid, str(cid))
+
+    candidates = list(parsed)
+    owned = set()
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        rows = await async_contacts_collection.find(
+            {"user_id": uid, "_id": {"$in": batch}}, {"_id": 1}
+        ).to_list(None)
+        owned.update(row["_id"] for row in rows)
+
+    invalid.extend(parsed[oid] for oid in candidates if oid not in owned)
+    return ContactIds([oid for oid in candidates if oid in owned], invalid)
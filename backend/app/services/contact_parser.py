@@ -0,0 +1,165 @@
+import codecs
+import csv
+import gzip
+import io
+import zipfile
+
+# Read size for uploads; decoding and CSV parsing never hold more than this plus one row
+CHUNK_SIZE = 64 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class ImportFileError(Exception):
+    """The upload can't be read as a contact list; the message is shown to the user."""
+
+
+class _Rewound(io.RawIOBase):
+    """A binary stream with bytes already read from it put back in front."""
+
+    def __init__(self, head, stream):
+        self._head = head
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._head:
+            n = min(len(buffer), len(self._head))
+            buffer[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _kind(name):
+    """'csv' or 'txt' from a file name, compressed or not."""
+    name = name.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".txt"):
+        return "txt"
+    return None
+
+
+def _unpack(fileobj, filename):
+    """(binary stream, kind) of the contact list inside an upload."""
+    lower = filename.lower()
+    if lower.endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile:
+            raise ImportFileError("Invalid ZIP archive")
+        for member in archive.infolist():
+            if not member.is_dir() and _kind(member.filename) and not member.filename.startswith("__MACOSX/"):
+                return archive.open(member), _kind(member.filename)
+        raise ImportFileError("The ZIP archive has no CSV or TXT file")
+
+    kind = _kind(lower)
+    if not kind:
+        raise ImportFileError("Invalid file format. Please upload CSV or TXT.")
+    if lower.endswith(".gz"):
+        return gzip.GzipFile(fileobj=fileobj, mode="rb"), kind
+    return fileobj, kind
+
+
+def _detect_encoding(head):
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    try:
+        # Not final: the sample may end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # Spreadsheet exports on Windows
+        return "cp1252"
+
+
+def open_contact_file(fileobj, filename):
+    """
+    Text stream and kind ('csv' / 'txt') of an uploaded contact list.
+
+    Accepts plain, gzipped (.csv.gz / .txt.gz) and zipped files (first CSV or
+    TXT member). The encoding comes from the BOM when there is one, otherwise
+    UTF-8 with a cp1252 fallback decided from the first chunk.
+    """
+    stream, kind = _unpack(fileobj, filename)
+    try:
+        head = stream.read(CHUNK_SIZE)
+    except (OSError, EOFError, zipfile.BadZipFile):
+        raise ImportFileError("The compressed file is corrupt")
+    encoding = _detect_encoding(head)
+    raw = io.BufferedReader(_Rewound(head, stream), CHUNK_SIZE)
+    return io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline=""), kind
+
+
+def _csv_rows(text):
+    # Expecting header: name,email OR just email
+    csv_reader = csv.reader(text)
+    header = next(csv_reader, None)
+
+    if not header:
+        raise ImportFileError("Empty CSV file")
+
+    # Simple heuristic for columns
+    email_idx = -1
+    name_idx = -1
+
+    for i, col in enumerate(header):
+        if 'email' in col.lower():
+            email_idx = i
+        elif 'name' in col.lower():
+            name_idx = i
+
+    if email_idx == -1:
+        # Fallback: assume first column is email if no header match
+        email_idx = 0
+
+    def rows():
+        for row in csv_reader:
+            if not row:
+                continue
+            email = row[email_idx].strip() if len(row) > email_idx else ""
+            name = row[name_idx].strip() if name_idx != -1 and len(row) > name_idx else ""
+            yield csv_reader.line_num, email, name
+
+    return rows()
+
+
+def _txt_rows(text):
+    # One email per line
+    for line_num, line in enumerate(text, 1):
+        email = line.strip()
+        if email:
+            yield line_num, email, ""
+
+
+def iter_rows(fileobj, filename):
+    """
+    Lazily parse (line number, email, name) for every non-empty row of an
+    upload, valid or not. Problems with the file itself (format, archive,
+    empty CSV) raise ImportFileError right away, before the first row.
+    """
+    text, kind = open_contact_file(fileobj, filename)
+    if kind == "csv":
+        return _csv_rows(text)
+    return _txt_rows(text)
+
+
+def iter_contacts(fileobj, filename):
+    """{email, name} dicts of the rows that look like an address, as parse-import returns them."""
+    rows = iter_rows(fileobj, filename)
+    return (
+        {"email": email, "name": name or email.split('@')[0]}
+        for _, email, name in rows if '@' in email
+    )
@@ -0,0 +1,131 @@
+import datetime
+import re
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.db.client import contacts_collection
+
+# Substring search splits text into trigrams; shorter queries fall back to prefix matching
+GRAM_SIZE = 3
+
+# ObjectIds are minted when a contact is inserted, right next to its created_at.
+# created_at ranges are widened by this much when turned into _id bounds.
+CREATED_AT_SLACK = datetime.timedelta(minutes=5)
+
+# Grams made of these characters occur in nearly every address; they are
+# still required by a query, just never picked as the one the index scans
+COMMON_GRAM_CHARS = set("@.")
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def search_fields(name, email):
+    """
+    Derived fields stored on every contact so search can use indexes:
+    lowercased name, email domain and the trigrams of both.
+    """
+    name_lower = (name or "").strip().lower()
+    email = email.strip().lower()
+    return {
+        "name_lower": name_lower,
+        "email_domain": email.rpartition("@")[2],
+        "search_grams": sorted(_grams(name_lower) | _grams(email)),
+    }
+
+
+def renamed_search_fields(name):
+    """
+    $set stage for a pipeline update that gives many contacts the same name.
+    Each contact keeps its own email trigrams, cut out of $email by the server.
+    """
+    name_lower = (name or "").strip().lower()
+    email = {"$toLower": "$email"}
+    email_grams = {"$map": {
+        "input": {"$range": [0, {"$max": [0, {"$subtract": [{"$strLenCP": email}, GRAM_SIZE - 1]}]}]},
+        "as": "i",
+        "in": {"$substrCP": [email, "$$i", GRAM_SIZE]},
+    }}
+    return {"$set": {
+        "name": {"$literal": name},
+        "name_lower": {"$literal": name_lower},
+        "search_grams": {"$setUnion": [{"$literal": sorted(_grams(name_lower))}, email_grams]},
+    }}
+
+
+def _query_grams(text):
+    """Trigrams of a search string, the most selective-looking one first."""
+    grams = sorted(_grams(text))
+    return sorted(grams, key=lambda g: any(c in COMMON_GRAM_CHARS for c in g))
+
+
+def search_query(user_id, q=None, domain=None, created_from=None, created_to=None):
+    """
+    Mongo filter for a contact search, meant to be sorted by _id.
+
+    - q with 3+ characters matches anywhere in the name or email: the
+      (user_id, search_grams, _id) index narrows it to contacts sharing the
+      query's trigrams, a regex on the stored fields confirms the match
+    - shorter q matches the start of the name or email
+    - domain is an exact match on the email domain
+    - created_from / created_to also bound _id, so a range stays on an index
+    """
+    query = {"user_id": ObjectId(user_id)}
+    if q:
+        q = q.strip().lower()
+    if q:
+        pattern = re.escape(q)
+        if len(q) >= GRAM_SIZE:
+            query["search_grams"] = {"$all": _query_grams(q)}
+        else:
+            pattern = "^" + pattern
+        query["$or"] = [{"name_lower": {"$regex": pattern}}, {"email": {"$regex": pattern}}]
+    if domain:
+        query["email_domain"] = domain.strip().lower().lstrip("@")
+
+    created = {}
+    ids = {}
+    if created_from:
+        created["$gte"] = created_from
+        ids["$gte"] = ObjectId.from_datetime(_aware(created_from) - CREATED_AT_SLACK)
+    if created_to:
+        created["$lte"] = created_to
+        ids["$lte"] = ObjectId.from_datetime(_aware(created_to) + CREATED_AT_SLACK)
+    if created:
+        query["created_at"] = created
+        query["_id"] = ids
+    return query
+
+
+def _aware(moment):
+    # created_at is stored as naive UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment
+
+
+def backfill_search_fields(batch_size=1000):
+    """
+    Add search fields to contacts written before they existed. Runs once at
+    startup in the background; contacts that already have them are skipped.
+    """
+    updated = 0
+    try:
+        ops = []
+        for contact in contacts_collection.find({"search_grams": {"$exists": False}}, {"name": 1, "email": 1}):
+            ops.append(UpdateOne({"_id": contact["_id"]}, {"$set": search_fields(contact.get("name"), contact["email"])}))
+            if len(ops) == batch_size:
+                contacts_collection.bulk_write(ops, ordered=False)
+                updated += len(ops)
+                ops = []
+        if ops:
+            contacts_collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+    except Exception as e:
+        print(f"[WARNING] Contact search backfill stopped after {updated} contacts: {e}")
+        return updated
+    if updated:
+        print(f"Added search fields to {updated} contacts")
+    return updated
@@ -0,0 +1,242 @@
+import datetime
+import threading
+
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.db.client import deliveries_collection, dead_letters_collection
+from app.services.ses_errors import REPLAYABLE, classify_ses_error, error_code
+
+# Rows buffered before one insert_many round trip
+DELIVERY_FLUSH_SIZE = config("DELIVERY_FLUSH_SIZE", default=500, cast=int)
+
+DUPLICATE_KEY = 11000
+
+
+class DeliveryRecorder:
+    """
+    Buffers one compact row per recipient (campaign id, email, SES message id,
+    status, error, timestamp) and writes them with unordered insert_many
+    batches. Safe to call from the dispatcher's worker threads.
+
+    With claims=True the rows are created up front by claim() as "pending"
+    (the unique (campaign_id, email) index makes that the idempotency key) and
+    outcomes are written as unordered bulk updates instead. Right before an
+    email is handed to SES its row moves to "sending", so after a crash
+    "pending" rows are known to be unsent and "sending" rows may have been.
+
+    Failures SES may accept later (throttling, outages, daily quota) are also
+    written to the dead-letter collection, from where they can be replayed.
+    A replay passes its replay_id: the dead letters it claimed are deleted
+    only once the outcome of their new attempt has been written.
+    """
+
+    def __init__(self, campaign_id, user_id, flush_size=DELIVERY_FLUSH_SIZE, claims=False, replay_id=None):
+        self.campaign_id = ObjectId(campaign_id)
+        self.user_id = ObjectId(user_id)
+        self.flush_size = flush_size
+        self.claims = claims
+        self.replay_id = replay_id
+        self.dead_lettered = 0
+        self._buffer = []
+        self._dead_letters = []
+        self._lock = threading.Lock()
+
+    def claim(self, emails):
+        """
+        Insert "pending" rows for emails and return the ones this call claimed.
+        Emails already claimed by an earlier (possibly crashed) run are dropped,
+        so nobody is sent the same campaign twice.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        rows = [
+            {"campaign_id": self.campaign_id, "user_id": self.user_id, "email": email,
+             "message_id": None, "status": "pending", "error": None, "created_at": now}
+            for email in emails
+        ]
+        if not rows:
+            return []
+        try:
+            deliveries_collection.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors):
+                raise
+            taken = {err["index"] for err in errors}
+            return [email for i, email in enumerate(emails) if i not in taken]
+        return list(emails)
+
+    def sending(self, emails):
+        """Mark claimed emails as handed to SES. Written before the call, not buffered."""
+        if not self.claims:
+            return
+        deliveries_collection.update_many(
+            {"campaign_id": self.campaign_id, "email": {"$in": list(emails)}},
+            {"$set": {"status": "sending"}}
+        )
+
+    def release(self, email):
+        """Drop the claim of an email that will not be sent after all (e.g. suppressed since)."""
+        deliveries_collection.delete_one({"campaign_id": self.campaign_id, "email": email, "status": "pending"})
+
+    def _add(self, email, status, message_id=None, error=None):
+        row = {
+            "campaign_id": self.campaign_id,
+            "user_id": self.user_id,
+            "email": email,
+            "message_id": message_id,
+            "status": status,
+            "error": error,
+            "created_at": datetime.datetime.now(datetime.timezone.utc),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) < self.flush_size:
+                return
+        self.flush()
+
+    def sent(self, email, message_id=None):
+        self._add(email, "sent", message_id=message_id)
+
+    def failed(self, email, error):
+        if classify_ses_error(error) in REPLAYABLE:
+            with self._lock:
+                self.dead_lettered += 1
+                self._dead_letters.append({
+                    "campaign_id": self.campaign_id,
+                    "user_id": self.user_id,
+                    "email": email,
+                    "code": error_code(error),
+                    "error": str(error),
+                    "created_at": datetime.datetime.now(datetime.timezone.utc),
+                })
+        self._add(email, "failed", error=str(error))
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            dead_letters, self._dead_letters = self._dead_letters, []
+        # New dead letters first, so a replayed recipient that failed again
+        # is never left without one when its claimed dead letter is dropped
+        if dead_letters:
+            try:
+                dead_letters_collection.insert_many(dead_letters, ordered=False)
+            except Exception as e:
+                print(f"Failed to dead-letter {len(dead_letters)} recipients of campaign {self.campaign_id}: {e}")
+        if self._write(rows) and self.replay_id is not None:
+            resolve_dead_letters(self.campaign_id, self.replay_id, [row["email"] for row in rows])
+
+    def _write(self, rows):
+        """Write outcome rows; True if every one of them was written."""
+        if not rows:
+            return False
+        try:
+            if self.claims:
+                deliveries_collection.bulk_write([
+                    UpdateOne(
+                        {"campaign_id": self.campaign_id, "email": row["email"]},
+                        {"$set": {k: row[k] for k in ("message_id", "status", "error", "created_at")}}
+                    )
+                    for row in rows
+                ], ordered=False)
+            else:
+                deliveries_collection.insert_many(rows, ordered=False)
+        except BulkWriteError as e:
+            # ordered=False still writes every row it can
+            print(f"Some delivery records for campaign {self.campaign_id} were not written: {e.details.get('writeErrors', [])[:3]}")
+        except Exception as e:
+            print(f"Failed to write {len(rows)} delivery records for campaign {self.campaign_id}: {e}")
+        else:
+            return True
+        return False
+
+    # Use as a context manager so the tail of the buffer is always flushed
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+def delivery_counts(campaign_id):
+    """{"sent": n, "failed": n, "pending": n, "sending": n} for a campaign, counted in the database."""
+    counts = {"sent": 0, "failed": 0, "pending": 0, "sending": 0}
+    for row in deliveries_collection.aggregate([
+        {"$match": {"campaign_id": ObjectId(campaign_id)}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}},
+    ]):
+        counts[row["_id"]] = row["n"]
+    return counts
+
+
+def pending_emails(campaign_id):
+    """Sorted emails a campaign claimed but never handed to SES."""
+    rows = deliveries_collection.find({"campaign_id": ObjectId(campaign_id), "status": "pending"}, {"email": 1})
+    return sorted(row["email"] for row in rows)
+
+
+def fail_in_flight(campaign_id, error):
+    """
+    Mark deliveries that were handed to SES but never confirmed as failed.
+    SES may have accepted them, so they are not dead-lettered for a replay.
+    """
+    deliveries_collection.update_many(
+        {"campaign_id": ObjectId(campaign_id), "status": "sending"},
+        {"$set": {"status": "failed", "error": error}}
+    )
+
+
+def claim_dead_letters(campaign_id, replay_id):
+    """
+    Tag every untagged dead letter of a campaign with replay_id and return
+    their emails. Two concurrent replays therefore split the recipients
+    instead of both sending to them. The dead letters stay until the replay
+    has recorded each outcome (see resolve_dead_letters); whatever it leaves
+    behind is handed back by release_dead_letters.
+    """
+    query = {"campaign_id": ObjectId(campaign_id)}
+    dead_letters_collection.update_many({**query, "replay_id": None}, {"$set": {"replay_id": replay_id}})
+    return sorted({
+        row["email"] for row in dead_letters_collection.find({**query, "replay_id": replay_id}, {"email": 1})
+    })
+
+
+def resolve_dead_letters(campaign_id, replay_id, emails):
+    """Drop the dead letters a replay claimed for emails whose new outcome is recorded."""
+    if not emails:
+        return
+    try:
+        dead_letters_collection.delete_many(
+            {"campaign_id": ObjectId(campaign_id), "replay_id": replay_id, "email": {"$in": list(emails)}}
+        )
+    except Exception as e:
+        print(f"Failed to drop {len(emails)} replayed dead letters of campaign {campaign_id}: {e}")
+
+
+def release_dead_letters(campaign_id=None, replay_id=None):
+    """
+    Untag dead letters a replay claimed but did not resolve, so the next
+    replay picks them up. Without arguments releases every claim, which is
+    what startup does: no replay survives a restart.
+    """
+    query = {"replay_id": {"$ne": None}}
+    if campaign_id is not None:
+        query = {"campaign_id": ObjectId(campaign_id), "replay_id": replay_id}
+    try:
+        dead_letters_collection.update_many(query, {"$set": {"replay_id": None}})
+    except Exception as e:
+        print(f"[WARNING] Could not release claimed dead letters: {e}")
+
+
+def serialize_delivery(row):
+    return {
+        "id": str(row["_id"]),
+        "email": row["email"],
+        "message_id": row.get("message_id"),
+        "status": row["status"],
+        "error": row.get("error"),
+        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
+    }
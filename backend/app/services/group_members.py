@@ -0,0 +1,233 @@
+import time
+
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.db.client import (
+    async_group_members_collection,
+    async_groups_collection,
+    contacts_collection,
+    group_members_collection,
+    groups_collection,
+)
+
+# Membership rows written per insert_many
+MEMBER_BATCH_SIZE = 5000
+
+# Pause between background passes removing memberships of deleted contacts or groups
+MEMBER_COMPACTION_SECONDS = config("MEMBER_COMPACTION_SECONDS", default=86400, cast=float)
+
+DUPLICATE_KEY = 11000
+
+
+def _rows(group_id, user_id, contact_ids):
+    gid, uid = ObjectId(group_id), ObjectId(user_id)
+    return [{"group_id": gid, "contact_id": ObjectId(cid), "user_id": uid} for cid in contact_ids]
+
+
+def _inserted(error, attempted):
+    """Rows written by an insert_many that only failed on members already in the group."""
+    errors = error.details.get("writeErrors", [])
+    if any(err.get("code") != DUPLICATE_KEY for err in errors):
+        raise error
+    return attempted - len(errors)
+
+
+def _count_change(group_id, delta):
+    """
+    $inc of the group's cached member_count. Every membership write adjusts it
+    by what it actually inserted or deleted, so concurrent writers stay exact.
+    members_version moves on every change; cached segment previews key on it.
+    """
+    return {"_id": ObjectId(group_id)}, {"$inc": {"member_count": delta, "members_version": 1}}
+
+
+def add_members(group_id, user_id, contact_ids):
+    """
+    Add contacts to a group, skipping the ones already in it. The caller
+    checks that the group and the contacts belong to user_id.
+    Returns how many were added.
+    """
+    rows = _rows(group_id, user_id, contact_ids)
+    added = 0
+    for start in range(0, len(rows), MEMBER_BATCH_SIZE):
+        batch = rows[start:start + MEMBER_BATCH_SIZE]
+        try:
+            inserted = len(group_members_collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted = _inserted(e, len(batch))
+        if inserted:
+            groups_collection.update_one(*_count_change(group_id, inserted))
+        added += inserted
+    return added
+
+
+async def add_members_async(group_id, user_id, contact_ids):
+    """add_members for the async routes."""
+    rows = _rows(group_id, user_id, contact_ids)
+    added = 0
+    for start in range(0, len(rows), MEMBER_BATCH_SIZE):
+        batch = rows[start:start + MEMBER_BATCH_SIZE]
+        try:
+            inserted = len((await async_group_members_collection.insert_many(batch, ordered=False)).inserted_ids)
+        except BulkWriteError as e:
+            inserted = _inserted(e, len(batch))
+        if inserted:
+            await async_groups_collection.update_one(*_count_change(group_id, inserted))
+        added += inserted
+    return added
+
+
+async def replace_members_async(group_id, user_id, contact_ids):
+    """Make contact_ids the exact membership of a group."""
+    wanted = [ObjectId(cid) for cid in contact_ids]
+    removed = await async_group_members_collection.delete_many(
+        {"group_id": ObjectId(group_id), "contact_id": {"$nin": wanted}}
+    )
+    if removed.deleted_count:
+        await async_groups_collection.update_one(*_count_change(group_id, -removed.deleted_count))
+    return await add_members_async(group_id, user_id, wanted)
+
+
+async def remove_members_async(group_id, contact_ids):
+    """Take contacts out of one group. Returns how many were members."""
+    removed = await async_group_members_collection.delete_many(
+        {"group_id": ObjectId(group_id), "contact_id": {"$in": [ObjectId(cid) for cid in contact_ids]}}
+    )
+    if removed.deleted_count:
+        await async_groups_collection.update_one(*_count_change(group_id, -removed.deleted_count))
+    return removed.deleted_count
+
+
+async def remove_contacts_async(contact_ids):
+    """
+    Take deleted contacts out of every group in one delete_many, then give
+    each affected group its member_count back in one bulk_write. If another
+    writer touched these rows in between, the affected groups are recounted.
+    Returns how many membership rows were removed.
+    """
+    ids = [ObjectId(cid) for cid in contact_ids]
+    cursor = await async_group_members_collection.aggregate([
+        {"$match": {"contact_id": {"$in": ids}}},
+        {"$group": {"_id": "$group_id", "n": {"$sum": 1}}},
+    ])
+    counts = {row["_id"]: row["n"] for row in await cursor.to_list(None)}
+    if not counts:
+        return 0
+
+    removed = await async_group_members_collection.delete_many({"contact_id": {"$in": ids}})
+    if removed.deleted_count == sum(counts.values()):
+        ops = [UpdateOne(*_count_change(gid, -n)) for gid, n in counts.items()]
+    else:
+        ops = [
+            UpdateOne(*_recounted(gid, await async_group_members_collection.count_documents({"group_id": gid})))
+            for gid in counts
+        ]
+    await async_groups_collection.bulk_write(ops, ordered=False)
+    return removed.deleted_count
+
+
+def _recounted(group_id, count):
+    return {"_id": ObjectId(group_id)}, {"$set": {"member_count": count}, "$inc": {"members_version": 1}}
+
+
+def recount_groups(group_ids):
+    """Set member_count of these groups from their membership rows."""
+    for gid in group_ids:
+        groups_collection.update_one(*_recounted(gid, group_members_collection.count_documents({"group_id": gid})))
+
+
+async def member_ids_async(group_id):
+    """Contact ids of one group, as strings."""
+    rows = await async_group_members_collection.find(
+        {"group_id": ObjectId(group_id)}, {"_id": 0, "contact_id": 1}
+    ).to_list(None)
+    return [str(row["contact_id"]) for row in rows]
+
+
+async def member_counts_async(group_ids):
+    """{group id: member count}, counted from the (group_id, contact_id) index."""
+    cursor = await async_group_members_collection.aggregate([
+        {"$match": {"group_id": {"$in": [ObjectId(g) for g in group_ids]}}},
+        {"$group": {"_id": "$group_id", "n": {"$sum": 1}}},
+    ])
+    return {str(row["_id"]): row["n"] for row in await cursor.to_list(None)}
+
+
+def migrate_embedded_members():
+    """
+    Move contact_ids arrays of groups created before the membership collection
+    into it and give every group a member_count. Runs to completion at
+    startup, before requests are served; a group is only updated after its
+    members are written, so an interrupted run just repeats that group.
+    """
+    moved = 0
+    try:
+        query = {"$or": [{"contact_ids": {"$exists": True}}, {"member_count": {"$exists": False}}]}
+        for group in groups_collection.find(query, {"user_id": 1, "contact_ids": 1}):
+            add_members(group["_id"], group["user_id"], group.get("contact_ids") or [])
+            count = group_members_collection.count_documents({"group_id": group["_id"]})
+            groups_collection.update_one(
+                {"_id": group["_id"]}, {"$set": {"member_count": count}, "$unset": {"contact_ids": ""}, "$inc": {"members_version": 1}}
+            )
+            moved += 1
+    except Exception as e:
+        print(f"[WARNING] Group membership migration stopped after {moved} groups: {e}")
+        return moved
+    if moved:
+        print(f"Migrated the members of {moved} groups to the membership collection")
+    return moved
+
+
+
+def compact_members(batch_size=MEMBER_BATCH_SIZE):
+    """
+    Delete membership rows whose contact or group no longer exists, e.g.
+    left behind by a delete that was interrupted halfway, and recount the
+    groups that had them. Returns how many rows were removed.
+    """
+    dangling = [
+        {"$lookup": {
+            "from": contacts_collection.name, "localField": "contact_id", "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 1}}], "as": "contact",
+        }},
+        {"$lookup": {
+            "from": groups_collection.name, "localField": "group_id", "foreignField": "_id",
+            "pipeline": [{"$project": {"_id": 1}}], "as": "group",
+        }},
+        {"$match": {"$or": [{"contact": {"$size": 0}}, {"group": {"$size": 0}}]}},
+        {"$project": {"group_id": 1}},
+    ]
+    removed = 0
+    affected = set()
+    batch = []
+
+    def drop():
+        nonlocal removed
+        removed += group_members_collection.delete_many({"_id": {"$in": [row["_id"] for row in batch]}}).deleted_count
+        affected.update(row["group_id"] for row in batch)
+        batch.clear()
+
+    try:
+        for row in group_members_collection.aggregate(dangling, allowDiskUse=True):
+            batch.append(row)
+            if len(batch) == batch_size:
+                drop()
+        if batch:
+            drop()
+        recount_groups(affected)
+    except Exception as e:
+        print(f"[WARNING] Group membership compaction stopped after {removed} rows: {e}")
+        return removed
+    if removed:
+        print(f"Removed {removed} memberships of deleted contacts or groups")
+    return removed
+
+
+def run_member_compaction(interval=MEMBER_COMPACTION_SECONDS):
+    """Background thread: compact_members every `interval` seconds, starting right away."""
+    while True:
+        compact_members()
+        time.sleep(interval)
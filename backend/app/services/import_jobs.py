@@ -0,0 +1,124 @@
+from decouple import config
+from email_validator import EmailNotValidError, validate_email
+
+from app.services.campaign_jobs import CampaignJob, CampaignJobManager
+from app.services.contact_import import CONTACT_IMPORT_BATCH_SIZE, upsert_contact_batch
+from app.services.group_members import add_members
+from app.services.suppression_service import email_digest, normalize_email
+
+# Imports that can run at the same time; each one is mostly Mongo round trips
+IMPORT_WORKERS = config("IMPORT_WORKERS", default=2, cast=int)
+
+# Row errors kept per job for the progress endpoint; the rest are only counted
+IMPORT_MAX_ERRORS = config("IMPORT_MAX_ERRORS", default=200, cast=int)
+
+
+class ImportJob(CampaignJob):
+    """
+    Progress of one server-side contact import. Reuses the campaign job
+    lifecycle (queued -> running -> completed | cancelled | failed) with
+    import counters instead of send counters.
+    """
+
+    def __init__(self, user_id, filename, size, group_id=None, job_id=None):
+        super().__init__(user_id, kind="import", total=None, job_id=job_id)
+        self.filename = filename
+        self.size = size
+        self.group_id = group_id
+        self.bytes_read = 0
+        self.rows = 0
+        self.added = 0
+        self.existing = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def record_invalid(self, line, value, error):
+        with self._lock:
+            self.invalid += 1
+            if len(self.errors) < IMPORT_MAX_ERRORS:
+                self.errors.append({"line": line, "value": value, "error": error})
+
+    def record_duplicate(self):
+        with self._lock:
+            self.duplicates += 1
+
+    def record_batch(self, rows, added, existing, bytes_read):
+        with self._lock:
+            self.rows = rows
+            self.added += added
+            self.existing += existing
+            self.bytes_read = bytes_read
+
+    def snapshot(self):
+        with self._lock:
+            if self.finished_at and self.status == "completed":
+                progress = 1.0
+            else:
+                progress = round(min(self.bytes_read / self.size, 1.0), 4) if self.size else 0.0
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "filename": self.filename,
+                "group_id": self.group_id,
+                "progress": progress,
+                "rows": self.rows,
+                "added_count": self.added,
+                "existing_count": self.existing,
+                "duplicate_count": self.duplicates,
+                "invalid_count": self.invalid,
+                "errors": list(self.errors),
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            }
+
+
+def run_import_job(job, rows, fileobj, batch_size=CONTACT_IMPORT_BATCH_SIZE):
+    """
+    Worker side of /contacts/import: validate, de-duplicate and bulk upsert
+    the parsed rows batch by batch, adding them to job.group_id if set.
+    The upload's temporary file is closed when the job ends.
+    """
+    seen = set()  # digests of addresses already taken from this file
+    batch = {}
+    line_count = 0
+
+    def write():
+        added, contact_ids = upsert_contact_batch(job.user_id, batch, collect_ids=bool(job.group_id))
+        if contact_ids:
+            add_members(job.group_id, job.user_id, contact_ids)
+        job.record_batch(line_count, added, len(batch) - added, fileobj.tell())
+        batch.clear()
+
+    try:
+        for line, value, name in rows:
+            if job.cancelled:
+                break
+            line_count += 1
+            email = normalize_email(value)
+            try:
+                validate_email(email, check_deliverability=False)
+            except EmailNotValidError as e:
+                job.record_invalid(line, value, str(e))
+                continue
+
+            digest = email_digest(email)
+            if digest in seen:
+                job.record_duplicate()
+                continue
+            seen.add(digest)
+
+            batch[email] = name or email.split("@")[0]
+            if len(batch) >= batch_size:
+                write()
+        if batch and not job.cancelled:
+            write()
+        job.record_batch(line_count, 0, 0, fileobj.tell())
+    finally:
+        fileobj.close()
+
+
+import_manager = CampaignJobManager(max_workers=IMPORT_WORKERS)
@@ -0,0 +1,135 @@
+import random
+import sys
+from email.message import Message
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.mime.image import MIMEImage
+
+
+UNSUBSCRIBE_FOOTER = """
+            <div style="margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; font-size: 12px; color: #888;">
+                <p>You received this email because you are subscribed to our newsletter.</p>
+                <p><a href="{url}" style="color: #888; text-decoration: underline;">Unsubscribe</a></p>
+            </div>
+            """
+
+# Simpler footer used inside the template's own footer area
+UNSUBSCRIBE_FOOTER_SIMPLE = """
+                <div style="margin-top: 10px; font-size: 11px; color: #888;">
+                    <p>You received this email because you are subscribed to our newsletter.</p>
+                    <p><a href="{url}" style="color: #888; text-decoration: underline;">Unsubscribe</a></p>
+                </div>
+                """
+
+
+def inject_unsubscribe_footer(html: str, unsubscribe_url: str) -> str:
+    """Put the unsubscribe footer into the placeholder, before </body>, or at the end."""
+    if "<!-- UNSUBSCRIBE_PLACEHOLDER -->" in html:
+        return html.replace(
+            "<!-- UNSUBSCRIBE_PLACEHOLDER -->",
+            UNSUBSCRIBE_FOOTER_SIMPLE.format(url=unsubscribe_url)
+        )
+    footer = UNSUBSCRIBE_FOOTER.format(url=unsubscribe_url)
+    if "</body>" in html:
+        return html.replace("</body>", f"{footer}</body>")
+    return html + footer
+
+
+def _new_boundary():
+    # Same shape as the boundaries the email package generates itself
+    token = random.randrange(sys.maxsize)
+    return "=" * 15 + f"{token:019d}" + "=="
+
+
+def _image_part(img_data):
+    img = MIMEImage(img_data["content"])
+    img.add_header("Content-ID", f"<{img_data['cid']}>")
+    img.add_header("Content-Disposition", "inline", filename=img_data["filename"])
+    return img
+
+
+class NewsletterSkeleton:
+    """
+    Campaign-level MIME layout for newsletters.
+
+    The inline images are base64-encoded and serialized once when the skeleton
+    is created. render() only builds the small per-recipient head (headers +
+    HTML part) and splices the cached image parts behind it, so the output is
+    byte-identical to building the full MIMEMultipart for every recipient with
+    the same boundaries.
+    """
+
+    def __init__(self, subject, sender, images):
+        self.subject = subject
+        self.sender = sender
+        self.boundary = _new_boundary()
+        self.alt_boundary = _new_boundary()
+
+        self._close = f"\n--{self.boundary}--\n"
+        self._images_blob = "".join(
+            f"\n--{self.boundary}\n{_image_part(img).as_string()}" for img in images
+        )
+
+    def build(self, recipient_email, html, unsubscribe_url, images=()):
+        """
+        Build the complete message object for one recipient.
+        `images` are attached as MIME parts; render() passes none and splices them instead.
+        """
+        msg = MIMEMultipart("related", boundary=self.boundary)
+        msg["Subject"] = self.subject
+        msg["From"] = self.sender
+        msg["To"] = recipient_email
+
+        # Add Promotional/Bulk Headers
+        msg.add_header("Precedence", "bulk")
+        msg.add_header("X-Auto-Response-Suppress", "OOF, DR, RN, NRN, AutoReply")
+        msg.add_header("List-Unsubscribe", f"<{unsubscribe_url}>")
+        msg.add_header("List-Unsubscribe-Post", "List-Unsubscribe=One-Click")
+
+        alt = MIMEMultipart("alternative", boundary=self.alt_boundary)
+        msg.attach(alt)
+        alt.attach(MIMEText(html, "html", "utf-8"))
+
+        for img_data in images:
+            msg.attach(_image_part(img_data))
+        return msg
+
+    def render(self, recipient_email, html, unsubscribe_url):
+        """Serialized raw message for one recipient."""
+        head = self.build(recipient_email, html, unsubscribe_url).as_string()
+        if not self._images_blob:
+            return head
+        return head[:-len(self._close)] + self._images_blob + self._close
+
+
+class TransactionalMessage:
+    """
+    Transactional email (HTML body + attachments) serialized once and reused
+    for every recipient batch; render() only prepends that batch's To header.
+    """
+
+    def __init__(self, subject, sender, body, attachments):
+        root = MIMEMultipart("mixed")
+        root["Subject"] = subject
+        root["From"] = sender
+
+        # Body
+        body_part = MIMEMultipart("alternative")
+        body_part.attach(MIMEText(body, "html", "utf-8"))
+        root.attach(body_part)
+
+        # Attachments
+        for attachment in attachments:
+            part = MIMEApplication(attachment["content"])
+            part.add_header("Content-Disposition", "attachment", filename=attachment["filename"])
+            root.attach(part)
+
+        self._raw = root.as_string()
+
+    def render(self, recipients):
+        """Raw message addressed to `recipients` (one batch)."""
+        to_header = Message()
+        to_header["To"] = ", ".join(recipients)
+        # Serializing a header-only message gives a folded "To: ..." line plus a blank line
+        return to_header.as_string()[:-1] + self._raw
@@ -0,0 +1,184 @@
+import heapq
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.db.client import contacts_collection, group_members_collection
+from app.services.segments import segment_recipient_pipeline
+from app.services.suppression_service import suppression_index
+
+
+def split_form_list(value):
+    """Comma separated form field -> list of stripped, non-empty values."""
+    if not value:
+        return []
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _object_ids(ids):
+    """Valid ObjectIds only; malformed ids are skipped like unknown groups."""
+    result = []
+    for i in ids or []:
+        try:
+            result.append(ObjectId(i))
+        except (InvalidId, TypeError):
+            continue
+    return result
+
+
+def build_recipient_pipeline(user_id, group_ids, send_to_all):
+    """
+    One aggregation over the group membership collection that expands the
+    user's groups into member emails, optionally unions in every contact of the user, and
+    dedups the lower-cased addresses inside the database.
+    """
+    uid = ObjectId(user_id)
+    email_only = {"$project": {"_id": 0, "email": {"$toLower": "$email"}}}
+
+    pipeline = [
+        {"$match": {"group_id": {"$in": _object_ids(group_ids)}, "user_id": uid}},
+        {"$lookup": {
+            "from": contacts_collection.name,
+            "localField": "contact_id",
+            "foreignField": "_id",
+            "pipeline": [{"$match": {"user_id": uid}}, email_only],
+            "as": "contact",
+        }},
+        # $lookup + $unwind are coalesced by the server, so big groups stay under the 16 MB limit
+        {"$unwind": "$contact"},
+        {"$replaceRoot": {"newRoot": "$contact"}},
+    ]
+    if send_to_all:
+        pipeline.append({"$unionWith": {
+            "coll": contacts_collection.name,
+            "pipeline": [{"$match": {"user_id": uid}}, email_only],
+        }})
+    pipeline += [
+        {"$match": {"email": {"$type": "string"}}},
+        {"$group": {"_id": "$email"}},
+    ]
+    return pipeline
+
+
+class RecipientQuery:
+    """
+    Lazily evaluated audience of a send.
+
+    Iterating yields sorted, deduplicated emails straight off the aggregation
+    cursor, merged with the (small) manual list. Nothing but the manual list is
+    held in memory, so audiences of any size stream through in constant memory.
+
+    Suppressed addresses are dropped while iterating; count() is taken before
+    suppression. Set `on_suppressed` to be told about every address dropped.
+
+    `timings` holds count_ms (the count query) and, once iteration ends,
+    stream_ms (cursor reads, merge and suppression filtering).
+    """
+
+    def __init__(self, user_id, emails=None, group_ids=None, send_to_all=False, segment=None, after=None):
+        self.user_id = str(user_id)
+        self.manual = sorted({e.strip().lower() for e in emails or [] if e and e.strip()})
+        self.group_ids = list(group_ids or [])
+        self.send_to_all = bool(send_to_all)
+        # Parsed segment expression (see services/segments.py), added to the groups
+        self.segment = segment
+        # Resume point: only emails sorting after this one are yielded
+        self.after = after
+        self.timings = {}
+        self.suppressed = 0
+        self.on_suppressed = None
+
+    def spec(self):
+        """Plain dict that can be stored and turned back into the same query."""
+        return {
+            "emails": self.manual,
+            "group_ids": self.group_ids,
+            "send_to_all": self.send_to_all,
+            "segment": self.segment,
+        }
+
+    def resumed_after(self, email):
+        return RecipientQuery(self.user_id, after=email, **self.spec())
+
+    @property
+    def uses_database(self):
+        return bool(self.group_ids) or self.send_to_all or bool(self.segment)
+
+    def _aggregate(self, extra_stages):
+        if self.segment:
+            # Groups and "all" become operands of a union with the segment
+            terms = [{"group": str(g)} for g in _object_ids(self.group_ids)]
+            if self.send_to_all:
+                terms.append({"all": True})
+            segment = {"union": terms + [self.segment]} if terms else self.segment
+            pipeline = segment_recipient_pipeline(self.user_id, segment) + extra_stages
+            return contacts_collection.aggregate(pipeline, allowDiskUse=True)
+        pipeline = build_recipient_pipeline(self.user_id, self.group_ids, self.send_to_all) + extra_stages
+        return group_members_collection.aggregate(pipeline, allowDiskUse=True)
+
+    def count(self):
+        """Number of distinct recipients, computed in the database in one round trip."""
+        started = time.perf_counter()
+        total = len(self.manual)
+        if self.uses_database:
+            result = next(self._aggregate([{"$facet": {
+                "total": [{"$count": "n"}],
+                # Manual emails that the groups / all-contacts part already covers
+                "overlap": [{"$match": {"_id": {"$in": self.manual}}}, {"$count": "n"}],
+            }}]), {})
+            db_total = result["total"][0]["n"] if result.get("total") else 0
+            overlap = result["overlap"][0]["n"] if result.get("overlap") else 0
+            total += db_total - overlap
+        self.timings["count_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return total
+
+    def __iter__(self):
+        manual = self.manual
+        db_stream = iter(())
+        if self.uses_database:
+            stages = [{"$sort": {"_id": 1}}]
+            if self.after is not None:
+                stages.insert(0, {"$match": {"_id": {"$gt": self.after}}})
+            db_stream = (doc["_id"] for doc in self._aggregate(stages))
+        if self.after is not None:
+            manual = [e for e in manual if e > self.after]
+
+        stream = suppression_index.filter(self.user_id, self._merged(manual, db_stream), on_skip=self._skip)
+        # Only the time spent producing emails counts, not the caller's work between them
+        spent = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    email = next(stream)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - started
+                yield email
+        finally:
+            self.timings["stream_ms"] = round(spent * 1000, 2)
+
+    @staticmethod
+    def _merged(manual, db_stream):
+        # Both inputs are sorted, so a duplicate is always adjacent to its twin
+        previous = None
+        for email in heapq.merge(manual, db_stream):
+            if email != previous:
+                yield email
+                previous = email
+
+    def _skip(self, email):
+        self.suppressed += 1
+        if self.on_suppressed:
+            self.on_suppressed(email)
+
+
+def resolve_recipients(user_id, emails=None, group_ids=None, send_to_all=False, segment=None):
+    """
+    Shared recipient resolution for every send endpoint.
+    Manual emails are merged in-process; groups, "all contacts" and the
+    segment are resolved by a single aggregation that is only run when one
+    of them is requested.
+    """
+    return RecipientQuery(user_id, emails=emails, group_ids=group_ids, send_to_all=send_to_all, segment=segment)
@@ -0,0 +1,311 @@
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from decouple import config
+
+from app.db.client import (
+    async_contact_versions_collection,
+    async_contacts_collection,
+    async_groups_collection,
+    contact_versions_collection,
+    contacts_collection,
+    group_members_collection,
+)
+from app.services.contact_search import search_query
+
+# Leaves (groups, filters, "all") one expression may contain
+SEGMENT_MAX_TERMS = config("SEGMENT_MAX_TERMS", default=50, cast=int)
+
+# Preview counts kept in memory, least recently used dropped first
+SEGMENT_CACHE_SIZE = config("SEGMENT_CACHE_SIZE", default=1000, cast=int)
+
+OPERATORS = ("union", "intersect", "except")
+FILTER_FIELDS = ("q", "domain", "created_from", "created_to")
+
+# Matches nothing, straight off the _id index; the start of pipelines made of $unionWith stages
+_NOTHING = {"$match": {"_id": None}}
+
+
+class SegmentError(ValueError):
+    """A segment expression that cannot be evaluated."""
+
+
+# ------------------ PARSING ------------------
+def parse_segment(expr):
+    """
+    Validate a segment expression and return it in canonical form:
+
+    - {"group": "<group id>"}: members of one group
+    - {"all": true}: every contact
+    - {"filter": {"q", "domain", "created_from", "created_to"}}: a contact search
+    - {"union": [...]}, {"intersect": [...]}: of two or more expressions
+    - {"except": [base, ...]}: contacts in base and in none of the others
+
+    Operands of union / intersect are sorted, so equal segments written in a
+    different order share a cache entry.
+    """
+    terms = [0]
+    result = _parse(expr, terms)
+    if terms[0] > SEGMENT_MAX_TERMS:
+        raise SegmentError(f"A segment may use at most {SEGMENT_MAX_TERMS} groups or filters")
+    return result
+
+
+def _parse(expr, terms):
+    if not isinstance(expr, dict) or len(expr) != 1:
+        raise SegmentError("Each segment term must be an object with exactly one key")
+    (kind, value), = expr.items()
+
+    if kind in OPERATORS:
+        if not isinstance(value, list) or len(value) < 2:
+            raise SegmentError(f"'{kind}' needs a list of at least two segments")
+        operands = [_parse(v, terms) for v in value]
+        if kind == "except":
+            return {kind: operands[:1] + sorted(operands[1:], key=_key)}
+        return {kind: sorted(operands, key=_key)}
+
+    terms[0] += 1
+    if kind == "group":
+        try:
+            return {"group": str(ObjectId(value))}
+        except (InvalidId, TypeError):
+            raise SegmentError(f"Invalid group ID: {value}")
+    if kind == "all":
+        if value is not True:
+            raise SegmentError("'all' must be true")
+        return {"all": True}
+    if kind == "filter":
+        return {"filter": _parse_filter(value)}
+    raise SegmentError(f"Unknown segment term '{kind}'")
+
+
+def _parse_filter(value):
+    if not isinstance(value, dict) or not value:
+        raise SegmentError("'filter' must be a non-empty object")
+    unknown = set(value) - set(FILTER_FIELDS)
+    if unknown:
+        raise SegmentError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+    result = {}
+    for field in ("q", "domain"):
+        if value.get(field):
+            result[field] = str(value[field]).strip().lower()
+    for field in ("created_from", "created_to"):
+        if value.get(field):
+            try:
+                datetime.datetime.fromisoformat(value[field])
+            except (TypeError, ValueError):
+                raise SegmentError(f"'{field}' must be an ISO date")
+            result[field] = value[field]
+    if not result:
+        raise SegmentError("'filter' must set at least one field")
+    return result
+
+
+def _key(expr):
+    return json.dumps(expr, sort_keys=True)
+
+
+def _leaves(expr):
+    (kind, value), = expr.items()
+    if kind in OPERATORS:
+        for operand in value:
+            yield from _leaves(operand)
+    else:
+        yield kind, value
+
+
+def segment_group_ids(expr):
+    return sorted({value for kind, value in _leaves(expr) if kind == "group"})
+
+
+def uses_contacts(expr):
+    """True if the segment reads contacts directly, not only group memberships."""
+    return any(kind != "group" for kind, _ in _leaves(expr))
+
+
+# ------------------ PIPELINES ------------------
+def segment_id_pipeline(user_id, expr):
+    """
+    Aggregation over the contacts collection that yields the distinct
+    {_id: contact id} of a parsed segment. Operands are pulled in with
+    $unionWith and combined by one $group per operator, so the sets are
+    never loaded into the application.
+    """
+    uid = ObjectId(user_id)
+    (kind, value), = expr.items()
+
+    if kind == "all":
+        return [{"$match": {"user_id": uid}}, {"$project": {"_id": 1}}]
+    if kind == "filter":
+        return [{"$match": _filter_query(uid, value)}, {"$project": {"_id": 1}}]
+    if kind == "group":
+        return [_NOTHING, _members(uid, [value])]
+
+    operands = list(value)
+    if kind == "union":
+        # Groups of a union are read with one $in on the membership index
+        groups = [o["group"] for o in operands if "group" in o]
+        operands = [o for o in operands if "group" not in o]
+        stages = [_NOTHING] + ([_members(uid, groups)] if groups else [])
+        stages += [_union(segment_id_pipeline(user_id, o)) for o in operands]
+        return stages + [{"$group": {"_id": "$_id"}}]
+
+    if kind == "intersect":
+        stages = [_NOTHING] + [_union(segment_id_pipeline(user_id, o)) for o in operands]
+        return stages + [
+            {"$group": {"_id": "$_id", "n": {"$sum": 1}}},
+            {"$match": {"n": len(operands)}},
+            {"$project": {"_id": 1}},
+        ]
+
+    # except: operands are distinct sets, so the base tags its ids 1 and the
+    # others 0; an id survives only if no subtracted operand produced it
+    stages = [_NOTHING] + [
+        _union(segment_id_pipeline(user_id, o) + [{"$set": {"keep": int(i == 0)}}])
+        for i, o in enumerate(operands)
+    ]
+    return stages + [
+        {"$group": {"_id": "$_id", "keep": {"$min": "$keep"}}},
+        {"$match": {"keep": 1}},
+        {"$project": {"_id": 1}},
+    ]
+
+
+def _members(uid, group_ids):
+    return {"$unionWith": {
+        "coll": group_members_collection.name,
+        "pipeline": [
+            {"$match": {"group_id": {"$in": [ObjectId(g) for g in group_ids]}, "user_id": uid}},
+            {"$group": {"_id": "$contact_id"}},
+            # Membership rows can outlive their contact; only existing contacts count
+            {"$lookup": {
+                "from": contacts_collection.name,
+                "localField": "_id",
+                "foreignField": "_id",
+                "pipeline": [{"$match": {"user_id": uid}}, {"$project": {"_id": 1}}],
+                "as": "contact",
+            }},
+            {"$match": {"contact": {"$ne": []}}},
+            {"$project": {"_id": 1}},
+        ],
+    }}
+
+
+def _union(pipeline):
+    return {"$unionWith": {"coll": contacts_collection.name, "pipeline": pipeline}}
+
+
+def _filter_query(uid, value):
+    dates = {f: datetime.datetime.fromisoformat(value[f]) for f in ("created_from", "created_to") if f in value}
+    return search_query(uid, q=value.get("q"), domain=value.get("domain"), **dates)
+
+
+def segment_recipient_pipeline(user_id, expr):
+    """
+    segment_id_pipeline turned into the recipient stream the send endpoints
+    expect: distinct lower-cased emails as {_id: email}.
+    """
+    uid = ObjectId(user_id)
+    return segment_id_pipeline(user_id, expr) + [
+        {"$lookup": {
+            "from": contacts_collection.name,
+            "localField": "_id",
+            "foreignField": "_id",
+            "pipeline": [{"$match": {"user_id": uid}}, {"$project": {"_id": 0, "email": {"$toLower": "$email"}}}],
+            "as": "contact",
+        }},
+        {"$unwind": "$contact"},
+        {"$replaceRoot": {"newRoot": "$contact"}},
+        {"$match": {"email": {"$type": "string"}}},
+        {"$group": {"_id": "$email"}},
+    ]
+
+
+# ------------------ VERSIONS ------------------
+def bump_contacts_version(user_id):
+    """
+    Mark a user's contacts as changed; segments reading them are recounted.
+    The version has its own collection so contact writes leave the user
+    document, and the auth cache of it, alone.
+    """
+    contact_versions_collection.update_one({"_id": ObjectId(user_id)}, {"$inc": {"contacts_version": 1}}, upsert=True)
+
+
+async def bump_contacts_version_async(user_id):
+    await async_contact_versions_collection.update_one(
+        {"_id": ObjectId(user_id)}, {"$inc": {"contacts_version": 1}}, upsert=True
+    )
+
+
+async def segment_version(user_id, expr):
+    """
+    What a preview count depends on: the members_version of every group in
+    the segment (bumped by each membership write) and, when the segment
+    reads contacts directly, the user's contacts_version.
+    """
+    group_ids = segment_group_ids(expr)
+    groups = {}
+    if group_ids:
+        rows = await async_groups_collection.find(
+            {"_id": {"$in": [ObjectId(g) for g in group_ids]}, "user_id": ObjectId(user_id)},
+            {"members_version": 1}
+        ).to_list(None)
+        groups = {str(g["_id"]): g.get("members_version", 0) for g in rows}
+    contacts = None
+    if uses_contacts(expr):
+        row = await async_contact_versions_collection.find_one({"_id": ObjectId(user_id)})
+        contacts = (row or {}).get("contacts_version", 0)
+    return contacts, tuple((g, groups.get(g)) for g in group_ids)
+
+
+# ------------------ PREVIEW CACHE ------------------
+class SegmentCache:
+    """Bounded LRU of preview counts, keyed by user, canonical segment and version."""
+
+    def __init__(self, size=SEGMENT_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+segment_cache = SegmentCache()
+
+
+async def preview_segment(user_id, expr):
+    """Number of contacts in a parsed segment, cached until a version it depends on changes."""
+    started = time.perf_counter()
+    # The version is read first: a write racing the count leaves a stale entry under the old version
+    key = (str(user_id), _key(expr), await segment_version(user_id, expr))
+    count = segment_cache.get(key)
+    cached = count is not None
+    if not cached:
+        cursor = await async_contacts_collection.aggregate(
+            segment_id_pipeline(user_id, expr) + [{"$count": "n"}], allowDiskUse=True
+        )
+        rows = await cursor.to_list(None)
+        count = rows[0]["n"] if rows else 0
+        segment_cache.put(key, count)
+    return {"count": count, "cached": cached, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
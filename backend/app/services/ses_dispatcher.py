@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+from app.services.ses_errors import RETRYABLE, THROTTLED, classify_ses_error
+
+# Parallel send_raw_email calls in flight (also sizes the boto3 HTTP connection pool)
+SES_MAX_CONCURRENCY = config("SES_MAX_CONCURRENCY", default=10, cast=int)
+
+# Account-wide messages per second; set this to the MaxSendRate of your SES account
+SES_MAX_SEND_RATE = config("SES_MAX_SEND_RATE", default=14, cast=float)
+
+# Floor the send rate is never throttled below
+SES_MIN_SEND_RATE = config("SES_MIN_SEND_RATE", default=1, cast=float)
+
+# Retries of a throttled / transient SES call, with jittered exponential backoff
+SES_MAX_RETRIES = config("SES_MAX_RETRIES", default=4, cast=int)
+SES_RETRY_BASE_DELAY = config("SES_RETRY_BASE_DELAY", default=0.5, cast=float)
+SES_RETRY_MAX_DELAY = config("SES_RETRY_MAX_DELAY", default=20, cast=float)
+
+# SES rejects a single call with more than 50 recipients
+SES_MAX_RECIPIENTS = 50
+
+
+def chunked(items, size):
+    """Yield lists of at most `size` items from any iterable."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Refills at `rate` tokens per second and holds at
+    most `capacity` tokens, so bursts never exceed one second worth of sends.
+
+    The rate adapts to throttling: slow_down() halves it (down to `min_rate`)
+    and every successful send wins back 1% of `max_rate` per message.
+    """
+
+    RECOVERY_STEP = 0.01
+
+    def __init__(self, rate, capacity=None, min_rate=SES_MIN_SEND_RATE):
+        self.rate = float(rate)
+        self.max_rate = self.rate
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(capacity or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def slow_down(self, factor=0.5):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * factor)
+            # Drop the saved-up burst as well, it is what got us throttled
+            self._tokens = min(self._tokens, 0.0)
+
+    def speed_up(self, messages=1):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.RECOVERY_STEP * messages)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` tokens are available and take them.
+        Requests larger than the capacity wait for a full bucket and leave it in
+        debt, so batch calls still average out to `rate`.
+        """
+        need = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= need:
+                    self._tokens -= tokens
+                    return
+                wait = (need - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SESDispatcher:
+    """
+    Runs SES calls on a bounded thread pool while a shared token bucket keeps the
+    aggregate rate of every running campaign under the account's send rate.
+    """
+
+    def __init__(self, max_workers=SES_MAX_CONCURRENCY, max_send_rate=SES_MAX_SEND_RATE,
+                 max_retries=SES_MAX_RETRIES, base_delay=SES_RETRY_BASE_DELAY, max_delay=SES_RETRY_MAX_DELAY):
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(max_send_rate)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ses-send")
+
+    def call(self, fn, cost=1, **kwargs):
+        """
+        fn(**kwargs) with retries. Throttling and transient SES errors are retried
+        up to max_retries times after a full-jitter exponential backoff; throttling
+        also slows down the shared bucket, so every campaign backs off together.
+        Retries are charged against the rate limit again. Other errors, and the
+        last retryable one, are raised to the caller.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = fn(**kwargs)
+            except Exception as e:
+                kind = classify_ses_error(e)
+                if kind not in RETRYABLE or attempt >= self.max_retries:
+                    raise
+                if kind == THROTTLED:
+                    self.bucket.slow_down()
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                print(f"SES {kind} error, retry {attempt}/{self.max_retries} in {delay:.2f}s: {e}")
+                time.sleep(delay)
+                self.bucket.acquire(cost)
+                continue
+            self.bucket.speed_up(cost)
+            return response
+
+    def dispatch(self, items, send_one, job, cost=None):
+        """
+        Call send_one(item) for every item and count the outcome on `job`.
+
+        `cost(item)` is the number of recipients an item covers (1 by default);
+        it is charged against the rate limit. send_one may return how many of
+        those recipients failed; an exception fails all of them.
+        Stops submitting new work once the job is cancelled and returns after
+        every in-flight call has finished.
+        """
+        slots = threading.BoundedSemaphore(self.max_workers)
+        cost = cost or (lambda item: 1)
+
+        def run(item):
+            total = cost(item)
+            try:
+                failed = send_one(item) or 0
+            except Exception as e:
+                print(f"Failed to send to {item}: {e}")
+                failed = total
+            try:
+                if total - failed:
+                    job.record_sent(total - failed)
+                if failed:
+                    job.record_failed(failed)
+            finally:
+                slots.release()
+
+        for item in items:
+            slots.acquire()
+            if job.cancelled:
+                slots.release()
+                break
+            self.bucket.acquire(cost(item))
+            self._executor.submit(run, item)
+
+        # Drain: taking every slot means no call is still in flight
+        for _ in range(self.max_workers):
+            slots.acquire()
+        for _ in range(self.max_workers):
+            slots.release()
+
+        return job
+
+    def dispatch_batches(self, recipients, send_batch, job, batch_size=SES_MAX_RECIPIENTS):
+        """
+        Split recipients (any iterable, consumed lazily) into SES-sized batches
+        and send them concurrently with send_batch(batch).
+        Returns {"count": batches sent, "failed": [failed batch reports]} so
+        callers can report partial failures without keeping every batch around.
+        """
+        failed_batches = []
+        counter = {"count": 0}
+
+        def send_one(indexed):
+            index, batch = indexed
+            try:
+                send_batch(batch)
+            except Exception as e:
+                print(f"Batch {index} ({len(batch)} recipients) failed: {e}")
+                failed_batches.append({"batch": index, "recipients": len(batch), "error": str(e)})
+                return len(batch)
+            return 0
+
+        def numbered():
+            for index, batch in enumerate(chunked(recipients, batch_size)):
+                counter["count"] = index + 1
+                yield index, batch
+
+        self.dispatch(numbered(), send_one, job, cost=lambda indexed: len(indexed[1]))
+        return {"count": counter["count"], "failed": sorted(failed_batches, key=lambda b: b["batch"])}
+
+
+dispatcher = SESDispatcher()
@@ -0,0 +1,52 @@
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+# Error classes, from "try again in a moment" to "never going to work"
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+QUOTA = "quota"
+PERMANENT = "permanent"
+
+# Worth retrying inline with backoff
+RETRYABLE = (THROTTLED, TRANSIENT)
+
+# Worth keeping in the dead-letter collection for a later replay
+REPLAYABLE = (THROTTLED, TRANSIENT, QUOTA)
+
+THROTTLING_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException", "AccountThrottled"}
+TRANSIENT_CODES = {
+    "ServiceUnavailable", "InternalFailure", "InternalError", "RequestTimeout",
+    "RequestTimeoutException", "TransientFailure",
+    # SendBulkTemplatedEmail returned no status for the destination
+    "Missing",
+}
+QUOTA_CODES = {"AccountDailyQuotaExceeded"}
+
+
+def error_code(error):
+    """
+    SES error code of a boto3 exception or of a per-destination bulk status
+    ("TransientFailure <message>"); the class name for anything else.
+    """
+    if isinstance(error, str):
+        return error.split(" ", 1)[0]
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code", "")
+    return type(error).__name__
+
+
+def classify_ses_error(error):
+    """THROTTLED, TRANSIENT, QUOTA or PERMANENT for an SES failure."""
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return TRANSIENT
+    if not isinstance(error, (str, ClientError)):
+        return PERMANENT
+
+    code = error_code(error)
+    # SES reports an exhausted daily quota as Throttling too, only the message differs
+    if code in QUOTA_CODES or "daily message quota" in str(error).lower():
+        return QUOTA
+    if code in THROTTLING_CODES:
+        return THROTTLED
+    if code in TRANSIENT_CODES:
+        return TRANSIENT
+    return PERMANENT
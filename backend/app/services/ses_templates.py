@@ -0,0 +1,86 @@
+import json
+
+from app.services.mime_builder import inject_unsubscribe_footer
+from app.services.ses_dispatcher import SES_MAX_RECIPIENTS
+
+# SES accepts at most 50 destinations per SendBulkTemplatedEmail call
+TEMPLATE_BATCH_SIZE = SES_MAX_RECIPIENTS
+
+UNSUBSCRIBE_PLACEHOLDER = "{{unsubscribe_url}}"
+
+
+def template_name_for(job_id):
+    return f"newsletter-{job_id}"
+
+
+def build_template_html(final_html):
+    """
+    Campaign HTML with the unsubscribe footer pointing at the per-recipient
+    placeholder. Literal `{{` in the body is escaped so SES's Handlebars
+    renderer leaves it alone.
+    """
+    escaped = final_html.replace("{{", "\\{{")
+    return inject_unsubscribe_footer(escaped, UNSUBSCRIBE_PLACEHOLDER)
+
+
+def create_campaign_template(ses, name, subject, final_html):
+    template = {
+        "TemplateName": name,
+        "SubjectPart": subject.replace("{{", "\\{{"),
+        "HtmlPart": build_template_html(final_html),
+    }
+    try:
+        ses.create_template(Template=template)
+    except ses.exceptions.AlreadyExistsException:
+        # Left over from a run that crashed before cleaning up (resumed campaign)
+        ses.update_template(Template=template)
+
+
+def delete_campaign_template(ses, name):
+    try:
+        ses.delete_template(TemplateName=name)
+    except Exception as e:
+        print(f"Failed to delete SES template {name}: {e}")
+
+
+def send_templated_batch(ses, source, template_name, batch, unsubscribe_url_for, recorder, call=None):
+    """
+    Send one SendBulkTemplatedEmail call for up to 50 recipients and record
+    each destination's outcome. Returns the number SES did not accept.
+    `call(fn, cost, **kwargs)` runs the API call (e.g. the dispatcher's retrying call).
+    """
+    call = call or (lambda fn, cost, **kwargs: fn(**kwargs))
+    recorder.sending(batch)
+    try:
+        response = call(
+            ses.send_bulk_templated_email,
+            len(batch),
+            Source=source,
+            Template=template_name,
+            DefaultTemplateData=json.dumps({"unsubscribe_url": ""}),
+            Destinations=[
+                {
+                    "Destination": {"ToAddresses": [email]},
+                    "ReplacementTemplateData": json.dumps({"unsubscribe_url": unsubscribe_url_for(email)}),
+                }
+                for email in batch
+            ],
+        )
+    except Exception as e:
+        for email in batch:
+            recorder.failed(email, e)
+        raise
+
+    # Status entries come back in the same order as Destinations
+    statuses = response.get("Status", [])
+    failed = 0
+    for index, email in enumerate(batch):
+        status = statuses[index] if index < len(statuses) else {"Status": "Missing"}
+        if status.get("Status") == "Success":
+            recorder.sent(email, status.get("MessageId"))
+            continue
+        error = f"{status.get('Status')} {status.get('Error', '')}".strip()
+        print(f"Failed to send to {email}: {error}")
+        recorder.failed(email, error)
+        failed += 1
+    return failed
@@ -0,0 +1,223 @@
+import datetime
+import hashlib
+import threading
+import time
+
+from bson import ObjectId
+from decouple import config
+from pymongo import UpdateOne
+
+from app.db.client import suppressions_collection
+
+# How stale a user's index may get before new suppressions are pulled in
+SUPPRESSION_REFRESH_SECONDS = config("SUPPRESSION_REFRESH_SECONDS", default=30, cast=float)
+
+# Full rebuild interval, the only way removals made by other processes show up
+SUPPRESSION_RELOAD_SECONDS = config("SUPPRESSION_RELOAD_SECONDS", default=3600, cast=float)
+
+# Buffered suppressions (one-click unsubscribes) are written at least this often, or per batch
+SUPPRESSION_FLUSH_SECONDS = config("SUPPRESSION_FLUSH_SECONDS", default=2, cast=float)
+SUPPRESSION_FLUSH_SIZE = config("SUPPRESSION_FLUSH_SIZE", default=500, cast=int)
+
+# Incremental refreshes re-read this far back: ObjectIds from different
+# writers are only roughly ordered, and re-adding a digest is harmless
+REFRESH_OVERLAP = datetime.timedelta(seconds=10)
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def email_digest(email):
+    """64-bit digest of a normalized address; what the index stores instead of the string."""
+    return int.from_bytes(hashlib.blake2b(email.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class _UserIndex:
+    def __init__(self):
+        self.digests = set()
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        self.seen_until = None
+        self.lock = threading.Lock()
+
+
+class SuppressionIndex:
+    """
+    Per-user set of suppressed address digests, loaded lazily from the
+    suppressions collection and refreshed incrementally by _id.
+
+    A set of 64-bit ints makes every lookup O(1) and keeps millions of entries
+    to a fraction of the memory the address strings would take. A digest
+    collision can suppress an unrelated address, at 64 bits that takes
+    billions of entries to become likely.
+    """
+
+    def __init__(self, refresh_seconds=SUPPRESSION_REFRESH_SECONDS, reload_seconds=SUPPRESSION_RELOAD_SECONDS,
+                 flush_seconds=SUPPRESSION_FLUSH_SECONDS, flush_size=SUPPRESSION_FLUSH_SIZE):
+        self.refresh_seconds = refresh_seconds
+        self.reload_seconds = reload_seconds
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self._users = {}
+        self._lock = threading.Lock()
+        # Suppressions accepted by add_later() that are not in the collection yet
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+
+    def _index(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            if user_id not in self._users:
+                self._users[user_id] = _UserIndex()
+            return self._users[user_id]
+
+    def refresh(self, user_id, force=False):
+        """Pull suppressions added since the last refresh (all of them on first use)."""
+        index = self._index(user_id)
+        with index.lock:
+            now = time.monotonic()
+            if not force and now - index.refreshed_at < self.refresh_seconds:
+                return index
+            full = index.seen_until is None or now - index.loaded_at >= self.reload_seconds
+
+            query = {"user_id": ObjectId(user_id)}
+            started = datetime.datetime.now(datetime.timezone.utc)
+            if not full:
+                query["_id"] = {"$gte": ObjectId.from_datetime(index.seen_until - REFRESH_OVERLAP)}
+
+            digests = set() if full else index.digests
+            for row in suppressions_collection.find(query, {"_id": 0, "email": 1}):
+                digests.add(email_digest(row["email"]))
+            if full:
+                with self._pending_lock:
+                    digests.update(email_digest(p["email"]) for p in self._pending if p["user_id"] == str(user_id))
+
+            # Swapped in whole, readers never see a half-built set
+            index.digests = digests
+            index.seen_until = started
+            index.refreshed_at = now
+            if full:
+                index.loaded_at = now
+        return index
+
+    def contains(self, user_id, email):
+        return email_digest(normalize_email(email)) in self.refresh(user_id).digests
+
+    def filter(self, user_id, emails, on_skip=None):
+        """
+        Yield the addresses of `emails` (already normalized) that are not
+        suppressed; on_skip(email) is called for every one dropped.
+        """
+        digests = self.refresh(user_id).digests
+        for position, email in enumerate(emails, 1):
+            # Long campaigns keep picking up suppressions added while they run
+            if position % 1000 == 0:
+                digests = self.refresh(user_id).digests
+            if email_digest(email) in digests:
+                if on_skip:
+                    on_skip(email)
+                continue
+            yield email
+
+    def add(self, user_id, emails, reason="manual", campaign_id=None):
+        """Suppress addresses for a user, in the collection and in this process' index right away."""
+        emails = sorted({normalize_email(e) for e in emails if e and e.strip()})
+        if not emails:
+            return 0
+        now = datetime.datetime.now(datetime.timezone.utc)
+        suppressions_collection.bulk_write([
+            _upsert(user_id, email, reason, campaign_id, now) for email in emails
+        ], ordered=False)
+
+        index = self.refresh(user_id)
+        with index.lock:
+            index.digests.update(email_digest(e) for e in emails)
+        return len(emails)
+
+    def add_later(self, user_id, email, reason="unsubscribe", campaign_id=None):
+        """
+        Suppress one address without waiting for the database: it is skipped by
+        this process right away and written with the next batched flush.
+        """
+        email = normalize_email(email)
+        index = self._index(user_id)
+        with index.lock:
+            index.digests.add(email_digest(email))
+        with self._pending_lock:
+            self._pending.append({
+                "user_id": str(user_id),
+                "email": email,
+                "reason": reason,
+                "campaign_id": campaign_id,
+                "created_at": datetime.datetime.now(datetime.timezone.utc),
+            })
+            full = len(self._pending) >= self.flush_size
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="suppression-flush", daemon=True)
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write buffered suppressions with one unordered bulk upsert."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        try:
+            suppressions_collection.bulk_write([
+                _upsert(p["user_id"], p["email"], p["reason"], p["campaign_id"], p["created_at"]) for p in pending
+            ], ordered=False)
+        except Exception as e:
+            # Upserts are idempotent, so the whole batch is simply tried again
+            print(f"Failed to write {len(pending)} suppressions, retrying later: {e}")
+            with self._pending_lock:
+                self._pending[:0] = pending
+            return 0
+        return len(pending)
+
+    def remove(self, user_id, email):
+        """Lift a suppression. Returns False if the address was not suppressed."""
+        email = normalize_email(email)
+        result = suppressions_collection.delete_one({"user_id": ObjectId(user_id), "email": email})
+        index = self._index(user_id)
+        with index.lock:
+            index.digests.discard(email_digest(email))
+        return result.deleted_count > 0
+
+
+def _upsert(user_id, email, reason, campaign_id, created_at):
+    uid = ObjectId(user_id)
+    return UpdateOne(
+        {"user_id": uid, "email": email},
+        {"$setOnInsert": {
+            "user_id": uid,
+            "email": email,
+            "reason": reason,
+            "campaign_id": ObjectId(campaign_id) if campaign_id else None,
+            "created_at": created_at,
+        }},
+        upsert=True
+    )
+
+
+def serialize_suppression(row):
+    return {
+        "id": str(row["_id"]),
+        "email": row["email"],
+        "reason": row.get("reason"),
+        "campaign_id": str(row["campaign_id"]) if row.get("campaign_id") else None,
+        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
+    }
+
+
+suppression_index = SuppressionIndex()
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import hashlib
+import hmac
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from decouple import config
+
+# Public address that routes /unsubscribe/... to this backend. Required: there
+# is no sensible default, and a wrong one breaks every unsubscribe link sent
+UNSUBSCRIBE_BASE_URL = config("UNSUBSCRIBE_BASE_URL").rstrip("/")
+
+UNSUBSCRIBE_SECRET = config("UNSUBSCRIBE_SECRET", default=config("SECRET_KEY")).encode("utf-8")
+
+# Truncated HMAC-SHA256; 128 bits is plenty against forgery and keeps links short
+SIGNATURE_SIZE = 16
+ID_SIZE = 12
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(token):
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def _campaign_mac(ids):
+    """HMAC keyed for one (user, campaign) pair; copied for every recipient."""
+    key = hmac.new(UNSUBSCRIBE_SECRET, ids, hashlib.sha256).digest()
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+
+class UnsubscribeSigner:
+    """
+    Signs unsubscribe tokens for every recipient of one campaign.
+
+    A token is base64url(user id | campaign id | email | signature). The key
+    for the campaign is derived once, so a recipient only costs one HMAC
+    update over the address. Verifying needs the secret and nothing else.
+    """
+
+    def __init__(self, user_id, campaign_id):
+        self._ids = ObjectId(user_id).binary + ObjectId(campaign_id).binary
+        self._mac = _campaign_mac(self._ids)
+
+    def token(self, email):
+        raw = email.encode("utf-8")
+        mac = self._mac.copy()
+        mac.update(raw)
+        return _b64encode(self._ids + raw + mac.digest()[:SIGNATURE_SIZE])
+
+    def url(self, email):
+        return f"{UNSUBSCRIBE_BASE_URL}/unsubscribe/{self.token(email)}"
+
+
+def verify_token(token):
+    """
+    (user_id, campaign_id, email) of a valid token, None if it is malformed
+    or was not signed with our secret.
+    """
+    try:
+        raw = _b64decode(token)
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) <= 2 * ID_SIZE + SIGNATURE_SIZE:
+        return None
+
+    ids, email, signature = raw[:2 * ID_SIZE], raw[2 * ID_SIZE:-SIGNATURE_SIZE], raw[-SIGNATURE_SIZE:]
+    mac = _campaign_mac(ids)
+    mac.update(email)
+    if not hmac.compare_digest(mac.digest()[:SIGNATURE_SIZE], signature):
+        return None
+    try:
+        return str(ObjectId(ids[:ID_SIZE])), str(ObjectId(ids[ID_SIZE:])), email.decode("utf-8")
+    except (InvalidId, UnicodeDecodeError):
+        return None
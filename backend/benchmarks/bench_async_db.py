@@ -0,0 +1,144 @@
+"""
+Requests/sec of GET /contacts/ on the old sync data layer vs the async one.
+
+The sync route is the pre-migration handler: a `def` route (run by Starlette
+on its threadpool) doing a blocking find_one for the user and a blocking
+find for the contacts. The async route awaits the same two queries on the
+async client. Both are driven with the same number of concurrent requests.
+
+By default Mongo is an in-process stand-in that sleeps --latency ms per round
+trip (time.sleep for sync, asyncio.sleep for async). Pass --mongo to run
+against MONGO_URI / DB_NAME instead; a throwaway user and contacts are
+inserted and removed again.
+
+    cd backend
+    python benchmarks/bench_async_db.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.routers.contact_router import serialize_contact
+
+USER_ID = ObjectId()
+
+
+# ---------------- IN-PROCESS STAND-IN ----------------
+class SyncStandIn:
+    def __init__(self, rows, latency):
+        self.rows = rows
+        self.latency = latency
+
+    def find_one(self, query):
+        time.sleep(self.latency)
+        return {"_id": USER_ID, "email": "bench@example.com"}
+
+    def find(self, query):
+        time.sleep(self.latency)
+        return iter(self.rows)
+
+
+class _Cursor:
+    def __init__(self, rows, latency):
+        self.rows = rows
+        self.latency = latency
+
+    async def to_list(self, length):
+        await asyncio.sleep(self.latency)
+        return list(self.rows)
+
+
+class AsyncStandIn:
+    def __init__(self, rows, latency):
+        self.rows = rows
+        self.latency = latency
+
+    async def find_one(self, query):
+        await asyncio.sleep(self.latency)
+        return {"_id": USER_ID, "email": "bench@example.com"}
+
+    def find(self, query):
+        return _Cursor(self.rows, self.latency)
+
+
+def build_app(users, contacts, async_users, async_contacts):
+    bench = FastAPI()
+
+    @bench.get("/sync/contacts/")
+    def get_contacts_sync():
+        user = users.find_one({"_id": USER_ID})
+        return [serialize_contact(c) for c in contacts.find({"user_id": ObjectId(user["_id"])})]
+
+    @bench.get("/async/contacts/")
+    async def get_contacts_async():
+        user = await async_users.find_one({"_id": USER_ID})
+        rows = await async_contacts.find({"user_id": ObjectId(user["_id"])}).to_list(None)
+        return [serialize_contact(c) for c in rows]
+
+    return bench
+
+
+async def drive(bench, path, requests, concurrency):
+    transport = httpx.ASGITransport(app=bench)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        queue = iter(range(requests))
+
+        async def worker():
+            for _ in queue:
+                response = await http.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--contacts", type=int, default=20, help="contacts returned per request")
+    parser.add_argument("--latency", type=float, default=20, help="stand-in round trip in ms")
+    parser.add_argument("--mongo", action="store_true", help="use MONGO_URI instead of the stand-in")
+    args = parser.parse_args()
+
+    rows = [
+        {"_id": ObjectId(), "user_id": USER_ID, "name": f"Contact {i}", "email": f"c{i}@example.com", "groups": []}
+        for i in range(args.contacts)
+    ]
+
+    if args.mongo:
+        from app.db.client import (
+            users_collection, contacts_collection, async_users_collection, async_contacts_collection
+        )
+        users_collection.insert_one({"_id": USER_ID, "email": f"bench-{USER_ID}@example.com"})
+        contacts_collection.insert_many(rows)
+        bench = build_app(users_collection, contacts_collection, async_users_collection, async_contacts_collection)
+        backend = "mongo"
+    else:
+        latency = args.latency / 1000
+        bench = build_app(SyncStandIn(rows, latency), SyncStandIn(rows, latency),
+                          AsyncStandIn(rows, latency), AsyncStandIn(rows, latency))
+        backend = f"stand-in, {args.latency:g} ms per round trip"
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.contacts} contacts each ({backend})")
+    try:
+        for label, path in (("sync ", "/sync/contacts/"), ("async", "/async/contacts/")):
+            rate = asyncio.run(drive(bench, path, args.requests, args.concurrency))
+            print(f"  {label}  {rate:8.0f} req/s")
+    finally:
+        if args.mongo:
+            contacts_collection.delete_many({"user_id": USER_ID})
+            users_collection.delete_one({"_id": USER_ID})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Latency of contact searches on a large synthetic account.
+
+Needs a real MongoDB (MONGO_URI / DB_NAME): index behaviour can't be
+faked in process. A throwaway user with --contacts synthetic contacts is
+inserted, the app's indexes are created, every query shape of
+/contacts/search is timed, and the user's contacts are removed again
+(pass --keep to reuse them with --user on the next run).
+
+    cd backend
+    python benchmarks/bench_contact_search.py --contacts 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+from bson import ObjectId
+from pymongo import InsertOne
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db.client import contacts_collection, ensure_indexes
+from app.services.contact_search import search_fields, search_query
+
+FIRST = ["james", "mary", "john", "patricia", "robert", "jennifer", "michael", "linda", "david", "elizabeth",
+         "william", "barbara", "richard", "susan", "joseph", "jessica", "thomas", "sarah", "charles", "karen"]
+LAST = ["smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis", "rodriguez", "martinez",
+        "hernandez", "lopez", "gonzalez", "wilson", "anderson", "thomas", "taylor", "moore", "jackson", "martin"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "hotmail.com", "icloud.com"] + [f"company{i}.com" for i in range(200)]
+
+
+def synthetic_contacts(user_id, count, seed=7):
+    rng = random.Random(seed)
+    start = datetime.datetime(2022, 1, 1)
+    for i in range(count):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        tag = "".join(rng.choices(string.ascii_lowercase + string.digits, k=4))
+        email = f"{first}.{last}{tag}{i}@{rng.choice(DOMAINS)}"
+        name = f"{first.title()} {last.title()}"
+        created_at = start + datetime.timedelta(seconds=i * 60)
+        yield {
+            # As if inserted at created_at, like real contacts
+            "_id": ObjectId(int(created_at.replace(tzinfo=datetime.timezone.utc).timestamp()).to_bytes(4, "big") + os.urandom(8)),
+            "user_id": user_id,
+            "name": name,
+            "email": email,
+            "created_at": created_at,
+            **search_fields(name, email),
+        }
+
+
+def seed(user_id, count):
+    ops = []
+    started = time.perf_counter()
+    for contact in synthetic_contacts(user_id, count):
+        ops.append(InsertOne(contact))
+        if len(ops) == 10000:
+            contacts_collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        contacts_collection.bulk_write(ops, ordered=False)
+    print(f"Inserted {count} contacts in {time.perf_counter() - started:.1f}s")
+
+
+def time_query(name, query, limit, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        list(contacts_collection.find(query, {"name": 1, "email": 1}).sort("_id", 1).limit(limit))
+        timings.append((time.perf_counter() - started) * 1000)
+    explain = contacts_collection.find(query).sort("_id", 1).limit(limit).explain()
+    stats = explain.get("executionStats", {})
+    print(f"  {name:<28} p50 {statistics.median(timings):7.1f} ms   max {max(timings):7.1f} ms   "
+          f"keys {stats.get('totalKeysExamined', '?'):>8}   docs {stats.get('totalDocsExamined', '?'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--user", help="reuse the contacts of a previous --keep run")
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic contacts in place")
+    args = parser.parse_args()
+
+    ensure_indexes()
+    user_id = ObjectId(args.user) if args.user else ObjectId()
+    if not args.user:
+        seed(user_id, args.contacts)
+
+    uid = str(user_id)
+    shapes = [
+        ("substring 'hnson'", search_query(uid, q="hnson")),
+        ("substring rare 'zz9'", search_query(uid, q="zz9")),
+        ("name/email prefix 'pa'", search_query(uid, q="pa")),
+        ("domain company42.com", search_query(uid, domain="company42.com")),
+        ("created in March 2022", search_query(
+            uid, created_from=datetime.datetime(2022, 3, 1), created_to=datetime.datetime(2022, 3, 31)
+        )),
+        ("substring + domain", search_query(uid, q="garcia", domain="gmail.com")),
+    ]
+    print(f"user {uid}, limit {args.limit}, {args.runs} runs per query")
+    try:
+        for name, query in shapes:
+            time_query(name, query, args.limit, args.runs)
+    finally:
+        if not args.keep:
+            contacts_collection.delete_many({"user_id": user_id})
+
+
+if __name__ == "__main__":
+    main()
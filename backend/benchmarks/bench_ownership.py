@@ -0,0 +1,114 @@
+"""
+Group ownership validation: one find_one per contact id (the old
+create_group / update_group loop) vs validate_contact_ids ($in batches).
+
+By default Mongo is an in-process stand-in: every round trip costs
+--latency ms plus --per-id-us microseconds per id it looks at. Pass --mongo
+to run against MONGO_URI / DB_NAME instead; a throwaway user and contacts
+are inserted and removed again.
+
+    cd backend
+    python benchmarks/bench_ownership.py --sizes 1000 10000 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bson import ObjectId
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import contact_ownership
+from app.services.contact_ownership import validate_contact_ids
+
+
+# ---------------- IN-PROCESS STAND-IN ----------------
+class _Cursor:
+    def __init__(self, rows, delay):
+        self.rows = rows
+        self.delay = delay
+
+    async def to_list(self, length):
+        await asyncio.sleep(self.delay)
+        return self.rows
+
+
+class StandIn:
+    def __init__(self, user_id, ids, latency, per_id):
+        self.user_id = user_id
+        self.ids = set(ids)
+        self.latency = latency
+        self.per_id = per_id
+
+    async def find_one(self, query):
+        await asyncio.sleep(self.latency + self.per_id)
+        if query["_id"] in self.ids:
+            return {"_id": query["_id"], "user_id": self.user_id}
+        return None
+
+    def find(self, query, projection):
+        wanted = query["_id"]["$in"]
+        rows = [{"_id": i} for i in wanted if i in self.ids]
+        return _Cursor(rows, self.latency + self.per_id * len(wanted))
+
+
+async def validate_one_by_one(collection, user_id, contact_ids):
+    """The pre-batching loop from group_router."""
+    for cid in contact_ids:
+        contact = await collection.find_one({"_id": ObjectId(cid)})
+        if not contact or str(contact["user_id"]) != str(user_id):
+            return False
+    return True
+
+
+async def run(collection, user_id, ids):
+    started = time.perf_counter()
+    assert await validate_one_by_one(collection, user_id, ids)
+    old = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = await validate_contact_ids(user_id, ids)
+    new = time.perf_counter() - started
+    assert not result.invalid
+    return old, new
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in round trip in ms")
+    parser.add_argument("--per-id-us", type=float, default=1, help="stand-in server time per id in microseconds")
+    parser.add_argument("--mongo", action="store_true", help="use MONGO_URI instead of the stand-in")
+    args = parser.parse_args()
+
+    user_id = ObjectId()
+    ids = [ObjectId() for _ in range(max(args.sizes))]
+
+    if args.mongo:
+        from app.db.client import async_contacts_collection, contacts_collection
+        contacts_collection.insert_many(
+            [{"_id": i, "user_id": user_id, "name": "bench", "email": f"{i}@example.com"} for i in ids]
+        )
+        collection = async_contacts_collection
+        backend = "mongo"
+    else:
+        collection = StandIn(user_id, ids, args.latency / 1000, args.per_id_us / 1e6)
+        contact_ownership.async_contacts_collection = collection
+        backend = f"stand-in, {args.latency:g} ms per round trip, {args.per_id_us:g} us per id"
+
+    print(f"Validating contact ids ({backend})")
+    try:
+        for size in args.sizes:
+            sample = [str(i) for i in ids[:size]]
+            old, new = asyncio.run(run(collection, user_id, sample))
+            print(f"  {size:>7} ids   find_one loop {old * 1000:9.1f} ms   $in batches {new * 1000:8.1f} ms   "
+                  f"x{old / new:,.0f}")
+    finally:
+        if args.mongo:
+            contacts_collection.delete_many({"user_id": user_id})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import sys
+import os
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from fastapi import HTTPException
+from jose import jwt
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.auth_cache import TTLCache, invalidate_user, token_cache, user_cache
+from app.core.security import ALGORITHM, SECRET_KEY, create_access_token, get_current_user_swagger
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    user_cache.clear()
+    token_cache.clear()
+
+
+def test_ttl_cache_is_bounded_and_expires():
+    cache = TTLCache(size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.put("short", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    # Entries never outlive the cache's own TTL
+    cache.put("long", 5, ttl=3600)
+    assert cache._entries["long"][0] <= time.monotonic() + 60
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evicted"], stats["expired"]) == (2, 2, 2, 1)
+
+
+def _users():
+    users = MagicMock(spec=AsyncCollection)
+    users.find_one.return_value = {"_id": ObjectId(USER_ID), "email": "test@example.com"}
+    return users
+
+
+@patch("app.core.security.async_users_collection", new_callable=_users)
+def test_steady_state_auth_does_no_io(mock_users):
+    token = "Bearer " + create_access_token(USER_ID)
+
+    with patch("app.core.security.jwt.decode", wraps=jwt.decode) as decode:
+        first = asyncio.run(get_current_user_swagger(token))
+        second = asyncio.run(get_current_user_swagger(token))
+
+    assert first == second == {"_id": USER_ID, "email": "test@example.com"}
+    assert decode.call_count == 1
+    mock_users.find_one.assert_awaited_once()
+
+    # Callers get copies, the cached document is not shared
+    first["email"] = "changed@example.com"
+    assert asyncio.run(get_current_user_swagger(token))["email"] == "test@example.com"
+
+    # A changed user record is read again
+    invalidate_user(USER_ID)
+    asyncio.run(get_current_user_swagger(token))
+    assert mock_users.find_one.await_count == 2
+    assert user_cache.stats()["hits"] == 2
+
+
+@patch("app.core.security.async_users_collection", new_callable=_users)
+def test_expired_and_unknown_tokens_are_not_cached(mock_users):
+    expired = jwt.encode({"sub": USER_ID, "exp": int(time.time()) - 10}, SECRET_KEY, algorithm=ALGORITHM)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(get_current_user_swagger(expired))
+    assert e.value.status_code == 401
+    assert token_cache.stats()["size"] == 0
+
+    mock_users.find_one.return_value = None
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(get_current_user_swagger(create_access_token(USER_ID)))
+    assert e.value.detail == "User not found"
+    assert user_cache.stats()["size"] == 0
+
+
+@patch("app.services.segments.contact_versions_collection")
+@patch("app.core.security.async_users_collection", new_callable=_users)
+def test_contact_writes_keep_the_user_cached(mock_users, mock_versions):
+    from app.services.segments import bump_contacts_version
+
+    token = create_access_token(USER_ID)
+    asyncio.run(get_current_user_swagger(token))
+    bump_contacts_version(USER_ID)
+    asyncio.run(get_current_user_swagger(token))
+
+    # The version lives outside the user document, so the cached user stays valid
+    mock_versions.update_one.assert_called_once()
+    mock_users.find_one.assert_awaited_once()
@@ -2,8 +2,12 @@ import sys
 import os
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import gzip
 import io
+import json
+import zipfile
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -12,6 +16,9 @@ from app.main import app
 from app.routers.contact_router import router
 from app.core.security import get_current_user_swagger
 from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError
+from app.services.contact_import import normalize_legacy_contacts, upsert_contacts
 
 # Override dependency
 async def mock_get_current_user():
@@ -21,13 +28,13 @@ app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
 
 client = TestClient(app)
 
-@patch("app.routers.contact_router.contacts_collection")
+@patch("app.routers.contact_router.async_contacts_collection")
 def test_parse_import_csv(mock_contacts):
     # Setup mocks
     mock_contacts.find_one.return_value = None 
     
     csv_content = "name,email\nJohn Doe,john@example.com\nJane Doe,jane@example.com"
-    files = {'file': ('contacts.csv', io.StringIO(csv_content), 'text/csv')}
+    files = {'file': ('contacts.csv', io.BytesIO(csv_content.encode()), 'text/csv')}
     
     response = client.post("/contacts/parse-import", files=files)
     
@@ -38,13 +45,13 @@ def test_parse_import_csv(mock_contacts):
     assert json_response["contacts"][0]["email"] == "john@example.com"
     assert json_response["contacts"][0]["name"] == "John Doe"
 
-@patch("app.routers.contact_router.contacts_collection")
+@patch("app.routers.contact_router.async_contacts_collection")
 def test_parse_import_txt(mock_contacts):
     # Setup mocks
     mock_contacts.find_one.return_value = None
     
     txt_content = "john@example.com\njane@example.com"
-    files = {'file': ('contacts.txt', io.StringIO(txt_content), 'text/plain')}
+    files = {'file': ('contacts.txt', io.BytesIO(txt_content.encode()), 'text/plain')}
     
     response = client.post("/contacts/parse-import", files=files)
     
@@ -54,17 +61,54 @@ def test_parse_import_txt(mock_contacts):
     assert len(json_response["contacts"]) == 2
     assert json_response["contacts"][0]["email"] == "john@example.com"
 
-@patch("app.routers.contact_router.contacts_collection")
-@patch("app.routers.contact_router.groups_collection")
-def test_bulk_create_contacts(mock_groups, mock_contacts):
-    # Setup mocks
-    mock_contacts.find_one.return_value = None
-    mock_contacts.insert_one.return_value = MagicMock(inserted_id=ObjectId())
-    
+def test_parse_import_compressed_files_and_ndjson():
+    rows = "".join(f"Person {i},person{i}@example.com\n" for i in range(1200))
+    csv_gz = gzip.compress(("name,email\n" + rows).encode("utf-8"))
+
+    response = client.post(
+        "/contacts/parse-import?format=ndjson",
+        files={'file': ('contacts.csv.gz', io.BytesIO(csv_gz), 'application/gzip')}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert len(lines) == 1200
+    assert json.loads(lines[-1]) == {"email": "person1199@example.com", "name": "Person 1199"}
+
+    # UTF-16 text file (with BOM) inside a zip, next to macOS metadata
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("__MACOSX/._list.txt", b"junk")
+        z.writestr("export/list.txt", "jörg@example.com\r\nnot-an-email\r\n".encode("utf-16"))
+    response = client.post("/contacts/parse-import", files={'file': ('list.zip', io.BytesIO(archive.getvalue()), 'application/zip')})
+    assert response.json()["contacts"] == [{"email": "jörg@example.com", "name": "jörg"}]
+
+    # No BOM and not UTF-8: read as cp1252
+    response = client.post("/contacts/parse-import", files={'file': ('c.csv', io.BytesIO("email\nJosé@example.com".encode("cp1252")), 'text/csv')})
+    assert response.json()["contacts"][0]["email"] == "José@example.com"
+
+    response = client.post("/contacts/parse-import", files={'file': ('c.csv.gz', io.BytesIO(b"not gzip"), 'application/gzip')})
+    assert response.status_code == 400
+
+@patch("app.services.segments.async_contact_versions_collection", MagicMock(spec=AsyncCollection))
+@patch("app.services.group_members.async_groups_collection", MagicMock(spec=AsyncCollection))
+@patch("app.services.group_members.async_group_members_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+@patch("app.services.contact_import.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+@patch("app.routers.contact_router.async_groups_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_bulk_create_contacts(mock_groups, mock_contacts, mock_members):
+    # Setup mocks: John is new, Jane already exists
+    john_id, jane_id = ObjectId(), ObjectId()
+    mock_contacts.bulk_write.return_value = MagicMock(upserted_ids={0: john_id})
+    mock_contacts.find.return_value.to_list = AsyncMock(return_value=[{"_id": jane_id}])
+    mock_groups.find_one.return_value = {"_id": ObjectId("507f1f77bcf86cd799439012")}
+    mock_members.insert_many.return_value = MagicMock(inserted_ids=[ObjectId(), ObjectId()])
+
     payload = {
         "contacts": [
             {"name": "John Doe", "email": "john@example.com"},
-            {"name": "Jane Doe", "email": "jane@example.com"}
+            {"name": "Jane Doe", "email": "Jane@Example.com "},
+            {"name": "Jane Again", "email": "jane@example.com"}
         ],
         "group_id": "507f1f77bcf86cd799439012"
     }
@@ -73,20 +117,136 @@ def test_bulk_create_contacts(mock_groups, mock_contacts):
     
     assert response.status_code == 200
     json_response = response.json()
-    assert json_response["added_count"] == 2
-    assert json_response["total_processed"] == 2
+    assert json_response["added_count"] == 1
+    assert json_response["total_processed"] == 3
     
-    # Verify insert calls
-    assert mock_contacts.insert_one.call_count == 2
-    
-    # Verify group update
-    assert mock_groups.update_one.call_count == 1
+    # One unordered bulk upsert for the whole (de-duplicated) chunk
+    mock_contacts.insert_one.assert_not_called()
+    ops = mock_contacts.bulk_write.call_args[0][0]
+    assert mock_contacts.bulk_write.call_args[1]["ordered"] is False
+    assert [op._filter["email"] for op in ops] == ["john@example.com", "jane@example.com"]
+    assert ops[1]._doc["$setOnInsert"]["name"] == "Jane Doe"
+
+    # Existing ids looked up in one query
+    assert mock_contacts.find.call_args[0][0]["email"] == {"$in": ["jane@example.com"]}
+
+    # Both become members of the (owned) group
+    assert mock_groups.find_one.call_args[0][0]["user_id"] == ObjectId("507f1f77bcf86cd799439011")
+    rows = mock_members.insert_many.call_args[0][0]
+    assert [r["contact_id"] for r in rows] == [john_id, jane_id]
+    assert mock_members.insert_many.call_args[1] == {"ordered": False}
+
+
+@patch("app.services.segments.async_contact_versions_collection", MagicMock(spec=AsyncCollection))
+@patch("app.services.contact_import.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_bulk_import_is_chunked_and_survives_races(mock_contacts):
+    raced = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11000, "errmsg": "duplicate key"}],
+        "upserted": [{"index": 0, "_id": ObjectId()}],
+    })
+    mock_contacts.bulk_write.side_effect = [
+        MagicMock(upserted_ids={0: ObjectId(), 1: ObjectId()}),
+        raced,
+    ]
+
+    added, ids = asyncio.run(upsert_contacts(
+        "507f1f77bcf86cd799439011",
+        [{"email": f"c{i}@example.com"} for i in range(4)] + [{"email": "no-at-sign"}, {"name": "x"}],
+        batch_size=2
+    ))
+
+    assert mock_contacts.bulk_write.call_count == 2
+    assert added == 3
+    # Ids only looked up when the caller needs them
+    assert ids == []
+    mock_contacts.find.assert_not_called()
 
 if __name__ == "__main__":
     # Manually run tests if executed directly
-    with patch("app.routers.contact_router.contacts_collection") as mock_contacts, \
-         patch("app.routers.contact_router.groups_collection") as mock_groups:
+    with patch("app.services.contact_import.async_contacts_collection", MagicMock(spec=AsyncCollection)) as mock_contacts, \
+         patch("app.routers.contact_router.async_groups_collection", MagicMock(spec=AsyncCollection)) as mock_groups:
         test_parse_import_csv(mock_contacts)
         test_parse_import_txt(mock_contacts)
-        test_bulk_create_contacts(mock_groups, mock_contacts)
+        test_bulk_create_contacts(mock_groups, mock_contacts, MagicMock(spec=AsyncCollection))
         print("All tests passed!")
+
+
+@patch("app.services.segments.contact_versions_collection", MagicMock())
+@patch("app.services.contact_import.groups_collection", MagicMock())
+@patch("app.services.group_members.groups_collection")
+@patch("app.services.group_members.group_members_collection")
+@patch("app.services.contact_import.group_members_collection")
+@patch("app.services.contact_import.contacts_collection")
+def test_legacy_contacts_are_normalized_and_merged(mock_contacts, mock_members, mock_counted, mock_groups):
+    user_id, group_a, group_b = ObjectId(), ObjectId(), ObjectId()
+    oldest, newer = ObjectId(), ObjectId()
+    mock_contacts.index_information.return_value = {"_id_": {}}
+    mock_contacts.aggregate.return_value = iter([{
+        "_id": {"user_id": user_id, "email": "john@x.com"},
+        "ids": [oldest, newer], "stored": " John@X.com", "name": "John",
+    }])
+    rows = [{"_id": ObjectId(), "group_id": group_a}, {"_id": ObjectId(), "group_id": group_b}]
+    mock_members.find.return_value = rows
+    # The kept contact is already in group_a but not in group_b
+    mock_members.find_one.side_effect = [{"_id": ObjectId()}, None]
+    mock_counted.count_documents.return_value = 1
+
+    assert normalize_legacy_contacts() == 1
+
+    mock_members.delete_one.assert_called_once_with({"_id": rows[0]["_id"]})
+    mock_members.update_one.assert_called_once_with({"_id": rows[1]["_id"]}, {"$set": {"contact_id": oldest}})
+    mock_contacts.delete_many.assert_called_once_with({"_id": {"$in": [newer]}})
+    query, update = mock_contacts.update_one.call_args[0]
+    assert query == {"_id": oldest}
+    assert update["$set"]["email"] == "john@x.com"
+    assert update["$set"]["email_domain"] == "x.com"
+    assert {c[0][0]["_id"] for c in mock_groups.update_one.call_args_list} == {group_a, group_b}
+
+    # Nothing to do once the unique index exists
+    mock_contacts.index_information.return_value = {"user_id_1_email_1": {}}
+    mock_contacts.aggregate.reset_mock()
+    assert normalize_legacy_contacts() == 0
+    mock_contacts.aggregate.assert_not_called()
+
+
+@patch("app.services.segments.contact_versions_collection", MagicMock())
+@patch("app.services.group_members.groups_collection", MagicMock())
+@patch("app.services.contact_import.groups_collection")
+@patch("app.services.contact_import.group_members_collection")
+@patch("app.services.contact_import.contacts_collection")
+def test_merged_contacts_stay_in_unmigrated_groups(mock_contacts, mock_members, mock_groups):
+    oldest, newer = ObjectId(), ObjectId()
+    mock_contacts.index_information.return_value = {}
+    mock_contacts.aggregate.return_value = iter([{
+        "_id": {"user_id": ObjectId(), "email": "john@x.com"},
+        "ids": [oldest, newer], "stored": "JOHN@x.com", "name": "John",
+    }])
+    mock_members.find.return_value = []
+
+    assert normalize_legacy_contacts() == 1
+
+    # A legacy group embedding [newer, other] ends up with [other, oldest]
+    query, pipeline = mock_groups.update_many.call_args[0]
+    assert query == {"contact_ids": {"$in": [newer]}}
+    kept, added = pipeline[0]["$set"]["contact_ids"]["$setUnion"]
+    assert kept["$filter"]["cond"] == {"$not": [{"$in": ["$$this", [newer]]}]}
+    assert added == [oldest]
+
+
+@patch("app.services.contact_import.contacts_collection")
+def test_normalization_survives_an_unreachable_database(mock_contacts):
+    mock_contacts.index_information.side_effect = Exception("No servers found yet")
+
+    assert normalize_legacy_contacts() == 0
+
+
+def test_one_failing_index_does_not_skip_the_rest():
+    from app.db import client as db_client
+
+    collections = [MagicMock() for _ in db_client.INDEXES]
+    collections[0].create_index.side_effect = Exception("E11000 duplicate key")
+    indexes = [(c, keys, options) for c, (_, keys, options) in zip(collections, db_client.INDEXES)]
+
+    with patch.object(db_client, "INDEXES", indexes):
+        assert db_client.ensure_indexes() == len(indexes) - 1
+    assert all(c.create_index.called for c in collections)
@@ -0,0 +1,98 @@
+import sys
+import os
+import threading
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.campaign_jobs import CampaignJob, CampaignJobManager, job_manager
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def test_job_progress_counters():
+    manager = CampaignJobManager(max_workers=1)
+
+    def work(job):
+        job.record_sent(3)
+        job.record_failed()
+
+    job = manager.submit(CampaignJob(USER_ID, "newsletter", total=5), work)
+    assert job.wait(timeout=5)
+
+    snapshot = job.snapshot()
+    assert snapshot["status"] == "completed"
+    assert snapshot["sent"] == 3
+    assert snapshot["failed"] == 1
+    assert snapshot["remaining"] == 1
+
+    # Jobs are only visible to their owner
+    assert manager.get(job.id, USER_ID) is job
+    assert manager.get(job.id, "someone-else") is None
+
+
+def test_job_crash_marks_failed():
+    manager = CampaignJobManager(max_workers=1)
+
+    def work(job):
+        raise RuntimeError("boom")
+
+    job = manager.submit(CampaignJob(USER_ID, "newsletter", total=1), work)
+    assert job.wait(timeout=5)
+    assert job.snapshot()["status"] == "failed"
+    assert job.snapshot()["error"] == "boom"
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_cancel_running_newsletter(mock_emails, mock_ses):
+    release = threading.Event()
+
+    def slow_send(**kwargs):
+        release.wait(timeout=5)
+        return {"MessageId": "123"}
+
+    mock_ses.send_raw_email.side_effect = slow_send
+    mock_emails.insert_one.return_value = MagicMock()
+
+    data = {
+        "subject": "Newsletter Subject",
+        "body": "<html><body>Body</body></html>",
+        "to_emails": ",".join(f"r{i}@example.com" for i in range(50)),
+    }
+    response = client.post("/email/send/newsletter", data=data)
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+
+    cancel = client.post(f"/email/campaigns/{job_id}/cancel")
+    assert cancel.status_code == 200
+    release.set()
+
+    assert job_manager.get(job_id, USER_ID).wait(timeout=5)
+    progress = client.get(f"/email/campaigns/{job_id}").json()
+    assert progress["status"] == "cancelled"
+    assert progress["sent"] < 50
+
+    assert mock_emails.insert_one.call_args[0][0]["job_id"] == job_id
+    final = mock_emails.update_one.call_args[0][1]
+    assert final["$set"]["status"] == "cancelled"
+    assert final["$unset"] == {"resume": ""}
+
+
+def test_unknown_job_returns_404():
+    response = client.get("/email/campaigns/does-not-exist")
+    assert response.status_code == 404
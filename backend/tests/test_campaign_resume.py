@@ -0,0 +1,202 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.routers.email_router import resume_campaigns
+from app.services.campaign_jobs import job_manager
+from app.services.delivery_records import DeliveryRecorder
+from app.services.ses_dispatcher import SESDispatcher
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+EMAILS = [f"r{i}@example.com" for i in range(10)]
+
+
+@patch("app.services.delivery_records.deliveries_collection")
+def test_claim_skips_recipients_claimed_before(mock_deliveries):
+    mock_deliveries.insert_many.side_effect = BulkWriteError({
+        "writeErrors": [{"index": 1, "code": 11000}, {"index": 3, "code": 11000}]
+    })
+    recorder = DeliveryRecorder(ObjectId(), USER_ID, claims=True)
+
+    claimed = recorder.claim(EMAILS[:5])
+
+    assert claimed == ["r0@example.com", "r2@example.com", "r4@example.com"]
+    rows = mock_deliveries.insert_many.call_args[0][0]
+    assert all(r["status"] == "pending" for r in rows)
+
+
+@patch("app.routers.email_router.CHECKPOINT_BATCH_SIZE", 4)
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_newsletter_checkpoints_claimed_batches(mock_emails, mock_ses):
+    mock_ses.send_raw_email.return_value = {"MessageId": "123"}
+    data = {"subject": "Weekly", "body": "<p>News</p>", "to_emails": ",".join(EMAILS)}
+
+    response = client.post("/email/send/newsletter", data=data)
+    assert response.status_code == 200
+    assert job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+
+    campaign = mock_emails.insert_one.call_args[0][0]
+    assert campaign["status"] == "sending"
+    assert campaign["resume"]["audience"]["emails"] == EMAILS
+
+    updates = [c[0][1]["$set"] for c in mock_emails.update_one.call_args_list]
+    checkpoints = [u["resume.checkpoint"] for u in updates if "resume.checkpoint" in u]
+    assert checkpoints == ["r3@example.com", "r7@example.com", "r9@example.com"]
+    assert updates[-1]["status"] == "success"
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_resume_continues_after_checkpoint(mock_emails, mock_ses, mock_deliveries):
+    campaign_id = ObjectId()
+    mock_emails.find.return_value = [{
+        "_id": campaign_id,
+        "user_id": ObjectId(USER_ID),
+        "subject": "Weekly",
+        "recipients_count": 10,
+        "status": "sending",
+        "delivery_mode": "raw",
+        "resume": {
+            "html": "<p>News</p>",
+            "audience": {"emails": EMAILS, "group_ids": [], "send_to_all": False},
+            "images": [],
+            "checkpoint": "r7@example.com",
+        },
+    }]
+    # r0..r4 were confirmed, r5 was handed to SES but the server died before
+    # it answered, r6 and r7 were claimed and never sent
+    mock_deliveries.find.return_value = [{"email": "r7@example.com"}, {"email": "r6@example.com"}]
+    mock_deliveries.aggregate.return_value = [{"_id": "sent", "n": 5}, {"_id": "failed", "n": 1}]
+    mock_ses.send_raw_email.return_value = {"MessageId": "123"}
+
+    jobs = resume_campaigns()
+
+    assert len(jobs) == 1
+    assert jobs[0].wait(timeout=5)
+    assert mock_deliveries.update_many.call_args_list[0][0] == (
+        {"campaign_id": campaign_id, "status": "sending"},
+        {"$set": {"status": "failed", "error": "interrupted"}}
+    )
+
+    sent_to = sorted(c[1]["Destinations"][0] for c in mock_ses.send_raw_email.call_args_list)
+    assert sent_to == EMAILS[6:]
+    # Every email is marked as handed to SES before the call, one write per slice
+    marks = [c[0][0]["email"]["$in"] for c in mock_deliveries.update_many.call_args_list[1:]]
+    assert marks == [EMAILS[6:]]
+
+    progress = jobs[0].snapshot()
+    assert progress["job_id"] == str(campaign_id)
+    assert progress["sent"] == 9
+    assert progress["failed"] == 1
+    assert progress["remaining"] == 0
+
+    final = mock_emails.update_one.call_args[0][1]
+    # r5 was lost to the crash
+    assert final["$set"]["status"] == "partial"
+    assert final["$unset"] == {"resume": ""}
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.campaign_images.campaign_images")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_inline_images_are_kept_out_of_the_log(mock_emails, mock_ses, mock_images):
+    file_id = ObjectId()
+    mock_images.put.return_value = file_id
+    mock_images.find.return_value = [MagicMock(_id=file_id)]
+    mock_ses.send_raw_email.return_value = {"MessageId": "123"}
+    files = [("inline_images", ("logo.png", b"\x89PNG\r\n\x1a\n", "image/png"))]
+
+    response = client.post("/email/send/newsletter", data={"subject": "s", "body": "<p>b</p>", "to_emails": "a@x.com"}, files=files)
+    assert response.status_code == 200
+    assert job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+
+    campaign = mock_emails.insert_one.call_args[0][0]
+    assert campaign["resume"]["images"] == [{"file_id": file_id, "cid": "logo.png", "filename": "logo.png"}]
+    assert mock_images.put.call_args[0][0] == b"\x89PNG\r\n\x1a\n"
+    assert mock_images.put.call_args[1]["metadata"] == {"campaign_id": campaign["_id"]}
+    # Nothing left to replay, so the images go with the resume data
+    mock_images.delete.assert_called_once_with(file_id)
+
+
+@patch("app.services.campaign_images.campaign_images")
+def test_resumed_images_are_read_back(mock_images):
+    from app.services.campaign_images import load_images
+
+    file_id = ObjectId()
+    mock_images.get.return_value.read.return_value = b"png"
+    legacy = {"content": b"gif", "cid": "old.gif", "filename": "old.gif"}
+
+    images = load_images([{"file_id": file_id, "cid": "logo.png", "filename": "logo.png"}, legacy])
+
+    assert images == [{"content": b"png", "cid": "logo.png", "filename": "logo.png"}, legacy]
+    mock_images.get.assert_called_once_with(file_id)
+
+
+@patch("app.routers.email_router.CHECKPOINT_BATCH_SIZE", 4)
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_failed_run_stays_resumable(mock_emails, mock_ses):
+    mock_ses.send_raw_email.return_value = {"MessageId": "123"}
+    # The second checkpoint write hits a database outage
+    mock_emails.update_one.side_effect = [MagicMock(), Exception("connection reset"), MagicMock()]
+    data = {"subject": "Weekly", "body": "<p>News</p>", "to_emails": ",".join(EMAILS)}
+
+    response = client.post("/email/send/newsletter", data=data)
+    job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+
+    final = mock_emails.update_one.call_args[0][1]
+    assert final["$set"]["status"] == "interrupted"
+    assert "$unset" not in final
+    # ...and is picked up again on the next start
+    mock_emails.find.return_value = []
+    resume_campaigns()
+    assert mock_emails.find.call_args[0][0]["status"] == {"$in": ["sending", "interrupted"]}
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_newsletter_status_counts_failures(mock_emails, mock_ses):
+    mock_ses.send_raw_email.side_effect = [{"MessageId": "1"}] + [Exception("rejected")] * 9
+    data = {"subject": "Weekly", "body": "<p>News</p>", "to_emails": ",".join(EMAILS)}
+
+    response = client.post("/email/send/newsletter", data=data)
+    job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+    assert mock_emails.update_one.call_args[0][1]["$set"]["status"] == "partial"
+
+    mock_ses.send_raw_email.side_effect = Exception("rejected")
+    response = client.post("/email/send/newsletter", data=data)
+    job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+    assert mock_emails.update_one.call_args[0][1]["$set"]["status"] == "failed"
@@ -0,0 +1,133 @@
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+
+USER_ID = "507f1f77bcf86cd799439011"
+GROUP_ID = "507f1f77bcf86cd799439021"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def async_collection():
+    return MagicMock(spec=AsyncCollection)
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({}, "Provide either contact_ids or filter"),
+    ({"contact_ids": [str(ObjectId())], "filter": {"domain": "acme.io"}}, "Provide either contact_ids or filter"),
+    ({"filter": {}}, "filter must set at least one field"),
+])
+def test_bulk_delete_needs_one_selection(body, detail):
+    response = client.post("/contacts/bulk-delete", json=body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+
+
+@patch("app.services.segments.async_contact_versions_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.remove_contacts_async", new_callable=AsyncMock)
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=async_collection)
+def test_bulk_delete_by_ids_cleans_up_groups(mock_contacts, mock_owned, mock_remove, mock_versions):
+    a, b = ObjectId(), ObjectId()
+    mock_owned.find.return_value.to_list = AsyncMock(return_value=[{"_id": a}, {"_id": b}])
+    mock_contacts.delete_many.return_value = MagicMock(deleted_count=2)
+    mock_remove.return_value = 3
+
+    response = client.post("/contacts/bulk-delete", json={"contact_ids": [str(a), str(b)]})
+
+    assert response.status_code == 200
+    assert response.json()["deleted_count"] == 2
+    assert response.json()["memberships_removed"] == 3
+    mock_contacts.delete_many.assert_awaited_once_with({"user_id": ObjectId(USER_ID), "_id": {"$in": [a, b]}})
+    mock_remove.assert_awaited_once_with([a, b])
+    # Segment previews reading contacts are recounted
+    assert mock_versions.update_one.call_args[0] == ({"_id": ObjectId(USER_ID)}, {"$inc": {"contacts_version": 1}})
+
+
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=async_collection)
+def test_bulk_delete_rejects_foreign_ids_before_deleting(mock_contacts, mock_owned):
+    mine, theirs = ObjectId(), ObjectId()
+    mock_owned.find.return_value.to_list = AsyncMock(return_value=[{"_id": mine}])
+
+    response = client.post("/contacts/bulk-delete", json={"contact_ids": [str(mine), str(theirs)]})
+
+    assert response.status_code == 400
+    assert str(theirs) in response.json()["detail"]
+    mock_contacts.delete_many.assert_not_called()
+
+
+@patch("app.routers.contact_router.CONTACT_BULK_BATCH_SIZE", 2)
+@patch("app.services.segments.async_contact_versions_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.remove_contacts_async", new_callable=AsyncMock)
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=async_collection)
+def test_bulk_delete_by_filter_pages_by_id(mock_contacts, mock_remove, mock_versions):
+    ids = [ObjectId() for _ in range(3)]
+    pages = [[{"_id": ids[0]}, {"_id": ids[1]}], [{"_id": ids[2]}]]
+    mock_contacts.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(side_effect=pages)
+    mock_contacts.delete_many.side_effect = lambda query: MagicMock(deleted_count=len(query["_id"]["$in"]))
+    mock_remove.return_value = 0
+
+    response = client.post("/contacts/bulk-delete", json={"filter": {"domain": "acme.io"}})
+
+    assert response.json()["deleted_count"] == 3
+    first, second = [c[0][0] for c in mock_contacts.find.call_args_list]
+    assert first["email_domain"] == "acme.io"
+    assert second["_id"] == {"$gt": ids[1]}
+    assert [c[0][0]["_id"]["$in"] for c in mock_contacts.delete_many.call_args_list] == [ids[:2], ids[2:]]
+
+
+@patch("app.services.segments.async_contact_versions_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.add_members_async", new_callable=AsyncMock)
+@patch("app.routers.contact_router.async_groups_collection", new_callable=async_collection)
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=async_collection)
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=async_collection)
+def test_bulk_update_renames_and_adds_to_group(mock_contacts, mock_owned, mock_groups, mock_add, mock_versions):
+    a, b = ObjectId(), ObjectId()
+    mock_owned.find.return_value.to_list = AsyncMock(return_value=[{"_id": a}, {"_id": b}])
+    mock_groups.find_one.return_value = {"_id": ObjectId(GROUP_ID)}
+    mock_contacts.update_many.return_value = MagicMock(modified_count=2)
+    mock_add.return_value = 1
+
+    response = client.post("/contacts/bulk-update", json={
+        "contact_ids": [str(a), str(b)], "name": "$VIP", "add_to_group": GROUP_ID
+    })
+
+    assert response.status_code == 200
+    assert response.json()["modified_count"] == 2
+    assert response.json()["added_to_group"] == 1
+    query, pipeline = mock_contacts.update_many.call_args[0]
+    assert query == {"user_id": ObjectId(USER_ID), "_id": {"$in": [a, b]}}
+    stage = pipeline[0]["$set"]
+    # Taken literally, not as a field path
+    assert stage["name"] == {"$literal": "$VIP"}
+    assert stage["search_grams"]["$setUnion"][0] == {"$literal": ["$vi", "vip"]}
+    mock_add.assert_awaited_once_with(GROUP_ID, USER_ID, [a, b])
+
+
+@patch("app.routers.contact_router.async_groups_collection", new_callable=async_collection)
+def test_bulk_update_checks_the_group(mock_groups):
+    mock_groups.find_one.return_value = None
+
+    response = client.post("/contacts/bulk-update", json={
+        "filter": {"q": "smith"}, "remove_from_group": GROUP_ID
+    })
+
+    assert response.status_code == 404
+    assert client.post("/contacts/bulk-update", json={"filter": {"q": "smith"}}).status_code == 400
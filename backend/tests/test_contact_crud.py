@@ -2,8 +2,11 @@ import sys
 import os
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+import json
+import datetime
 from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
 
 # Add backend to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -19,8 +22,10 @@ app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
 
 client = TestClient(app)
 
-@patch("app.routers.contact_router.contacts_collection")
-def test_delete_contact(mock_contacts):
+@patch("app.services.segments.async_contact_versions_collection", MagicMock(spec=AsyncCollection))
+@patch("app.routers.contact_router.remove_contacts_async", new_callable=AsyncMock)
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_delete_contact(mock_contacts, mock_remove):
     # Setup mocks
     contact_id = "507f1f77bcf86cd799439012"
     mock_contacts.find_one.return_value = {
@@ -38,8 +43,10 @@ def test_delete_contact(mock_contacts):
     
     # Verify delete call
     mock_contacts.delete_one.assert_called_once()
+    # Its group memberships go with it
+    mock_remove.assert_awaited_once_with([contact_id])
 
-@patch("app.routers.contact_router.contacts_collection")
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
 def test_delete_contact_not_found(mock_contacts):
     # Setup mocks
     mock_contacts.find_one.return_value = None
@@ -49,8 +56,56 @@ def test_delete_contact_not_found(mock_contacts):
     assert response.status_code == 404
     assert response.json()["detail"] == "Contact not found"
 
+def _contact_rows(count):
+    return [
+        {"_id": ObjectId(), "name": f"Contact {i}", "email": f"c{i}@example.com",
+         "created_at": datetime.datetime(2024, 1, 1)}
+        for i in range(count)
+    ]
+
+
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_get_contacts_is_keyset_paginated_and_projected(mock_contacts):
+    rows = _contact_rows(2)
+    cursor = mock_contacts.find.return_value.sort.return_value
+    cursor.limit.return_value.to_list = AsyncMock(return_value=rows)
+    after = str(ObjectId())
+
+    response = client.get(f"/contacts/?after={after}&limit=2&fields=email")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["contacts"][0] == {"id": str(rows[0]["_id"]), "email": "c0@example.com"}
+    # Full page: the client asks again from the last id
+    assert body["next_after"] == str(rows[1]["_id"])
+
+    query, projection = mock_contacts.find.call_args[0]
+    assert query == {"user_id": ObjectId("507f1f77bcf86cd799439011"), "_id": {"$gt": ObjectId(after)}}
+    assert projection == {"email": 1}
+    mock_contacts.find.return_value.sort.assert_called_with("_id", 1)
+    cursor.limit.assert_called_with(2)
+
+    cursor.limit.return_value.to_list = AsyncMock(return_value=rows[:1])
+    assert client.get("/contacts/?limit=2").json()["next_after"] is None
+    assert client.get("/contacts/?fields=password_hash").status_code == 400
+
+
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_get_contacts_streams_ndjson_export(mock_contacts):
+    rows = _contact_rows(1201)
+    mock_contacts.find.return_value.sort.return_value.batch_size.return_value.__aiter__.return_value = rows
+
+    response = client.get("/contacts/?format=ndjson")
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == 1201
+    assert json.loads(lines[-1])["email"] == "c1200@example.com"
+    assert json.loads(lines[0])["created_at"] == "2024-01-01T00:00:00"
+    mock_contacts.find.return_value.sort.return_value.limit.assert_not_called()
+
 if __name__ == "__main__":
-    with patch("app.routers.contact_router.contacts_collection") as mock_contacts:
-        test_delete_contact(mock_contacts)
+    with patch("app.routers.contact_router.async_contacts_collection", MagicMock(spec=AsyncCollection)) as mock_contacts:
+        test_delete_contact(mock_contacts, MagicMock(spec=AsyncCollection))
         test_delete_contact_not_found(mock_contacts)
         print("All tests passed!")
@@ -0,0 +1,116 @@
+import sys
+import os
+import io
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.contact_parser import iter_rows
+from app.services.import_jobs import ImportJob, import_manager, run_import_job
+
+USER_ID = "507f1f77bcf86cd799439011"
+GROUP_ID = "507f1f77bcf86cd799439012"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+CSV = (
+    "Name,Email\n"
+    "John,john@example.com\n"
+    "Broken,not-an-email\n"
+    "Jane,jane@example.com\n"
+    "John again,JOHN@example.com\n"
+    "\n"
+    "No Domain,someone@\n"
+)
+
+
+@patch("app.services.segments.contact_versions_collection", MagicMock())
+@patch("app.services.group_members.group_members_collection")
+@patch("app.services.contact_import.contacts_collection")
+@patch("app.routers.contact_router.async_groups_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_import_job_validates_dedups_and_fills_group(mock_async_groups, mock_contacts, mock_members):
+    john_id, jane_id = ObjectId(), ObjectId()
+    mock_async_groups.find_one.return_value = {"_id": ObjectId(GROUP_ID), "user_id": ObjectId(USER_ID)}
+    # John is new, Jane was already a contact
+    mock_contacts.bulk_write.return_value = MagicMock(upserted_ids={0: john_id})
+    mock_contacts.find.return_value = [{"_id": jane_id}]
+
+    response = client.post(
+        "/contacts/import",
+        files={"file": ("contacts.csv", io.BytesIO(CSV.encode()), "text/csv")},
+        data={"group_id": GROUP_ID}
+    )
+
+    assert response.status_code == 200
+    job = import_manager.get(response.json()["job_id"], USER_ID)
+    assert job.wait(timeout=5)
+
+    status = client.get(f"/contacts/import/{job.id}").json()
+    assert status["status"] == "completed"
+    assert status["progress"] == 1.0
+    assert status["rows"] == 5
+    assert (status["added_count"], status["existing_count"]) == (1, 1)
+    assert (status["duplicate_count"], status["invalid_count"]) == (1, 2)
+    assert [e["line"] for e in status["errors"]] == [3, 7]
+
+    ops = mock_contacts.bulk_write.call_args[0][0]
+    assert [op._filter["email"] for op in ops] == ["john@example.com", "jane@example.com"]
+    rows = mock_members.insert_many.call_args[0][0]
+    assert [(r["group_id"], r["contact_id"]) for r in rows] == [(ObjectId(GROUP_ID), john_id), (ObjectId(GROUP_ID), jane_id)]
+
+    # Jobs are private to their user
+    assert import_manager.get(job.id, "507f1f77bcf86cd799439099") is None
+
+
+@patch("app.routers.contact_router.async_groups_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_import_rejects_bad_files_and_foreign_groups(mock_async_groups):
+    mock_async_groups.find_one.return_value = None
+
+    response = client.post(
+        "/contacts/import",
+        files={"file": ("contacts.csv", io.BytesIO(CSV.encode()), "text/csv")},
+        data={"group_id": GROUP_ID}
+    )
+    assert response.status_code == 404
+
+    response = client.post("/contacts/import", files={"file": ("contacts.xlsx", io.BytesIO(b"x"), "text/csv")})
+    assert response.status_code == 400
+    assert client.get("/contacts/import/unknown").status_code == 404
+
+
+@patch("app.services.segments.contact_versions_collection", MagicMock())
+@patch("app.services.contact_import.contacts_collection")
+def test_import_job_writes_in_batches_and_stops_when_cancelled(mock_contacts):
+    mock_contacts.bulk_write.side_effect = lambda ops, ordered: MagicMock(
+        upserted_ids={i: ObjectId() for i in range(len(ops))}
+    )
+    data = "".join(f"user{i}@example.com\n" for i in range(5)).encode()
+
+    job = ImportJob(USER_ID, "list.txt", len(data))
+    fileobj = io.BytesIO(data)
+    run_import_job(job, iter_rows(fileobj, "list.txt"), fileobj, batch_size=2)
+
+    assert mock_contacts.bulk_write.call_count == 3
+    assert job.added == 5
+    assert fileobj.closed
+    # Contacts are not looked up without a group to add them to
+    mock_contacts.find.assert_not_called()
+
+    mock_contacts.reset_mock()
+    job = ImportJob(USER_ID, "list.txt", len(data))
+    job.cancel()
+    fileobj = io.BytesIO(data)
+    run_import_job(job, iter_rows(fileobj, "list.txt"), fileobj, batch_size=2)
+    mock_contacts.bulk_write.assert_not_called()
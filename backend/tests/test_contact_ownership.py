@@ -0,0 +1,63 @@
+import sys
+import os
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.contact_ownership import validate_contact_ids
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def owned_by_user(owned):
+    """find().to_list() that answers an $in query with the ids in `owned`."""
+    def find(query, projection):
+        cursor = MagicMock()
+        cursor.to_list = AsyncMock(return_value=[{"_id": i} for i in query["_id"]["$in"] if i in owned])
+        return cursor
+    return find
+
+
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_ownership_is_checked_in_batches_of_in_queries(mock_contacts):
+    ids = [ObjectId() for _ in range(25)]
+    foreign = ids[3]
+    mock_contacts.find.side_effect = owned_by_user(set(ids) - {foreign})
+
+    result = asyncio.run(validate_contact_ids(USER_ID, [str(i) for i in ids] + [str(ids[0]), "bogus"], batch_size=10))
+
+    assert mock_contacts.find.call_count == 3
+    query, projection = mock_contacts.find.call_args_list[0][0]
+    assert query["user_id"] == ObjectId(USER_ID)
+    assert projection == {"_id": 1}
+    assert result.invalid == ["bogus", str(foreign)]
+    assert result.owned == [i for i in ids if i != foreign]
+    mock_contacts.find_one.assert_not_called()
+
+
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+@patch("app.routers.group_router.async_groups_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_create_group_reports_every_invalid_id(mock_groups, mock_contacts):
+    mine, theirs = ObjectId(), ObjectId()
+    mock_contacts.find.side_effect = owned_by_user({mine})
+
+    response = client.post("/groups/", json={"group_name": "VIP", "contact_ids": [str(mine), str(theirs), "x"]})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Invalid contact ID or contact not owned by user: x, {theirs}"
+    mock_groups.insert_one.assert_not_called()
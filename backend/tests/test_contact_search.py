@@ -0,0 +1,119 @@
+import sys
+import os
+import datetime
+import re
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.contact_search import search_fields, search_query
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def _matches(query, contact):
+    """Evaluate the parts of a search filter that the index doesn't decide."""
+    fields = {"email": contact["email"], **search_fields(contact["name"], contact["email"])}
+    if not set(query.get("search_grams", {}).get("$all", [])) <= set(fields["search_grams"]):
+        return False
+    if "email_domain" in query and query["email_domain"] != fields["email_domain"]:
+        return False
+    if "$or" in query:
+        return any(re.search(next(iter(clause.values()))["$regex"], fields[next(iter(clause))]) for clause in query["$or"])
+    return True
+
+
+def test_search_query_matches_substrings_prefixes_and_domains():
+    john = {"name": "John Smith", "email": "jsmith@acme.io"}
+    jane = {"name": "Jane Doe", "email": "jane.doe@example.com"}
+
+    def found(**kwargs):
+        query = search_query(USER_ID, **kwargs)
+        return [c["name"] for c in (john, jane) if _matches(query, c)]
+
+    assert found(q="SMITH") == ["John Smith"]
+    assert found(q="e.doe@ex") == ["Jane Doe"]
+    # Short queries only match at the start
+    assert found(q="ja") == ["Jane Doe"]
+    assert found(q="hn") == []
+    assert found(domain="@Acme.io") == ["John Smith"]
+    assert found(q="j", domain="example.com") == ["Jane Doe"]
+
+    # Index-friendly shape: trigram bound first, regex is escaped
+    query = search_query(USER_ID, q="e.doe")
+    assert query["search_grams"]["$all"][0] == "doe"
+    assert query["$or"][1] == {"email": {"$regex": re.escape("e.doe")}}
+
+
+def test_created_at_range_also_bounds_ids():
+    start = datetime.datetime(2024, 1, 1)
+    end = datetime.datetime(2024, 2, 1)
+    query = search_query(USER_ID, created_from=start, created_to=end)
+
+    assert query["created_at"] == {"$gte": start, "$lte": end}
+    low, high = query["_id"]["$gte"].generation_time, query["_id"]["$lte"].generation_time
+    assert low < start.replace(tzinfo=datetime.timezone.utc) < end.replace(tzinfo=datetime.timezone.utc) < high
+
+
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_search_endpoint_is_paginated_and_projected(mock_contacts):
+    rows = [{"_id": ObjectId(), "name": "John Smith", "email": "jsmith@acme.io"}]
+    mock_contacts.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=rows)
+    after = str(ObjectId())
+
+    response = client.get(
+        "/contacts/search",
+        params={"q": "smith", "created_from": "2024-01-01T00:00:00", "after": after, "limit": 1, "fields": "name"}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "contacts": [{"id": str(rows[0]["_id"]), "name": "John Smith"}],
+        "next_after": str(rows[0]["_id"]),
+    }
+    query, projection = mock_contacts.find.call_args[0]
+    assert projection == {"name": 1}
+    # Keyset cursor and created_at bound share the _id condition
+    assert query["_id"]["$gt"] == ObjectId(after)
+    assert "$gte" in query["_id"]
+    mock_contacts.find.return_value.sort.assert_called_with("_id", 1)
+
+
+@patch("app.services.segments.async_contact_versions_collection", MagicMock(spec=AsyncCollection))
+@patch("app.services.contact_import.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+@patch("app.routers.contact_router.async_contacts_collection", new_callable=lambda: MagicMock(spec=AsyncCollection))
+def test_written_contacts_carry_search_fields(mock_router_contacts, mock_import_contacts):
+    # pymongo sets _id on the inserted document
+    mock_router_contacts.insert_one.side_effect = lambda doc: MagicMock(inserted_id=doc.setdefault("_id", ObjectId()))
+    client.post("/contacts/", json={"name": "John Smith", "email": "JSmith@Acme.io"})
+    inserted = mock_router_contacts.insert_one.call_args[0][0]
+    assert inserted["email_domain"] == "acme.io"
+    assert "smi" in inserted["search_grams"]
+
+    contact_id = ObjectId()
+    mock_router_contacts.find_one.return_value = {
+        "_id": contact_id, "user_id": ObjectId(USER_ID), "name": "John Smith", "email": "jsmith@acme.io"
+    }
+    client.put(f"/contacts/{contact_id}", json={"name": "Johnny"})
+    update = mock_router_contacts.update_one.call_args[0][1]["$set"]
+    assert update["name_lower"] == "johnny"
+    assert update["email_domain"] == "acme.io"
+
+    mock_import_contacts.bulk_write.return_value = MagicMock(upserted_ids={})
+    client.post("/contacts/bulk", json={"contacts": [{"name": "Jane", "email": "jane@example.com"}]})
+    op = mock_import_contacts.bulk_write.call_args[0][0][0]
+    assert op._doc["$setOnInsert"]["name_lower"] == "jane"
@@ -0,0 +1,94 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.delivery_records import DeliveryRecorder
+
+USER_ID = "507f1f77bcf86cd799439011"
+CAMPAIGN_ID = "507f1f77bcf86cd799439099"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection")
+def test_recorder_flushes_in_unordered_batches(mock_deliveries):
+    with DeliveryRecorder(CAMPAIGN_ID, USER_ID, flush_size=3) as recorder:
+        for i in range(7):
+            recorder.sent(f"r{i}@example.com", f"msg-{i}")
+        recorder.failed("bad@example.com", Exception("MessageRejected"))
+
+    batches = [c[0][0] for c in mock_deliveries.insert_many.call_args_list]
+    assert [len(b) for b in batches] == [3, 3, 2]
+    assert all(c[1] == {"ordered": False} for c in mock_deliveries.insert_many.call_args_list)
+
+    last = batches[-1][-1]
+    assert last["campaign_id"] == ObjectId(CAMPAIGN_ID)
+    assert last["email"] == "bad@example.com"
+    assert last["status"] == "failed"
+    assert last["error"] == "MessageRejected"
+    assert batches[0][0]["message_id"] == "msg-0"
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_normal_email_log_keeps_only_counters(mock_emails, mock_ses):
+    mock_ses.send_email.return_value = {"MessageId": "abc"}
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": ["a@example.com", "b@example.com"]}
+
+    with patch("app.services.delivery_records.DeliveryRecorder._write") as write:
+        response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 200
+    log_entry = mock_emails.insert_one.call_args[0][0]
+    assert "sent_to" not in log_entry
+    assert log_entry["sent_count"] == 2
+
+    rows = [row for c in write.call_args_list for row in c[0][0]]
+    assert sorted(r["email"] for r in rows) == ["a@example.com", "b@example.com"]
+    assert all(r["message_id"] == "abc" and r["campaign_id"] == log_entry["_id"] for r in rows)
+
+
+@patch("app.routers.email_router.async_deliveries_collection")
+def test_get_deliveries_is_keyset_paginated(mock_deliveries):
+    rows = [
+        {"_id": ObjectId(), "email": f"r{i}@example.com", "status": "sent", "message_id": str(i)}
+        for i in range(2)
+    ]
+    mock_deliveries.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=rows)
+
+    response = client.get(f"/email/logs/{CAMPAIGN_ID}/deliveries?limit=2&status=sent")
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert [d["email"] for d in json_response["deliveries"]] == ["r0@example.com", "r1@example.com"]
+    assert json_response["next_after"] == str(rows[-1]["_id"])
+
+    query = mock_deliveries.find.call_args[0][0]
+    assert query == {"campaign_id": ObjectId(CAMPAIGN_ID), "user_id": ObjectId(USER_ID), "status": "sent"}
+
+
+@patch("app.routers.email_router.async_emails_collection")
+def test_logs_do_not_return_recipient_arrays(mock_emails):
+    mock_emails.aggregate = AsyncMock(return_value=MagicMock(to_list=AsyncMock(return_value=[])))
+
+    response = client.get("/email/logs")
+
+    assert response.status_code == 200
+    pipeline = mock_emails.aggregate.call_args[0][0]
+    assert {"$project": {"sent_to": 0, "resume": 0}} in pipeline
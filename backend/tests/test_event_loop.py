@@ -0,0 +1,68 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import httpx
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.ses_dispatcher import SESDispatcher
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=1, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.emails_collection")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.contact_router.async_contacts_collection")
+def test_requests_progress_during_long_send(mock_contacts, mock_ses, mock_emails):
+    release = threading.Event()
+
+    def slow_send(**kwargs):
+        # SES "hangs" until the test has seen other requests complete
+        release.wait(timeout=5)
+        return {"MessageId": "123"}
+
+    mock_ses.send_raw_email.side_effect = slow_send
+    mock_contacts.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[])
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            send = asyncio.create_task(http.post(
+                "/email/send/transactional",
+                data={"subject": "Invoice", "body": "<p>Hi</p>", "to_emails": "a@example.com"},
+            ))
+            # Let the send reach SES
+            while not mock_ses.send_raw_email.called:
+                await asyncio.sleep(0.01)
+
+            started = time.monotonic()
+            responses = await asyncio.wait_for(
+                asyncio.gather(*(http.get("/contacts/") for _ in range(20))), timeout=2
+            )
+            elapsed = time.monotonic() - started
+            assert not send.done()
+
+            release.set()
+            return await send, responses, elapsed
+
+    send_response, responses, elapsed = asyncio.run(scenario())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert elapsed < 2
+    assert send_response.status_code == 200
+    assert send_response.json()["sent_count"] == 1
@@ -0,0 +1,201 @@
+import sys
+import os
+import asyncio
+import datetime
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import BulkWriteError
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.group_members import (
+    add_members, compact_members, migrate_embedded_members, remove_contacts_async
+)
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def async_collection():
+    return MagicMock(spec=AsyncCollection)
+
+
+@patch("app.services.group_members.async_group_members_collection", new_callable=async_collection)
+@patch("app.routers.group_router.async_groups_collection", new_callable=async_collection)
+def test_group_list_returns_counts_not_member_ids(mock_groups, mock_members):
+    big, empty, legacy = ObjectId(), ObjectId(), ObjectId()
+    created = datetime.datetime(2024, 1, 1)
+    mock_groups.find.return_value.to_list = AsyncMock(return_value=[
+        {"_id": big, "group_name": "Everyone", "member_count": 1000000, "created_at": created},
+        {"_id": empty, "group_name": "Nobody", "member_count": 0, "created_at": created},
+        {"_id": legacy, "group_name": "Old", "created_at": created},
+    ])
+    mock_members.aggregate.return_value = MagicMock(to_list=AsyncMock(return_value=[{"_id": legacy, "n": 7}]))
+
+    response = client.get("/groups/")
+
+    assert response.status_code == 200
+    assert [(g["group_name"], g["contact_count"]) for g in response.json()] == [
+        ("Everyone", 1000000), ("Nobody", 0), ("Old", 7)
+    ]
+    assert "contact_ids" not in response.json()[0]
+    # Only the listed fields are read from the groups themselves
+    assert mock_groups.find.call_args[0][1] == {"group_name": 1, "created_at": 1, "member_count": 1}
+    # Cached counts are used as is; only the group without one is counted
+    assert mock_members.aggregate.call_args[0][0][0]["$match"] == {"group_id": {"$in": [legacy]}}
+
+
+@patch("app.services.group_members.async_groups_collection", new_callable=async_collection)
+@patch("app.routers.group_router.async_group_members_collection", new_callable=async_collection)
+@patch("app.services.group_members.async_group_members_collection", new_callable=async_collection)
+@patch("app.services.contact_ownership.async_contacts_collection", new_callable=async_collection)
+@patch("app.routers.group_router.async_groups_collection", new_callable=async_collection)
+def test_group_members_live_in_their_own_collection(mock_groups, mock_contacts, mock_members, mock_router_members, mock_counts):
+    contact_a, contact_b = str(ObjectId()), str(ObjectId())
+    group_id = ObjectId()
+    mock_contacts.find.return_value.to_list = AsyncMock(
+        return_value=[{"_id": ObjectId(contact_a)}, {"_id": ObjectId(contact_b)}]
+    )
+    mock_groups.insert_one.return_value = MagicMock(inserted_id=group_id)
+    mock_members.insert_many.return_value = MagicMock(inserted_ids=[1, 2])
+
+    response = client.post("/groups/", json={"group_name": "VIP", "contact_ids": [contact_a, contact_b, contact_a]})
+
+    assert response.status_code == 200
+    assert response.json()["contact_count"] == 2
+    assert "contact_ids" not in mock_groups.insert_one.call_args[0][0]
+    assert mock_groups.insert_one.call_args[0][0]["member_count"] == 0
+    mock_counts.update_one.assert_awaited_once_with({"_id": group_id}, {"$inc": {"member_count": 2, "members_version": 1}})
+    rows = mock_members.insert_many.call_args[0][0]
+    assert rows == [
+        {"group_id": group_id, "contact_id": ObjectId(contact_a), "user_id": ObjectId(USER_ID)},
+        {"group_id": group_id, "contact_id": ObjectId(contact_b), "user_id": ObjectId(USER_ID)},
+    ]
+
+    # Replacing the members drops everyone not in the new list
+    mock_groups.find_one.return_value = {
+        "_id": group_id, "user_id": ObjectId(USER_ID), "group_name": "VIP", "created_at": datetime.datetime(2024, 1, 1)
+    }
+    mock_members.find.return_value.to_list = AsyncMock(return_value=[{"contact_id": ObjectId(contact_b)}])
+    mock_members.delete_many.return_value = MagicMock(deleted_count=1)
+    mock_members.insert_many.side_effect = BulkWriteError({
+        "writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}],
+    })
+    mock_counts.update_one.reset_mock()
+    response = client.put(f"/groups/{group_id}", json={"contact_ids": [contact_b]})
+    assert response.json()["contact_ids"] == [contact_b]
+    assert mock_members.delete_many.call_args[0][0] == {"group_id": group_id, "contact_id": {"$nin": [ObjectId(contact_b)]}}
+    # contact_a left, contact_b was already there
+    mock_counts.update_one.assert_awaited_once_with({"_id": group_id}, {"$inc": {"member_count": -1, "members_version": 1}})
+
+    client.delete(f"/groups/{group_id}")
+    mock_router_members.delete_many.assert_called_once_with({"group_id": group_id})
+
+
+@patch("app.services.group_members.groups_collection")
+@patch("app.services.group_members.group_members_collection")
+def test_embedded_members_are_migrated_once(mock_members, mock_groups):
+    group_id, contact_a, contact_b = ObjectId(), ObjectId(), ObjectId()
+    mock_groups.find.return_value = [{"_id": group_id, "user_id": ObjectId(USER_ID), "contact_ids": [contact_a, contact_b]}]
+    # contact_a was already moved by an interrupted run
+    mock_members.insert_many.side_effect = BulkWriteError({
+        "writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate key"}],
+    })
+
+    mock_members.count_documents.return_value = 2
+
+    assert migrate_embedded_members() == 1
+    assert [r["contact_id"] for r in mock_members.insert_many.call_args[0][0]] == [contact_a, contact_b]
+    # The count is taken from the memberships, not from what this run inserted
+    mock_groups.update_one.assert_called_with(
+        {"_id": group_id}, {"$set": {"member_count": 2}, "$unset": {"contact_ids": ""}, "$inc": {"members_version": 1}}
+    )
+
+    assert add_members(group_id, USER_ID, [contact_a, contact_b]) == 1
+
+
+@patch("app.services.group_members.async_groups_collection", new_callable=async_collection)
+@patch("app.services.group_members.async_group_members_collection", new_callable=async_collection)
+def test_deleted_contacts_leave_their_groups_in_one_pass(mock_members, mock_groups):
+    contact_a, contact_b, group_a, group_b = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    mock_members.aggregate.return_value = MagicMock(to_list=AsyncMock(return_value=[
+        {"_id": group_a, "n": 2}, {"_id": group_b, "n": 1},
+    ]))
+    mock_members.delete_many.return_value = MagicMock(deleted_count=3)
+
+    assert asyncio.run(remove_contacts_async([str(contact_a), contact_b])) == 3
+
+    mock_members.delete_many.assert_awaited_once_with({"contact_id": {"$in": [contact_a, contact_b]}})
+    ops = mock_groups.bulk_write.call_args[0][0]
+    assert [(op._filter, op._doc) for op in ops] == [
+        ({"_id": group_a}, {"$inc": {"member_count": -2, "members_version": 1}}),
+        ({"_id": group_b}, {"$inc": {"member_count": -1, "members_version": 1}}),
+    ]
+
+
+@patch("app.services.group_members.async_groups_collection", new_callable=async_collection)
+@patch("app.services.group_members.async_group_members_collection", new_callable=async_collection)
+def test_racing_delete_recounts_the_groups(mock_members, mock_groups):
+    group_a = ObjectId()
+    mock_members.aggregate.return_value = MagicMock(to_list=AsyncMock(return_value=[{"_id": group_a, "n": 2}]))
+    # Someone else removed one of the rows first
+    mock_members.delete_many.return_value = MagicMock(deleted_count=1)
+    mock_members.count_documents.return_value = 5
+
+    asyncio.run(remove_contacts_async([ObjectId()]))
+
+    op, = mock_groups.bulk_write.call_args[0][0]
+    assert op._doc == {"$set": {"member_count": 5}, "$inc": {"members_version": 1}}
+
+
+@patch("app.services.group_members.groups_collection")
+@patch("app.services.group_members.group_members_collection")
+def test_compaction_removes_dangling_memberships(mock_members, mock_groups):
+    group_a = ObjectId()
+    rows = [{"_id": ObjectId(), "group_id": group_a} for _ in range(3)]
+    mock_members.aggregate.return_value = iter(rows)
+    mock_members.delete_many.side_effect = lambda query: MagicMock(deleted_count=len(query["_id"]["$in"]))
+    mock_members.count_documents.return_value = 10
+
+    assert compact_members(batch_size=2) == 3
+
+    assert mock_members.delete_many.call_count == 2
+    pipeline = mock_members.aggregate.call_args[0][0]
+    assert pipeline[2] == {"$match": {"$or": [{"contact": {"$size": 0}}, {"group": {"$size": 0}}]}}
+    mock_groups.update_one.assert_called_once_with(
+        {"_id": group_a}, {"$set": {"member_count": 10}, "$inc": {"members_version": 1}}
+    )
+
+
+@patch("app.main.threading.Thread", MagicMock())
+@patch("app.main.release_dead_letters", MagicMock())
+@patch("app.main.suppression_index", MagicMock())
+@patch("app.main.ensure_indexes", MagicMock())
+@patch("app.main.normalize_legacy_contacts", MagicMock())
+@patch("app.main.email_router.resume_campaigns")
+@patch("app.main.migrate_embedded_members")
+def test_migration_finishes_before_requests_are_served(mock_migrate, mock_resume):
+    from app.main import lifespan
+
+    order = []
+    mock_migrate.side_effect = lambda: order.append("migrate")
+    mock_resume.side_effect = lambda: order.append("resume")
+
+    async def start():
+        async with lifespan(app):
+            order.append("serving")
+
+    asyncio.run(start())
+    assert order == ["migrate", "resume", "serving"]
@@ -0,0 +1,57 @@
+import sys
+import os
+import email
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import mime_builder
+from app.services.mime_builder import NewsletterSkeleton, inject_unsubscribe_footer
+
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 40
+GIF = b'GIF89a' + bytes(range(256)) * 10
+
+IMAGES = [
+    {"content": PNG, "cid": "logo.png", "filename": "logo.png"},
+    {"content": GIF, "cid": "banner_1.gif", "filename": "banner 1.gif"},
+]
+
+UNSUBSCRIBE_URL = "http://localhost/unsubscribe?email=recipient1@example.com"
+
+
+def test_render_is_byte_identical_to_full_build():
+    skeleton = NewsletterSkeleton("Monthly Update", "from@example.com", IMAGES)
+    html = inject_unsubscribe_footer("<html><body>Hello</body></html>", UNSUBSCRIBE_URL)
+
+    rendered = skeleton.render("recipient1@example.com", html, UNSUBSCRIBE_URL)
+    full = skeleton.build("recipient1@example.com", html, UNSUBSCRIBE_URL, IMAGES).as_string()
+
+    assert rendered == full
+
+    parsed = email.message_from_string(rendered)
+    assert parsed["To"] == "recipient1@example.com"
+    parts = [p.get_content_type() for p in parsed.walk()]
+    assert parts == ["multipart/related", "multipart/alternative", "text/html", "image/png", "image/gif"]
+
+
+def test_images_are_encoded_once_per_campaign():
+    with patch.object(mime_builder, "MIMEImage", wraps=mime_builder.MIMEImage) as mime_image:
+        skeleton = NewsletterSkeleton("Subject", "from@example.com", IMAGES)
+        for i in range(5):
+            skeleton.render(f"r{i}@example.com", "<p>Hi</p>", UNSUBSCRIBE_URL)
+
+    assert mime_image.call_count == len(IMAGES)
+
+
+def test_unsubscribe_footer_placement():
+    placeholder = inject_unsubscribe_footer("<p>A</p><!-- UNSUBSCRIBE_PLACEHOLDER -->", UNSUBSCRIBE_URL)
+    assert "UNSUBSCRIBE_PLACEHOLDER" not in placeholder
+    assert f'href="{UNSUBSCRIBE_URL}"' in placeholder
+
+    body = inject_unsubscribe_footer("<html><body>A</body></html>", UNSUBSCRIBE_URL)
+    assert body.index(UNSUBSCRIBE_URL) < body.index("</body>")
+
+    fragment = inject_unsubscribe_footer("<p>A</p>", UNSUBSCRIBE_URL)
+    assert fragment.startswith("<p>A</p>")
+    assert UNSUBSCRIBE_URL in fragment
@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+import threading
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.unsubscribe_tokens import UNSUBSCRIBE_BASE_URL, verify_token
+from app.services.campaign_jobs import job_manager
+from app.services.ses_dispatcher import SESDispatcher
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+class FakeSES:
+    """Local stand-in for the SES template APIs."""
+
+    def __init__(self):
+        self.templates = {}
+        self.bulk_calls = []
+        self.delivered = {}
+        self._lock = threading.Lock()
+
+    def create_template(self, Template):
+        self.templates[Template["TemplateName"]] = Template
+
+    def delete_template(self, TemplateName):
+        del self.templates[TemplateName]
+
+    def send_bulk_templated_email(self, Source, Template, DefaultTemplateData, Destinations):
+        assert len(Destinations) <= 50
+        html = self.templates[Template]["HtmlPart"]
+        status = []
+        with self._lock:
+            self.bulk_calls.append(len(Destinations))
+            for d in Destinations:
+                email = d["Destination"]["ToAddresses"][0]
+                if email.startswith("bounce"):
+                    status.append({"Status": "MessageRejected", "Error": "Address blacklisted"})
+                    continue
+                data = json.loads(d["ReplacementTemplateData"])
+                self.delivered[email] = html.replace("{{unsubscribe_url}}", data["unsubscribe_url"])
+                status.append({"Status": "Success", "MessageId": f"id-{email}"})
+        return {"Status": status}
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.emails_collection")
+def test_templated_newsletter_batches_destinations(mock_emails):
+    fake_ses = FakeSES()
+    mock_emails.insert_one.return_value = MagicMock()
+
+    emails = [f"r{i}@example.com" for i in range(118)] + ["bounce1@example.com", "bounce2@example.com"]
+    data = {
+        "subject": "Newsletter Subject",
+        "body": "<html><body>Hello {{name}} <!-- UNSUBSCRIBE_PLACEHOLDER --></body></html>",
+        "to_emails": ",".join(emails),
+        "delivery_mode": "template",
+    }
+
+    with patch("app.routers.email_router.ses", fake_ses), \
+         patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=4, max_send_rate=10000)):
+        response = client.post("/email/send/newsletter", data=data)
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+        assert job_manager.get(job_id, USER_ID).wait(timeout=5)
+
+    # 120 recipients -> 3 API calls instead of 120
+    assert sorted(fake_ses.bulk_calls) == [20, 50, 50]
+    assert fake_ses.templates == {}
+
+    progress = client.get(f"/email/campaigns/{job_id}").json()
+    assert progress["sent"] == 118
+    assert progress["failed"] == 2
+
+    html = fake_ses.delivered["r7@example.com"]
+    token = html.split(f"{UNSUBSCRIBE_BASE_URL}/unsubscribe/", 1)[1].split('"', 1)[0]
+    assert verify_token(token) == (USER_ID, job_id, "r7@example.com")
+    assert "\\{{name}}" in html
+
+    assert mock_emails.insert_one.call_args[0][0]["delivery_mode"] == "template"
+    final = mock_emails.update_one.call_args[0][1]["$set"]
+    assert final["sent_count"] == 118
+    assert final["failed_count"] == 2
+
+
+def test_templated_newsletter_rejects_inline_images():
+    files = [('inline_images', ('logo.png', b'\x89PNG\r\n\x1a\n' + b'0' * 64, 'image/png'))]
+    data = {
+        "subject": "Newsletter Subject",
+        "body": "<p>Hello</p>",
+        "to_emails": "r1@example.com",
+        "delivery_mode": "template",
+    }
+    response = client.post("/email/send/newsletter", data=data, files=files)
+    assert response.status_code == 400
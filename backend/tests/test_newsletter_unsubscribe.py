@@ -1,5 +1,7 @@
 import sys
 import os
+import email
+import email.policy
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
@@ -10,6 +12,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app.main import app
 from app.routers.email_router import router
 from app.core.security import get_current_user_swagger
+from app.services.unsubscribe_tokens import UNSUBSCRIBE_BASE_URL, verify_token
+from app.services.campaign_jobs import job_manager
 
 # Override dependency
 async def mock_get_current_user():
@@ -19,9 +23,11 @@ app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
 
 client = TestClient(app)
 
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
 @patch("app.routers.email_router.ses")
 @patch("app.routers.email_router.emails_collection")
-@patch("app.routers.email_router.contacts_collection")
+@patch("app.services.recipient_service.contacts_collection")
 def test_send_newsletter_unsubscribe(mock_contacts, mock_emails, mock_ses):
     # Setup mocks
     mock_ses.send_raw_email.return_value = {"MessageId": "123"}
@@ -44,38 +50,53 @@ def test_send_newsletter_unsubscribe(mock_contacts, mock_emails, mock_ses):
     
     assert response.status_code == 200
     json_response = response.json()
-    assert json_response["message"] == "Newsletter email sent successfully"
-    assert json_response["sent_count"] == 2
-    assert "recipients" in json_response
-    assert len(json_response["recipients"]) == 2
+    assert json_response["message"] == "Newsletter campaign queued"
+    assert "job_id" in json_response
+    assert json_response["recipients_count"] == 2
+    assert "recipients" not in json_response
+
+    # Wait for the background job, then check its progress report
+    job = job_manager.get(json_response["job_id"], "507f1f77bcf86cd799439011")
+    assert job.wait(timeout=5)
+    progress = client.get(f"/email/campaigns/{json_response['job_id']}").json()
+    assert progress["status"] == "completed"
+    assert progress["sent"] == 2
+    assert progress["remaining"] == 0
     
     # Verify SES called twice (once for each recipient)
     assert mock_ses.send_raw_email.call_count == 2
     
     # Verify headers and footer for first recipient
     call_args = mock_ses.send_raw_email.call_args_list[0][1]
-    raw_message = call_args["RawMessage"]["Data"]
-    
-    # Check for List-Unsubscribe header
-    assert 'List-Unsubscribe: <http://13.61.21.175:9000/unsubscribe?email=recipient1@example.com>' in raw_message
-    assert 'List-Unsubscribe-Post: List-Unsubscribe=One-Click' in raw_message
-    assert 'Precedence: bulk' in raw_message
-    assert 'X-Auto-Response-Suppress: OOF, DR, RN, NRN, AutoReply' in raw_message
-    
+    recipient = call_args["Destinations"][0]
+    message = email.message_from_string(call_args["RawMessage"]["Data"], policy=email.policy.default)
+
+    # Check for List-Unsubscribe header: a signed one-click link for this recipient
+    unsubscribe_url = str(message["List-Unsubscribe"]).strip("<>")
+    assert unsubscribe_url.startswith(f"{UNSUBSCRIBE_BASE_URL}/unsubscribe/")
+    user_id, campaign_id, token_email = verify_token(unsubscribe_url.rsplit("/", 1)[1])
+    assert (user_id, campaign_id, token_email) == ("507f1f77bcf86cd799439011", json_response["job_id"], recipient)
+    assert recipient not in unsubscribe_url
+    assert message["List-Unsubscribe-Post"] == "List-Unsubscribe=One-Click"
+    assert message["Precedence"] == "bulk"
+    assert message["X-Auto-Response-Suppress"] == "OOF, DR, RN, NRN, AutoReply"
+
     # Check for footer link
-    assert 'href="http://13.61.21.175:9000/unsubscribe?email=recipient1@example.com"' in raw_message
-    
+    html = message.get_body(preferencelist=("html",)).get_content()
+    assert f'href="{unsubscribe_url}"' in html
+
     # Verify log insertion
     assert mock_emails.insert_one.call_count == 1
     log_entry = mock_emails.insert_one.call_args[0][0]
-    assert log_entry["status"] == "success"
+    assert log_entry["status"] == "sending"
     assert log_entry["created_at"].tzinfo is not None
+    assert mock_emails.update_one.call_args[0][1]["$set"]["status"] == "success"
     
     print("Test passed!")
 
 if __name__ == "__main__":
     with patch("app.routers.email_router.ses") as mock_ses, \
          patch("app.routers.email_router.emails_collection") as mock_emails, \
-         patch("app.routers.email_router.contacts_collection") as mock_contacts:
+         patch("app.services.recipient_service.contacts_collection") as mock_contacts:
         
         test_send_newsletter_unsubscribe(mock_contacts, mock_emails, mock_ses)
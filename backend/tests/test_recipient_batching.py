@@ -0,0 +1,109 @@
+import sys
+import os
+import email
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.ses_dispatcher import SESDispatcher
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": "507f1f77bcf86cd799439011", "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+EMAILS = [f"r{i}@example.com" for i in range(120)]
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=4, max_send_rate=10000))
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_normal_email_is_split_into_ses_batches(mock_emails, mock_ses):
+    mock_emails.insert_one.return_value = MagicMock(inserted_id="log-1")
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": EMAILS}
+
+    response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert json_response["status"] == "success"
+    assert json_response["sent_count"] == 120
+    assert json_response["recipients_count"] == 120
+    assert json_response["batch_count"] == 3
+    assert json_response["failed_batches"] == []
+    assert "recipients" not in json_response
+    assert json_response["log_id"] == "log-1"
+    assert "sent_to" not in mock_emails.insert_one.call_args[0][0]
+
+    sizes = sorted(len(c[1]["Destination"]["ToAddresses"]) for c in mock_ses.send_email.call_args_list)
+    assert sizes == [20, 50, 50]
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=1, max_send_rate=10000))
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_normal_email_reports_partial_failure(mock_emails, mock_ses):
+    mock_ses.send_email.side_effect = [{"MessageId": "1"}, Exception("Throttling"), {"MessageId": "3"}]
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": EMAILS}
+
+    response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert json_response["status"] == "partial"
+    assert json_response["sent_count"] == 70
+    assert json_response["failed_count"] == 50
+    assert json_response["failed_batches"] == [{"batch": 1, "recipients": 50, "error": "Throttling"}]
+    assert mock_emails.insert_one.call_args[0][0]["status"] == "partial"
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_normal_email_all_batches_failed(mock_emails, mock_ses):
+    mock_ses.send_email.side_effect = Exception("Access denied")
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": ["a@example.com"]}
+
+    response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 500
+    assert "Access denied" in response.json()["detail"]
+    # The log is still written, so the failure can be looked up
+    log = mock_emails.insert_one.call_args[0][0]
+    assert (log["status"], log["sent_count"], log["failed_count"]) == ("failed", 0, 1)
+    assert response.json()["log_id"] == str(log["_id"])
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=4, max_send_rate=10000))
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_transactional_email_batches_share_attachment(mock_emails, mock_ses):
+    files = [('attachments', ('invoice.pdf', b'%PDF-1.4 fake', 'application/pdf'))]
+    data = {"subject": "Invoice", "body": "<p>Attached</p>", "to_emails": ",".join(EMAILS[:75])}
+
+    response = client.post("/email/send/transactional", data=data, files=files)
+
+    assert response.status_code == 200
+    assert response.json()["sent_count"] == 75
+    assert mock_ses.send_raw_email.call_count == 2
+
+    for call in mock_ses.send_raw_email.call_args_list:
+        kwargs = call[1]
+        parsed = email.message_from_string(kwargs["RawMessage"]["Data"])
+        to_header = [a.strip() for a in parsed["To"].split(",")]
+        assert to_header == kwargs["Destinations"]
+        assert 'filename="invoice.pdf"' in kwargs["RawMessage"]["Data"]
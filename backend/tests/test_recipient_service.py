@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.recipient_service import (
+    build_recipient_pipeline,
+    resolve_recipients,
+    split_form_list,
+)
+
+USER_ID = "507f1f77bcf86cd799439011"
+GROUP_A = "507f1f77bcf86cd799439021"
+GROUP_B = "507f1f77bcf86cd799439022"
+
+
+def test_split_form_list():
+    assert split_form_list(" a@x.com, ,b@x.com,") == ["a@x.com", "b@x.com"]
+    assert split_form_list(None) == []
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.recipient_service.group_members_collection")
+def test_manual_emails_skip_the_database(mock_groups):
+    audience = resolve_recipients(USER_ID, emails=["A@x.com", "a@x.com ", "b@x.com"])
+
+    assert audience.count() == 2
+    assert list(audience) == ["a@x.com", "b@x.com"]
+    mock_groups.aggregate.assert_not_called()
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.recipient_service.group_members_collection")
+def test_stream_merges_and_dedups_sorted_cursor(mock_groups):
+    # The database side comes back sorted and already distinct
+    mock_groups.aggregate.return_value = iter([{"_id": "a@x.com"}, {"_id": "c1@x.com"}, {"_id": "d@x.com"}])
+
+    audience = resolve_recipients(
+        USER_ID,
+        emails=["d@x.com", "b@x.com", "a@x.com"],
+        group_ids=[GROUP_A, GROUP_B, "not-an-id"],
+        send_to_all=True,
+    )
+    stream = iter(audience)
+
+    # Nothing is fetched until the stream is consumed
+    mock_groups.aggregate.assert_not_called()
+    assert list(stream) == ["a@x.com", "b@x.com", "c1@x.com", "d@x.com"]
+    assert mock_groups.aggregate.call_count == 1
+
+    pipeline = mock_groups.aggregate.call_args[0][0]
+    assert pipeline[-1] == {"$sort": {"_id": 1}}
+    assert mock_groups.aggregate.call_args[1] == {"allowDiskUse": True}
+    assert pipeline[0]["$match"] == {
+        "group_id": {"$in": [ObjectId(GROUP_A), ObjectId(GROUP_B)]},
+        "user_id": ObjectId(USER_ID),
+    }
+    assert any("$unionWith" in stage for stage in pipeline)
+    assert pipeline[-2] == {"$group": {"_id": "$email"}}
+
+
+@patch("app.services.recipient_service.group_members_collection")
+def test_count_subtracts_manual_overlap(mock_groups):
+    mock_groups.aggregate.return_value = iter([{"total": [{"n": 10}], "overlap": [{"n": 1}]}])
+
+    audience = resolve_recipients(USER_ID, emails=["a@x.com", "b@x.com"], group_ids=[GROUP_A])
+
+    assert audience.count() == 11
+    assert "count_ms" in audience.timings
+    facet = mock_groups.aggregate.call_args[0][0][-1]["$facet"]
+    assert facet["overlap"][0] == {"$match": {"_id": {"$in": ["a@x.com", "b@x.com"]}}}
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.recipient_service.group_members_collection")
+def test_stream_time_excludes_the_consumer(mock_groups):
+    def slow_cursor():
+        for email in ("a@x.com", "b@x.com"):
+            time.sleep(0.02)
+            yield {"_id": email}
+    mock_groups.aggregate.return_value = slow_cursor()
+    audience = resolve_recipients(USER_ID, group_ids=[GROUP_A])
+
+    for _ in audience:
+        # The sender's own work is not the stream's
+        time.sleep(0.1)
+
+    assert 40 <= audience.timings["stream_ms"] < 150
+
+
+def test_pipeline_projects_email_only():
+    pipeline = build_recipient_pipeline(USER_ID, [GROUP_A], send_to_all=False)
+
+    lookup = next(stage["$lookup"] for stage in pipeline if "$lookup" in stage)
+    assert lookup["localField"] == "contact_id"
+    assert lookup["pipeline"][-1] == {"$project": {"_id": 0, "email": {"$toLower": "$email"}}}
+    assert not any("$unionWith" in stage for stage in pipeline)
@@ -0,0 +1,173 @@
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.recipient_service import resolve_recipients
+from app.services.segments import SegmentError, parse_segment, segment_cache, segment_id_pipeline
+
+USER_ID = "507f1f77bcf86cd799439011"
+GROUP_A = "507f1f77bcf86cd799439021"
+GROUP_B = "507f1f77bcf86cd799439022"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def async_collection():
+    return MagicMock(spec=AsyncCollection)
+
+
+def test_parse_segment_is_canonical():
+    a_or_b = parse_segment({"union": [{"group": GROUP_B}, {"group": GROUP_A}]})
+    b_or_a = parse_segment({"union": [{"group": GROUP_A}, {"group": GROUP_B}]})
+    assert a_or_b == b_or_a
+
+    # The base of an except keeps its place
+    segment = parse_segment({"except": [{"group": GROUP_B}, {"filter": {"domain": "@Acme.io"}}, {"group": GROUP_A}]})
+    assert segment["except"][0] == {"group": GROUP_B}
+    assert {"filter": {"domain": "@acme.io"}} in segment["except"]
+
+
+@pytest.mark.parametrize("expr", [
+    {"group": "not-an-id"},
+    {"union": [{"group": GROUP_A}]},
+    {"intersect": {"group": GROUP_A}},
+    {"group": GROUP_A, "all": True},
+    {"all": False},
+    {"filter": {"colour": "red"}},
+    {"filter": {"created_from": "yesterday"}},
+    {"nearby": GROUP_A},
+])
+def test_parse_segment_rejects(expr):
+    with pytest.raises(SegmentError):
+        parse_segment(expr)
+
+
+def test_union_reads_its_groups_with_one_in():
+    pipeline = segment_id_pipeline(USER_ID, parse_segment(
+        {"union": [{"group": GROUP_A}, {"group": GROUP_B}, {"filter": {"q": "smith"}}]}
+    ))
+    members = pipeline[1]["$unionWith"]["pipeline"][0]["$match"]
+    assert members == {"group_id": {"$in": [ObjectId(GROUP_A), ObjectId(GROUP_B)]}, "user_id": ObjectId(USER_ID)}
+    assert len([s for s in pipeline if "$unionWith" in s]) == 2
+    assert pipeline[-1] == {"$group": {"_id": "$_id"}}
+
+
+def test_group_terms_skip_memberships_of_deleted_contacts():
+    pipeline = segment_id_pipeline(USER_ID, parse_segment({"group": GROUP_A}))
+    members = pipeline[1]["$unionWith"]["pipeline"]
+    lookup = next(s["$lookup"] for s in members if "$lookup" in s)
+    assert lookup["pipeline"][0] == {"$match": {"user_id": ObjectId(USER_ID)}}
+    assert {"$match": {"contact": {"$ne": []}}} in members
+    assert members[-1] == {"$project": {"_id": 1}}
+
+
+def test_except_keeps_ids_only_the_base_produced():
+    pipeline = segment_id_pipeline(USER_ID, parse_segment({"except": [{"all": True}, {"group": GROUP_B}]}))
+    base, removed = [s["$unionWith"]["pipeline"] for s in pipeline if "$unionWith" in s]
+    assert base[0] == {"$match": {"user_id": ObjectId(USER_ID)}}
+    assert base[-1] == {"$set": {"keep": 1}}
+    assert removed[-1] == {"$set": {"keep": 0}}
+    assert pipeline[-3:-1] == [{"$group": {"_id": "$_id", "keep": {"$min": "$keep"}}}, {"$match": {"keep": 1}}]
+
+
+def test_intersect_needs_every_operand():
+    pipeline = segment_id_pipeline(USER_ID, parse_segment({"intersect": [{"group": GROUP_A}, {"group": GROUP_B}]}))
+    assert {"$match": {"n": 2}} in pipeline
+
+
+@patch("app.services.segments.async_contact_versions_collection", new_callable=async_collection)
+@patch("app.services.segments.async_groups_collection", new_callable=async_collection)
+@patch("app.services.segments.async_contacts_collection", new_callable=async_collection)
+def test_preview_is_cached_until_membership_changes(mock_contacts, mock_groups, mock_versions):
+    segment_cache.clear()
+    versions = {"a": 1}
+    mock_groups.find.return_value.to_list = AsyncMock(
+        side_effect=lambda n: [{"_id": ObjectId(GROUP_A), "members_version": versions["a"]}]
+    )
+    mock_versions.find_one.return_value = {"_id": ObjectId(USER_ID), "contacts_version": 4}
+    mock_contacts.aggregate.return_value = MagicMock(to_list=AsyncMock(return_value=[{"n": 42}]))
+    body = {"segment": {"except": [{"group": GROUP_A}, {"filter": {"domain": "acme.io"}}]}}
+
+    first = client.post("/segments/preview", json=body).json()
+    second = client.post("/segments/preview", json=body).json()
+
+    assert (first["count"], first["cached"]) == (42, False)
+    assert (second["count"], second["cached"]) == (42, True)
+    assert mock_contacts.aggregate.call_count == 1
+    assert mock_contacts.aggregate.call_args[0][0][-1] == {"$count": "n"}
+
+    # A membership write moves the group's version on
+    versions["a"] = 2
+    assert client.post("/segments/preview", json=body).json()["cached"] is False
+    assert mock_contacts.aggregate.call_count == 2
+
+
+def test_preview_rejects_bad_segments():
+    response = client.post("/segments/preview", json={"segment": {"union": []}})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid segment")
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.recipient_service.group_members_collection")
+@patch("app.services.recipient_service.contacts_collection")
+def test_segment_sends_union_it_with_groups(mock_contacts, mock_members):
+    mock_contacts.aggregate.return_value = iter([{"_id": "a@x.com"}, {"_id": "b@x.com"}])
+    segment = parse_segment({"except": [{"all": True}, {"group": GROUP_B}]})
+
+    audience = resolve_recipients(USER_ID, emails=["c@x.com"], group_ids=[GROUP_A], segment=segment)
+
+    assert list(audience) == ["a@x.com", "b@x.com", "c@x.com"]
+    mock_members.aggregate.assert_not_called()
+    pipeline = mock_contacts.aggregate.call_args[0][0]
+    assert pipeline[-2] == {"$group": {"_id": "$email"}}
+    assert audience.spec()["segment"] == segment
+    # A resumed campaign evaluates the same segment
+    assert audience.resumed_after("a@x.com").segment == segment
+
+
+def test_send_rejects_bad_segment():
+    response = client.post("/email/send", json={"subject": "s", "body": "b", "segment": {"group": "nope"}})
+    assert response.status_code == 400
+    assert "Invalid segment" in response.json()["detail"]
+
+
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection", MagicMock())
+@patch("app.services.recipient_service.contacts_collection")
+def test_transactional_send_accepts_a_segment(mock_contacts, mock_ses):
+    mock_contacts.aggregate.side_effect = [
+        iter([{"total": [{"n": 1}], "overlap": []}]),
+        iter([{"_id": "a@x.com"}]),
+    ]
+    mock_ses.send_raw_email.return_value = {"MessageId": "1"}
+
+    response = client.post("/email/send/transactional", data={
+        "subject": "s", "body": "b", "segment": '{"group": "%s"}' % GROUP_A
+    })
+
+    assert response.status_code == 200
+    assert response.json()["recipients_count"] == 1
+    assert mock_ses.send_raw_email.call_args[1]["Destinations"] == ["a@x.com"]
+    pipeline = mock_contacts.aggregate.call_args[0][0]
+    assert pipeline[1]["$unionWith"]["pipeline"][0]["$match"]["group_id"] == {"$in": [ObjectId(GROUP_A)]}
+
+    bad = client.post("/email/send/transactional", data={"subject": "s", "body": "b", "segment": "{"})
+    assert bad.status_code == 400
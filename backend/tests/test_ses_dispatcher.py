@@ -0,0 +1,61 @@
+import sys
+import os
+import threading
+import time
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.campaign_jobs import CampaignJob
+from app.services.ses_dispatcher import TokenBucket, SESDispatcher
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # First token is free, the next 10 need 10 / 50 = 0.2s of refill
+    assert elapsed >= 0.18
+
+
+def test_dispatch_runs_in_parallel_and_counts():
+    dispatcher = SESDispatcher(max_workers=5, max_send_rate=1000)
+    job = CampaignJob("user", "newsletter", total=20)
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def send_one(email):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+        if email == "bad@example.com":
+            raise RuntimeError("rejected")
+
+    emails = [f"r{i}@example.com" for i in range(19)] + ["bad@example.com"]
+    dispatcher.dispatch(emails, send_one, job)
+
+    assert job.sent == 19
+    assert job.failed == 1
+    assert 1 < peak <= 5
+
+
+def test_dispatch_stops_when_cancelled():
+    dispatcher = SESDispatcher(max_workers=1, max_send_rate=1000)
+    job = CampaignJob("user", "newsletter", total=10)
+
+    def send_one(email):
+        job.cancel()
+
+    dispatcher.dispatch([f"r{i}@example.com" for i in range(10)], send_one, job)
+
+    assert job.sent == 1
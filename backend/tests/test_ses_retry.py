@@ -0,0 +1,192 @@
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.campaign_jobs import job_manager
+from app.services.delivery_records import DeliveryRecorder
+from app.services.ses_dispatcher import SESDispatcher
+from app.services.ses_errors import THROTTLED, TRANSIENT, QUOTA, PERMANENT, classify_ses_error
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+def ses_error(code, message=""):
+    return ClientError({"Error": {"Code": code, "Message": message}}, "SendRawEmail")
+
+
+def test_classify_ses_errors():
+    assert classify_ses_error(ses_error("Throttling", "Maximum sending rate exceeded.")) == THROTTLED
+    assert classify_ses_error(ses_error("Throttling", "Daily message quota exceeded.")) == QUOTA
+    assert classify_ses_error(ses_error("ServiceUnavailable")) == TRANSIENT
+    assert classify_ses_error(EndpointConnectionError(endpoint_url="https://email")) == TRANSIENT
+    assert classify_ses_error(ses_error("MessageRejected", "Email address is not verified.")) == PERMANENT
+    assert classify_ses_error("TransientFailure try later") == TRANSIENT
+    assert classify_ses_error(Exception("Throttling")) == PERMANENT
+
+
+def test_call_retries_throttling_and_slows_down():
+    dispatcher = SESDispatcher(max_workers=1, max_send_rate=100, base_delay=0)
+    send = MagicMock(side_effect=[ses_error("Throttling"), ses_error("Throttling"), {"MessageId": "1"}])
+
+    assert dispatcher.call(send, Destinations=["a@example.com"]) == {"MessageId": "1"}
+    assert send.call_count == 3
+    # Halved twice, then one success wins back 1%
+    assert dispatcher.bucket.rate == pytest.approx(26.0)
+
+
+def test_call_gives_up():
+    dispatcher = SESDispatcher(max_workers=1, max_send_rate=100, max_retries=2, base_delay=0)
+
+    send = MagicMock(side_effect=ses_error("ServiceUnavailable"))
+    with pytest.raises(ClientError):
+        dispatcher.call(send)
+    assert send.call_count == 3
+
+    rejected = MagicMock(side_effect=ses_error("MessageRejected"))
+    with pytest.raises(ClientError):
+        dispatcher.call(rejected)
+    assert rejected.call_count == 1
+    assert dispatcher.bucket.rate == 100
+
+
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.delivery_records.dead_letters_collection")
+def test_only_replayable_failures_are_dead_lettered(mock_dead_letters):
+    with DeliveryRecorder(ObjectId(), USER_ID) as recorder:
+        recorder.failed("slow@example.com", ses_error("Throttling", "Maximum sending rate exceeded."))
+        recorder.failed("bad@example.com", ses_error("MessageRejected"))
+        recorder.failed("later@example.com", "AccountDailyQuotaExceeded ")
+
+    rows = mock_dead_letters.insert_many.call_args[0][0]
+    assert [(r["email"], r["code"]) for r in rows] == [
+        ("slow@example.com", "Throttling"),
+        ("later@example.com", "AccountDailyQuotaExceeded"),
+    ]
+    assert recorder.dead_lettered == 2
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.delivery_records.dead_letters_collection")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_replay_resends_dead_letters(mock_emails, mock_ses, mock_dead_letters):
+    log_id = ObjectId()
+    mock_emails.find_one.return_value = {
+        "_id": log_id, "user_id": ObjectId(USER_ID), "subject": "Hello", "body": "<p>Hi</p>",
+        "status": "partial", "sent_count": 8, "failed_count": 2,
+    }
+    mock_dead_letters.find.return_value = [{"email": "b@example.com"}, {"email": "a@example.com"}]
+    mock_ses.send_email.return_value = {"MessageId": "abc"}
+    mock_emails.find_one_and_update.return_value = {"_id": log_id, "status": "partial", "sent_count": 10, "failed_count": 0}
+
+    response = client.post(f"/email/logs/{log_id}/replay")
+
+    assert response.status_code == 200
+    assert response.json()["recipients_count"] == 2
+    assert job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+
+    replay_id = mock_dead_letters.update_many.call_args_list[0][0][1]["$set"]["replay_id"]
+    # Dropped only after their outcome was recorded, then the claim is released
+    mock_dead_letters.delete_many.assert_called_once_with(
+        {"campaign_id": log_id, "replay_id": replay_id, "email": {"$in": ["a@example.com", "b@example.com"]}}
+    )
+    assert mock_dead_letters.update_many.call_args[0] == (
+        {"campaign_id": log_id, "replay_id": replay_id}, {"$set": {"replay_id": None}}
+    )
+    assert mock_ses.send_email.call_args[1]["Destination"] == {"ToAddresses": ["a@example.com", "b@example.com"]}
+
+    assert mock_emails.find_one_and_update.call_args[0][1] == {"$inc": {"sent_count": 2, "failed_count": -2}}
+    assert mock_emails.update_one.call_args[0][1] == {"$set": {"status": "success"}}
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000, max_retries=1, base_delay=0))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.delivery_records.dead_letters_collection")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_fully_throttled_send_can_be_replayed(mock_emails, mock_ses, mock_dead_letters):
+    mock_ses.send_email.side_effect = ses_error("Throttling", "Daily message quota exceeded.")
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": ["a@example.com", "b@example.com"]}
+
+    response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 500
+    body = response.json()
+    assert "Throttling" in body["detail"]
+    log = mock_emails.insert_one.call_args[0][0]
+    assert body["log_id"] == str(log["_id"])
+    assert (log["status"], log["failed_count"]) == ("failed", 2)
+    rows = mock_dead_letters.insert_many.call_args[0][0]
+    assert {r["campaign_id"] for r in rows} == {log["_id"]}
+
+    # The log the response points at is what replay looks up
+    mock_emails.find_one.return_value = log
+    mock_dead_letters.find.return_value = [{"email": "a@example.com"}, {"email": "b@example.com"}]
+    mock_ses.send_email.side_effect = None
+    mock_ses.send_email.return_value = {"MessageId": "abc"}
+    mock_emails.find_one_and_update.return_value = {**log, "sent_count": 2, "failed_count": 0}
+
+    response = client.post(f"/email/logs/{body['log_id']}/replay")
+
+    assert response.status_code == 200
+    assert job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+    assert mock_emails.update_one.call_args[0][1] == {"$set": {"status": "success"}}
+
+
+@patch("app.services.delivery_records.dead_letters_collection")
+@patch("app.routers.email_router.emails_collection")
+def test_replay_without_dead_letters(mock_emails, mock_dead_letters):
+    mock_emails.find_one.return_value = {"_id": ObjectId(), "user_id": ObjectId(USER_ID), "status": "success"}
+    mock_dead_letters.find.return_value = []
+
+    response = client.post(f"/email/logs/{ObjectId()}/replay")
+    assert response.status_code == 400
+
+    mock_emails.find_one.return_value = None
+    response = client.post(f"/email/logs/{ObjectId()}/replay")
+    assert response.status_code == 404
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.delivery_records.dead_letters_collection")
+@patch("app.routers.email_router.emails_collection")
+def test_crashed_replay_keeps_its_dead_letters(mock_emails, mock_dead_letters):
+    log_id = ObjectId()
+    mock_emails.find_one.return_value = {
+        "_id": log_id, "user_id": ObjectId(USER_ID), "subject": "Hello", "body": "<p>Hi</p>",
+        "status": "failed", "sent_count": 0, "failed_count": 1,
+    }
+    mock_dead_letters.find.return_value = [{"email": "a@example.com"}]
+
+    with patch("app.routers.email_router._html_batch_sender", side_effect=RuntimeError("boom")):
+        response = client.post(f"/email/logs/{log_id}/replay")
+        job_manager.get(response.json()["job_id"], USER_ID).wait(timeout=5)
+
+    mock_dead_letters.delete_many.assert_not_called()
+    replay_id = mock_dead_letters.update_many.call_args_list[0][0][1]["$set"]["replay_id"]
+    assert mock_dead_letters.update_many.call_args[0] == (
+        {"campaign_id": log_id, "replay_id": replay_id}, {"$set": {"replay_id": None}}
+    )
+    mock_emails.find_one_and_update.assert_not_called()
@@ -0,0 +1,93 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.core.security import get_current_user_swagger
+from app.services.ses_dispatcher import SESDispatcher
+from app.services.suppression_service import SuppressionIndex
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+# Override dependency
+async def mock_get_current_user():
+    return {"_id": USER_ID, "email": "test@example.com"}
+
+app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
+
+client = TestClient(app)
+
+
+@patch("app.services.suppression_service.suppressions_collection")
+def test_index_loads_once_then_refreshes_incrementally(mock_suppressions):
+    mock_suppressions.find.return_value = [{"email": "gone@example.com"}]
+    index = SuppressionIndex(refresh_seconds=0)
+
+    assert index.contains(USER_ID, "Gone@Example.com ")
+    assert not index.contains(USER_ID, "here@example.com")
+
+    # First load reads everything, later refreshes only recent rows
+    first, later = mock_suppressions.find.call_args_list[0][0][0], mock_suppressions.find.call_args_list[1][0][0]
+    assert first == {"user_id": ObjectId(USER_ID)}
+    assert "$gte" in later["_id"]
+
+    mock_suppressions.find.return_value = [{"email": "new@example.com"}]
+    assert list(index.filter(USER_ID, ["a@example.com", "gone@example.com", "new@example.com"])) == ["a@example.com"]
+
+
+@patch("app.services.suppression_service.suppressions_collection")
+def test_index_add_and_remove(mock_suppressions):
+    mock_suppressions.find.return_value = []
+    mock_suppressions.delete_one.return_value = MagicMock(deleted_count=1)
+    index = SuppressionIndex()
+
+    assert index.add(USER_ID, ["B@example.com", "b@example.com"], reason="bounce") == 1
+    assert index.contains(USER_ID, "b@example.com")
+    ops = mock_suppressions.bulk_write.call_args[0][0]
+    assert len(ops) == 1
+
+    assert index.remove(USER_ID, "b@example.com")
+    assert not index.contains(USER_ID, "b@example.com")
+
+
+@patch("app.routers.email_router.dispatcher", SESDispatcher(max_workers=2, max_send_rate=10000))
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
+@patch("app.services.suppression_service.suppressions_collection")
+@patch("app.routers.email_router.ses")
+@patch("app.routers.email_router.emails_collection")
+def test_send_skips_suppressed_recipients(mock_emails, mock_ses, mock_suppressions):
+    mock_suppressions.find.return_value = [{"email": "b@example.com"}]
+    mock_ses.send_email.return_value = {"MessageId": "abc"}
+    payload = {"subject": "Hello", "body": "<p>Hi</p>", "to_emails": ["a@example.com", "B@example.com", "c@example.com"]}
+
+    with patch("app.services.recipient_service.suppression_index", SuppressionIndex()):
+        response = client.post("/email/send", json=payload)
+
+    assert response.status_code == 200
+    json_response = response.json()
+    assert json_response["recipients_count"] == 3
+    assert json_response["sent_count"] == 2
+    assert json_response["suppressed_count"] == 1
+    assert mock_ses.send_email.call_args[1]["Destination"] == {"ToAddresses": ["a@example.com", "c@example.com"]}
+    assert mock_emails.insert_one.call_args[0][0]["suppressed_count"] == 1
+
+
+@patch("app.services.suppression_service.suppressions_collection")
+def test_suppression_endpoints(mock_suppressions):
+    mock_suppressions.delete_one.return_value = MagicMock(deleted_count=0)
+
+    with patch("app.routers.suppression_router.suppression_index", SuppressionIndex()):
+        response = client.post("/suppressions/", json={"emails": ["x@example.com"], "reason": "complaint"})
+        assert response.status_code == 200
+        assert response.json()["count"] == 1
+
+        response = client.post("/suppressions/", json={"emails": ["x@example.com"], "reason": "spam"})
+        assert response.status_code == 422
+
+        response = client.delete("/suppressions/nobody@example.com")
+        assert response.status_code == 404
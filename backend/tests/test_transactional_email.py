@@ -21,9 +21,11 @@ app.dependency_overrides[get_current_user_swagger] = mock_get_current_user
 
 client = TestClient(app)
 
+@patch("app.services.suppression_service.suppressions_collection", MagicMock())
+@patch("app.services.delivery_records.deliveries_collection", MagicMock())
 @patch("app.routers.email_router.ses")
 @patch("app.routers.email_router.emails_collection")
-@patch("app.routers.email_router.contacts_collection")
+@patch("app.services.recipient_service.contacts_collection")
 def test_send_transactional_email_with_attachment(mock_contacts, mock_emails, mock_ses):
     # Setup mocks
     mock_ses.send_raw_email.return_value = {"MessageId": "123"}
@@ -64,6 +66,6 @@ if __name__ == "__main__":
     # So let's just use a simple run logic
     with patch("app.routers.email_router.ses") as mock_ses, \
          patch("app.routers.email_router.emails_collection") as mock_emails, \
-         patch("app.routers.email_router.contacts_collection") as mock_contacts:
+         patch("app.services.recipient_service.contacts_collection") as mock_contacts:
         
         test_send_transactional_email_with_attachment(mock_contacts, mock_emails, mock_ses)
@@ -0,0 +1,78 @@
+import sys
+import os
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from bson import ObjectId
+
+# Add backend to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.main import app
+from app.services.suppression_service import SuppressionIndex
+from app.services.unsubscribe_tokens import UnsubscribeSigner, verify_token
+
+client = TestClient(app)
+
+USER_ID = "507f1f77bcf86cd799439011"
+CAMPAIGN_ID = "507f1f77bcf86cd799439099"
+
+
+def test_token_round_trip_and_tampering():
+    signer = UnsubscribeSigner(USER_ID, CAMPAIGN_ID)
+    token = signer.token("someone@example.com")
+
+    assert verify_token(token) == (USER_ID, CAMPAIGN_ID, "someone@example.com")
+    assert "someone" not in token
+
+    # Any changed byte breaks the signature
+    forged = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    assert verify_token(forged) is None
+    assert verify_token("not-a-token") is None
+    assert verify_token("") is None
+
+
+def test_unsubscribe_page_does_not_unsubscribe():
+    token = UnsubscribeSigner(USER_ID, CAMPAIGN_ID).token("someone@example.com")
+    index = MagicMock()
+
+    with patch("app.routers.unsubscribe_router.suppression_index", index):
+        response = client.get(f"/unsubscribe/{token}")
+
+    assert response.status_code == 200
+    assert "someone@example.com" in response.text
+    index.add_later.assert_not_called()
+
+
+def test_unsubscribe_page_escapes_the_email():
+    token = UnsubscribeSigner(USER_ID, CAMPAIGN_ID).token('a"&b@example.com')
+
+    response = client.get(f"/unsubscribe/{token}")
+
+    assert "<b>a&quot;&amp;b@example.com</b>" in response.text
+
+
+@patch("app.services.suppression_service.suppressions_collection")
+def test_one_click_unsubscribe_is_buffered(mock_suppressions):
+    token = UnsubscribeSigner(USER_ID, CAMPAIGN_ID).token("Someone@Example.com")
+    index = SuppressionIndex(flush_seconds=3600)
+
+    with patch("app.routers.unsubscribe_router.suppression_index", index):
+        for _ in range(3):
+            response = client.post(f"/unsubscribe/{token}", data={"List-Unsubscribe": "One-Click"})
+            assert response.status_code == 200
+        bad = client.post("/unsubscribe/forged")
+
+    assert bad.status_code == 400
+    # Nothing read or written on the request path
+    mock_suppressions.find.assert_not_called()
+    mock_suppressions.bulk_write.assert_not_called()
+
+    assert index.flush() == 3
+    ops = mock_suppressions.bulk_write.call_args[0][0]
+    assert ops[0]._filter == {"user_id": ObjectId(USER_ID), "email": "someone@example.com"}
+    assert ops[0]._doc["$setOnInsert"]["campaign_id"] == ObjectId(CAMPAIGN_ID)
+
+    # Still suppressed after a full reload, even before the flush is visible in Mongo
+    mock_suppressions.find.return_value = []
+    index.add_later(USER_ID, "later@example.com")
+    assert index.contains(USER_ID, "later@example.com")
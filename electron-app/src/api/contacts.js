@@ -4,9 +4,17 @@ import { authState } from '../utils/authState.js';
 import { API_BASE_URL } from '../config/config.js';
 
 export const contactsApi = {
-    // Get all contacts for current user
+    // Get all contacts for current user, following the pages of the contacts endpoint
     async getContacts() {
-        return await client.get(API_ENDPOINTS.CONTACTS, true);
+        const contacts = [];
+        let after = null;
+        do {
+            const query = after ? `?after=${after}` : '';
+            const page = await client.get(`${API_ENDPOINTS.CONTACTS}/${query}`, true);
+            contacts.push(...page.contacts);
+            after = page.next_after;
+        } while (after);
+        return contacts;
     },
 
     // Create a new contact
@@ -260,7 +260,7 @@ export const AIGeneratorPage = {
             }
 
             select.innerHTML = groups.map(group => {
-                const count = group.contact_ids ? group.contact_ids.length : 0;
+                const count = group.contact_count || 0;
                 return `<option value="${group.id}">${group.group_name} (${count} recipients)</option>`;
             }).join('');
         } catch (error) {
@@ -545,7 +545,7 @@ export const AIGeneratorPage = {
                 <div class="success-message">
                     <div class="success-icon">✅</div>
                     <h4>Email sent successfully!</h4>
-                    <p><strong>${result.recipients.length}</strong> recipient${result.recipients.length !== 1 ? 's' : ''}</p>
+                    <p><strong>${result.recipients_count}</strong> recipient${result.recipients_count !== 1 ? 's' : ''}</p>
                 </div>
             `;
 
@@ -130,7 +130,7 @@ export const BulkSendPage = {
             }
 
             select.innerHTML = groups.map(group => {
-                const count = group.contact_ids ? group.contact_ids.length : 0;
+                const count = group.contact_count || 0;
                 return `<option value="${group.id}">${group.group_name} (${count} recipients)</option>`;
             }).join('');
         } catch (error) {
@@ -193,15 +193,7 @@ export const BulkSendPage = {
                 <div class="success-message">
                     <div class="success-icon"><i data-lucide="check-circle"></i></div>
                     <h4>Email sent successfully!</h4>
-                    <p><strong>${result.recipients.length}</strong> recipient${result.recipients.length !== 1 ? 's' : ''} received the email.</p>
-                    <div class="recipients-list">
-                        <details>
-                            <summary>View recipients</summary>
-                            <ul>
-                                ${result.recipients.map(email => `<li>${email}</li>`).join('')}
-                            </ul>
-                        </details>
-                    </div>
+                    <p><strong>${result.sent_count}</strong> of ${result.recipients_count} recipient${result.recipients_count !== 1 ? 's' : ''} received the email.</p>
                 </div>
             `;
 
@@ -168,7 +168,7 @@ export const CampaignsPage = {
             container.innerHTML = `
                 <div class="campaigns-grid">
                     ${CampaignsPage.campaigns.map(campaign => {
-                const recipientCount = campaign.contact_ids ? campaign.contact_ids.length : 0;
+                const recipientCount = campaign.contact_count || 0;
                 return Card({
                     title: campaign.group_name,
                     subtitle: `${recipientCount} recipient${recipientCount !== 1 ? 's' : ''}`,
@@ -236,7 +236,13 @@ export const CampaignsPage = {
 
         const checklist = document.getElementById('edit-recipients-checklist');
         if (checklist) {
-            const selectedIds = campaign.contact_ids || [];
+            // The group list only carries counts; members come with the single group
+            let selectedIds = [];
+            try {
+                selectedIds = (await groupsApi.getGroup(id)).contact_ids || [];
+            } catch (error) {
+                console.error('Error loading campaign recipients:', error);
+            }
             checklist.innerHTML = CampaignsPage.contacts.map(contact => {
                 const isChecked = selectedIds.includes(contact.id);
                 return `
@@ -140,10 +140,11 @@ export const EmailLogsPage = {
                 }
             },
             {
-                key: 'sent_to',
+                key: 'recipients_count',
                 label: 'Recipients',
-                render: (recipients) => {
-                    const count = Array.isArray(recipients) ? recipients.length : 0;
+                render: (recipientsCount, log) => {
+                    // Older logs stored the full sent_to list instead of a count
+                    const count = recipientsCount ?? (Array.isArray(log.sent_to) ? log.sent_to.length : 0);
                     return `<span class="badge badge-neutral">${count} recipient${count !== 1 ? 's' : ''}</span>`;
                 }
             }
@@ -106,7 +106,7 @@ export const HomePage = {
 
             // Calculate total recipients in campaigns
             const totalInCampaigns = groups.reduce((sum, group) => {
-                return sum + (group.contact_ids ? group.contact_ids.length : 0);
+                return sum + (group.contact_count || 0);
             }, 0);
 
             // Calculate total emails sent
@@ -256,7 +256,7 @@ export const MarketingEmailPage = {
             }
 
             select.innerHTML = groups.map(group => {
-                const count = group.contact_ids ? group.contact_ids.length : 0;
+                const count = group.contact_count || 0;
                 return `<option value="${group.id}">${group.group_name} (${count} subscribers)</option>`;
             }).join('');
         } catch (error) {
@@ -365,19 +365,11 @@ export const MarketingEmailPage = {
             resultsContent.innerHTML = `
                 <div class="success-message">
                     <div class="success-icon"><i data-lucide="check-circle"></i></div>
-                    <h4>Newsletter sent successfully!</h4>
-                    <p><strong>${result.recipients.length}</strong> subscriber${result.recipients.length !== 1 ? 's' : ''} received your newsletter.</p>
+                    <h4>Newsletter queued!</h4>
+                    <p>Sending to <strong>${result.recipients_count}</strong> subscriber${result.recipients_count !== 1 ? 's' : ''} in the background.</p>
                     ${result.inline_images && result.inline_images.length > 0 ? `
                         <p><i data-lucide="image"></i> Included ${result.inline_images.length} image${result.inline_images.length !== 1 ? 's' : ''}</p>
                     ` : ''}
-                    <div class="recipients-list">
-                        <details>
-                            <summary>View recipients</summary>
-                            <ul>
-                                ${result.recipients.map(email => `<li>${email}</li>`).join('')}
-                            </ul>
-                        </details>
-                    </div>
                 </div>
             `;
 
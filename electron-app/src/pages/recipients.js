@@ -119,7 +119,7 @@ export const RecipientsPage = {
                         <form id="import-recipient-form" class="form">
                             <div class="form-group">
                                 <label class="form-label">Select File (CSV or TXT)</label>
-                                <input type="file" id="import-file" class="form-input" accept=".csv,.txt" required>
+                                <input type="file" id="import-file" class="form-input" accept=".csv,.txt,.gz,.zip" required>
                                 <p class="form-hint">CSV format: email,name OR just email column. TXT: one email per line.</p>
                             </div>
                             